@@ -0,0 +1,11 @@
+__all__ = [
+    'Agent',
+]
+
+
+class Agent:
+    def __init__(self):
+        pass
+
+    def select_move(self, game_state):
+        raise NotImplementedError()
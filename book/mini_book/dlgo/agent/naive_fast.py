@@ -0,0 +1,198 @@
+"""Random agent for goboard_fast games that never fills its own eyes.
+
+``RandomBot`` tests every point of the board for legality and eyes before
+each move. ``FastRandomBot`` keeps the empty points in a sparse set (a
+list plus the position of each point in it) and the owner of every eye in
+a padded array, and updates both from the stone placed and the stones it
+captured each time the game moves on: only the points next to or
+diagonal to a changed point can gain or lose an eye. A move is picked by
+drawing random candidates from the set; a candidate that is our own eye,
+suicide or a ko violation is swapped behind the ones still to be drawn,
+so each draw costs O(1) and a rollout's typical move needs one or two.
+"""
+import random
+from array import array
+
+from dlgo.agent.base import Agent
+from dlgo.goboard_fast import Move, line_from
+from dlgo.gotypes import BORDER, EMPTY
+
+__all__ = [
+    'FastRandomBot',
+]
+
+
+class FastRandomBot(Agent):
+    """
+    The caches follow the game the bot is asked to move in: when it is a
+    continuation (up to ``max_catch_up`` moves) of the last game state
+    seen, the moves in between are replayed into the caches, otherwise
+    they are rebuilt from the board.
+
+    >>> from dlgo.goboard_fast import GameState
+    >>> bot = FastRandomBot(random.Random(0))
+    >>> game = GameState.new_game(5)
+    >>> while not game.is_over():
+    ...     game = game.apply_move(bot.select_move(game))
+    >>> bot.num_rebuilds
+    1
+    """
+    def __init__(self, rng=None, max_catch_up=8):
+        Agent.__init__(self)
+        self.rng = rng or random
+        self.max_catch_up = max_catch_up
+        self.num_rebuilds = 0
+        self._board = None
+        self._geometry = None
+        self._empties = []
+        self._pos = None
+        self._eye = None
+
+    def select_move(self, game_state):
+        """Choose a random valid move that preserves our own eyes."""
+        self._sync(game_state)
+        move = self._draw(game_state, game_state.next_player)
+        return Move.pass_turn() if move is None else move
+
+    def play_out(self, game_state, max_moves=None):
+        """Play random moves from game_state and return the final state.
+
+        The game ends at two passes, after max_moves moves, or as soon as
+        neither player has a legal move that doesn't fill an own eye left,
+        without playing the passes that would end it. Every empty point is
+        then an eye or a point neither side can play, so the board is ready
+        for scoring.
+        """
+        num_moves = 0
+        while not game_state.is_over():
+            if max_moves is not None and num_moves >= max_moves:
+                break
+            self._sync(game_state)
+            move = self._draw(game_state, game_state.next_player)
+            if move is None:
+                # Ignoring ko can only find the opponent more moves, so
+                # the game never stops while one is left.
+                if self._draw(game_state, game_state.next_player.other,
+                              check_ko=False) is None:
+                    break
+                move = Move.pass_turn()
+            game_state = game_state.apply_move(move)
+            num_moves += 1
+        return game_state
+
+    def _draw(self, game_state, player, check_ko=True):
+        """A random move of player that is legal and not in its own eye,
+        or None."""
+        board = game_state.board
+        color = player.value
+        empties = self._empties
+        pos = self._pos
+        eye = self._eye
+        moves = self._geometry.moves
+        randrange = self.rng.randrange
+        live = len(empties)
+        while live:
+            i = randrange(live)
+            idx = empties[i]
+            if eye[idx] != color:
+                move = moves[idx]
+                if not board.is_self_capture(player, move.point) and \
+                        not (check_ko and game_state.does_move_violate_ko(
+                            player, move)):
+                    return move
+            # Keep the rejected point out of the remaining draws.
+            live -= 1
+            last = empties[live]
+            empties[i], empties[live] = last, idx
+            pos[last], pos[idx] = i, live
+        return None
+
+    def _sync(self, game_state):
+        board = game_state.board
+        if board is self._board:
+            return
+        line = None
+        if board.geometry is self._geometry:
+            line = line_from(self._board, game_state, self.max_catch_up)
+        if line is None:
+            self._rebuild(board)
+            return
+        for state in line:
+            self._replay(state)
+        self._board = board
+
+    def _replay(self, state):
+        """Update the caches with the move that led to state."""
+        move = state.last_move
+        board = state.board
+        idx = board.index(move.point)
+        self._discard(idx)
+        changed = [idx]
+        for stone in board.last_captures:
+            self._insert(stone)
+            changed.append(stone)
+        self._update_eyes(board.colors, changed)
+
+    def _rebuild(self, board):
+        self.num_rebuilds += 1
+        geometry = board.geometry
+        self._geometry = geometry
+        colors = board.colors
+        self._board = board
+        self._empties = [idx for idx in geometry.points
+                         if colors[idx] == EMPTY]
+        self._pos = array('i', [-1]) * geometry.size
+        for i, idx in enumerate(self._empties):
+            self._pos[idx] = i
+        self._eye = array('b', bytes(geometry.size))
+        for idx in self._empties:
+            self._eye[idx] = self._eye_color(colors, idx)
+
+    def _insert(self, idx):
+        self._pos[idx] = len(self._empties)
+        self._empties.append(idx)
+
+    def _discard(self, idx):
+        empties = self._empties
+        pos = self._pos
+        i = pos[idx]
+        last = empties.pop()
+        if last != idx:
+            empties[i] = last
+            pos[last] = i
+        pos[idx] = -1
+
+    def _update_eyes(self, colors, changed):
+        geometry = self._geometry
+        eye = self._eye
+        for idx in changed:
+            for near in (idx,) + geometry.neighbors[idx] + \
+                    geometry.diagonals[idx]:
+                if colors[near] == EMPTY:
+                    eye[near] = self._eye_color(colors, near)
+                elif colors[near] != BORDER:
+                    eye[near] = EMPTY
+
+    def _eye_color(self, colors, idx):
+        """The color whose eye the empty point idx is, or EMPTY: the rule
+        of is_point_an_eye."""
+        color = EMPTY
+        for n in self._geometry.neighbors[idx]:
+            c = colors[n]
+            if c == BORDER:
+                continue
+            if c == EMPTY or (color != EMPTY and c != color):
+                return EMPTY
+            color = c
+        if color == EMPTY:
+            return EMPTY
+        friendly = off_board = 0
+        for d in self._geometry.diagonals[idx]:
+            c = colors[d]
+            if c == color:
+                friendly += 1
+            elif c == BORDER:
+                off_board += 1
+        if off_board:
+            return color if off_board + friendly == 4 else EMPTY
+        return color if friendly >= 3 else EMPTY
@@ -0,0 +1,324 @@
+"""Self-play that advances a whole batch of games in lockstep.
+
+All boards live in one padded ``(N, size + 2, size + 2)`` int8 array using
+the integer colors from gotypes. Each step labels every string of every
+board at once, derives liberty counts, legal-move and eye masks from those
+labels, lets a policy pick one move per game and resolves captures, all
+with array operations rather than Python code per game or per point.
+Finished games are recorded and their slot restarts with an empty board,
+so every slot stays busy until the requested number of games is done.
+
+The batch engine enforces simple ko only; whole-board superko needs the
+per-game history kept by goboard_fast.
+"""
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from dlgo.gotypes import BLACK, BORDER, EMPTY, PLAYER_OF_COLOR, WHITE
+
+__all__ = [
+    'BatchSelfPlay',
+    'GameRecord',
+    'label_regions',
+    'random_policy',
+]
+
+PASS = -1
+
+GameRecord = namedtuple(
+    'GameRecord', 'board_size moves winner black_score white_score')
+GameRecord.__doc__ = """A finished game: moves are flat point indices
+``row * board_size + col`` (0-based) or -1 for a pass, and winner is a
+Player."""
+
+
+def _shifted(padded):
+    """Views of the up, down, left and right neighbors of every interior
+    point of a padded (N, rows + 2, cols + 2) array."""
+    return (
+        padded[:, :-2, 1:-1],
+        padded[:, 2:, 1:-1],
+        padded[:, 1:-1, :-2],
+        padded[:, 1:-1, 2:],
+    )
+
+
+def _diagonals(padded):
+    return (
+        padded[:, :-2, :-2],
+        padded[:, :-2, 2:],
+        padded[:, 2:, :-2],
+        padded[:, 2:, 2:],
+    )
+
+
+def label_regions(boards):
+    """Label the connected regions of equal color on padded boards.
+
+    Every interior point gets the flat index (into ``boards.ravel()``) of
+    one representative point of its string or empty region; border points
+    get -1. Labels are propagated between equal neighbors and then
+    shortcut by pointer jumping, so long strings converge in a few rounds.
+
+    >>> boards = np.full((1, 4, 4), BORDER, dtype=np.int8)
+    >>> boards[0, 1:-1, 1:-1] = [[BLACK, BLACK], [EMPTY, WHITE]]
+    >>> label_regions(boards)[0, 1:-1, 1:-1]
+    array([[ 6,  6],
+           [ 9, 10]])
+    """
+    labels = np.full(boards.shape, -1, dtype=np.int64)
+    inner = labels[:, 1:-1, 1:-1]
+    inner[...] = np.arange(labels.size).reshape(labels.shape)[:, 1:-1, 1:-1]
+    values = boards[:, 1:-1, 1:-1]
+    same = [values == neighbor for neighbor in _shifted(boards)]
+    flat = labels.ravel()
+    while True:
+        best = inner.copy()
+        for is_same, neighbor in zip(same, _shifted(labels)):
+            np.maximum(best, np.where(is_same, neighbor, -1), out=best)
+        best = np.maximum(best, flat[best])
+        if np.array_equal(best, inner):
+            return labels
+        inner[...] = best
+
+
+def _liberty_counts(boards, labels):
+    """Number of distinct liberties of the string through each point,
+    zero for empty and border points."""
+    total = labels.size
+    values = boards[:, 1:-1, 1:-1]
+    stone = (values == BLACK) | (values == WHITE)
+    keys = []
+    for neighbor, neighbor_index in zip(_shifted(boards), _shifted(
+            np.arange(total).reshape(labels.shape))):
+        touching = stone & (neighbor == EMPTY)
+        keys.append(labels[:, 1:-1, 1:-1][touching] * total +
+                    neighbor_index[touching])
+    keys = np.unique(np.concatenate(keys))
+    counts = np.bincount(keys // total, minlength=total)
+    liberties = np.zeros(labels.shape, dtype=np.int64)
+    inner_labels = labels[:, 1:-1, 1:-1]
+    liberties[:, 1:-1, 1:-1] = np.where(stone, counts[inner_labels], 0)
+    return liberties
+
+
+def _eye_mask(boards, colors):
+    """Empty points that are an eye of the given color (one per board),
+    following the chapter 3 rule used by the random bot."""
+    color = colors[:, None, None]
+    values = boards[:, 1:-1, 1:-1]
+    surrounded = values == EMPTY
+    for neighbor in _shifted(boards):
+        surrounded &= (neighbor == color) | (neighbor == BORDER)
+    friendly = sum((d == color).astype(np.int8) for d in _diagonals(boards))
+    off_board = sum((d == BORDER).astype(np.int8) for d in _diagonals(boards))
+    corners_ok = np.where(off_board > 0,
+                          off_board + friendly == 4,
+                          friendly >= 3)
+    return surrounded & corners_ok
+
+
+def random_policy(rng):
+    """A policy choosing uniformly among the candidate moves of each game,
+    passing when there are none."""
+    def policy(boards, colors, candidates):
+        flat = candidates.reshape(len(candidates), -1)
+        scores = rng.random(flat.shape)
+        scores[~flat] = -1.0
+        choice = scores.argmax(axis=1)
+        choice[~flat.any(axis=1)] = PASS
+        return choice
+    return policy
+
+
+class BatchSelfPlay():
+    """Play games of a policy against itself, batch_size at a time.
+
+    A policy is called as ``policy(boards, colors, candidates)`` with the
+    (N, size, size) board view, the color to move in each game and a
+    boolean mask of legal moves that don't fill the mover's own eyes; it
+    returns one flat point index per game, or -1 to pass. The default
+    policy plays uniformly random candidates.
+
+    >>> engine = BatchSelfPlay(8, board_size=5, seed=1)
+    >>> records = engine.play(12)
+    >>> len(records), records[0].winner.name in ('black', 'white')
+    (12, True)
+    >>> engine.games_played >= 12 and engine.moves_per_second > 0
+    True
+    """
+    def __init__(self, batch_size, board_size=9, komi=7.5, max_moves=None,
+                 policy=None, seed=None):
+        self.batch_size = batch_size
+        self.board_size = board_size
+        self.komi = komi
+        self.max_moves = max_moves or 3 * board_size * board_size
+        self.rng = np.random.default_rng(seed)
+        self.policy = policy or random_policy(self.rng)
+        padded = board_size + 2
+        self._boards = np.full((batch_size, padded, padded), BORDER,
+                               dtype=np.int8)
+        self._boards[:, 1:-1, 1:-1] = EMPTY
+        self._colors = np.full(batch_size, BLACK, dtype=np.int8)
+        self._ko = np.full(batch_size, -1, dtype=np.int64)
+        self._passes = np.zeros(batch_size, dtype=np.int8)
+        self._num_moves = np.zeros(batch_size, dtype=np.int64)
+        self._moves = np.zeros((batch_size, self.max_moves), dtype=np.int16)
+        self.games_played = 0
+        self.moves_played = 0
+        self.elapsed = 0.0
+
+    @property
+    def boards(self):
+        return self._boards[:, 1:-1, 1:-1]
+
+    @property
+    def games_per_second(self):
+        return self.games_played / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def moves_per_second(self):
+        return self.moves_played / self.elapsed if self.elapsed else 0.0
+
+    def legal_moves(self, labels=None, liberties=None):
+        """Boolean (N, size, size) mask of legal plays for the side to move
+        in each game."""
+        boards = self._boards
+        if labels is None:
+            labels = label_regions(boards)
+            liberties = _liberty_counts(boards, labels)
+        color = self._colors[:, None, None]
+        opponent = BLACK + WHITE - color
+        has_room = np.zeros(self.boards.shape, dtype=bool)
+        for neighbor, libs in zip(_shifted(boards), _shifted(liberties)):
+            has_room |= neighbor == EMPTY
+            has_room |= (neighbor == color) & (libs > 1)
+            has_room |= (neighbor == opponent) & (libs == 1)
+        legal = (self.boards == EMPTY) & has_room
+        ko = self._ko >= 0
+        legal.reshape(self.batch_size, -1)[ko, self._ko[ko]] = False
+        return legal
+
+    def step(self):
+        """Play one move in every game and return the records of the games
+        that finished."""
+        start = time.perf_counter()
+        n = self.batch_size
+        size = self.board_size
+        padded = size + 2
+        boards = self._boards
+        labels = label_regions(boards)
+        liberties = _liberty_counts(boards, labels)
+        legal = self.legal_moves(labels, liberties)
+        candidates = legal & ~_eye_mask(boards, self._colors)
+        moves = np.asarray(self.policy(self.boards, self._colors, candidates))
+
+        games = np.arange(n)
+        self._moves[games, self._num_moves] = moves
+        self._num_moves += 1
+        plays = moves != PASS
+        self._passes = np.where(plays, 0, self._passes + 1)
+
+        played = games[plays]
+        rows = moves[plays] // size + 1
+        cols = moves[plays] % size + 1
+        colors = self._colors[plays]
+        boards[played, rows, cols] = colors
+        captured = np.zeros(n, dtype=np.int64)
+        captured_at = np.full(n, -1, dtype=np.int64)
+        flat_boards = boards.ravel()
+        flat_labels = labels.ravel()
+        flat_libs = liberties.ravel()
+        origin = played * padded * padded + rows * padded + cols
+        doomed = []
+        for offset in (-padded, padded, -1, 1):
+            neighbor = origin + offset
+            hit = (flat_boards[neighbor] == BLACK + WHITE - colors) & \
+                (flat_libs[neighbor] == 1)
+            doomed.append(flat_labels[neighbor[hit]])
+        doomed = np.unique(np.concatenate(doomed))
+        if len(doomed):
+            removed = np.isin(labels, doomed)
+            per_game = removed.reshape(n, -1)
+            captured = per_game.sum(axis=1)
+            captured_at = per_game.argmax(axis=1)
+            boards[removed] = EMPTY
+
+        # A single stone that captured a single stone and now has only the
+        # captured point as its liberty sets up a ko.
+        self._ko[:] = -1
+        single = captured[played] == 1
+        lone = np.ones(len(played), dtype=bool)
+        for offset in (-padded, padded, -1, 1):
+            neighbor = flat_boards[origin + offset]
+            lone &= (neighbor != colors) & \
+                ((neighbor != EMPTY) | (origin + offset ==
+                                        played * padded * padded +
+                                        captured_at[played]))
+        ko_games = played[single & lone]
+        ko_point = captured_at[ko_games]
+        self._ko[ko_games] = (ko_point // padded - 1) * size + \
+            ko_point % padded - 1
+
+        self._colors = BLACK + WHITE - self._colors
+        self.moves_played += n
+        done = (self._passes >= 2) | (self._num_moves >= self.max_moves)
+        records = self._finish(np.flatnonzero(done))
+        self.elapsed += time.perf_counter() - start
+        return records
+
+    def play(self, num_games):
+        """Step until at least num_games games have finished and return the
+        first num_games records."""
+        records = []
+        while len(records) < num_games:
+            records.extend(self.step())
+        return records[:num_games]
+
+    def _finish(self, games):
+        if not len(games):
+            return []
+        boards = self._boards[games]
+        black, white = _area_scores(boards)
+        white = white + self.komi
+        records = []
+        for i, game in enumerate(games):
+            winner = BLACK if black[i] > white[i] else WHITE
+            records.append(GameRecord(
+                self.board_size,
+                self._moves[game, :self._num_moves[game]].copy(),
+                PLAYER_OF_COLOR[winner],
+                int(black[i]),
+                float(white[i])))
+        self._boards[games, 1:-1, 1:-1] = EMPTY
+        self._colors[games] = BLACK
+        self._ko[games] = -1
+        self._passes[games] = 0
+        self._num_moves[games] = 0
+        self.games_played += len(games)
+        return records
+
+
+def _area_scores(boards):
+    """Stones plus empty regions bordered by only one color, per board."""
+    labels = label_regions(boards)
+    total = labels.size
+    values = boards[:, 1:-1, 1:-1]
+    inner_labels = labels[:, 1:-1, 1:-1]
+    empty = values == EMPTY
+    touches = {}
+    for color in (BLACK, WHITE):
+        near = np.zeros(values.shape, dtype=bool)
+        for neighbor in _shifted(boards):
+            near |= neighbor == color
+        touches[color] = np.bincount(inner_labels[empty & near],
+                                     minlength=total) > 0
+    region = inner_labels.clip(0)
+    scores = []
+    for color in (BLACK, WHITE):
+        owned = empty & touches[color][region] & \
+            ~touches[BLACK + WHITE - color][region]
+        scores.append(((values == color) | owned).sum(axis=(1, 2)))
+    return scores
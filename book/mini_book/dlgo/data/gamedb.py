@@ -0,0 +1,320 @@
+"""A compact binary database of game records.
+
+``ingest`` parses SGF files and archives with a process pool (one archive
+per task) and writes one database file:
+
+* a 32 byte header: magic, number of games, offset of the index and
+  number of stored stones,
+* the moves of every game, one little-endian uint16 per stone: the setup
+  stones first, then the moves, each ``color_bit << 15 | point`` with
+  point ``(row - 1) * board_size + (col - 1)`` or 0x7fff for a pass,
+* the index, one ``INDEX_DTYPE`` record per game holding its offset into
+  the moves, the number of setup stones and moves, board size, handicap,
+  komi, ranks and winner.
+
+A worker packs the moves of its archive into an array of two bytes a
+stone, and they are appended to the file archive by archive as the results
+come back from the pool, so memory grows with the largest archive, never
+with the corpus; the index goes last
+because its size is only known at the end. The file is written under a
+temporary name and renamed once complete, and an archive that can't be
+read (truncated, corrupt, unreadable) is counted as skipped rather than
+stopping the ingest. ``GameDatabase`` memory-maps the file, which opens
+instantly whatever its size and reads only the games asked for.
+
+Ingest from the command line with::
+
+    python -m dlgo.data.gamedb games.db kgs/ gogod/ --workers 8
+"""
+import argparse
+import os
+import struct
+import tarfile
+import zlib
+from array import array
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from dlgo.gotypes import EMPTY, PLAYER_OF_COLOR, Player, Point
+from dlgo.sgf import (board_size, iter_games, open_records, play_moves,
+                      setup_state, setup_stones, winner)
+
+__all__ = [
+    'GameDatabase',
+    'INDEX_DTYPE',
+    'StoredGame',
+    'find_archives',
+    'ingest',
+    'parse_rank',
+]
+
+MAGIC = b'DLGODB1\0'
+_HEADER = struct.Struct('<8sQQQ')
+PASS_POINT = 0x7fff
+_WHITE_BIT = 0x8000
+
+INDEX_DTYPE = np.dtype([
+    ('offset', '<u8'),
+    ('num_moves', '<u4'),
+    ('num_setup', '<u2'),
+    ('board_size', 'u1'),
+    ('handicap', 'u1'),
+    ('komi', '<f4'),
+    ('black_rank', 'i1'),
+    ('white_rank', 'i1'),
+    ('winner', 'u1'),
+    ('_unused', 'u1'),
+])
+
+# What reading a damaged file or archive raises: malformed SGF, truncated
+# streams, bad tarballs and compressed data, I/O errors.
+_READ_ERRORS = (ValueError, EOFError, OSError, tarfile.TarError, zlib.error)
+
+_ARCHIVE_SUFFIXES = ('.sgf', '.sgf.gz', '.sgf.bz2', '.tar', '.tar.gz',
+                     '.tgz', '.tar.bz2', '.tbz2')
+
+StoredGame = namedtuple(
+    'StoredGame', 'board_size handicap komi black_rank white_rank winner '
+                  'setup moves')
+StoredGame.__doc__ = """One game read back from a GameDatabase: winner is
+a Player or None, setup and moves are lists of (Player, Point or None for
+a pass)."""
+
+
+def parse_rank(rank):
+    """Rank as a small int: kyu ranks negative, dan ranks positive and
+    professional dan ranks from 11 up, 0 when unknown.
+
+    >>> [parse_rank(r) for r in ('15k', '3d', '9p', '?', '')]
+    [-15, 3, 19, 0, 0]
+    """
+    rank = rank.strip().lower()
+    digits = rank.rstrip('kdp?* ')
+    if not digits.isdigit() or len(rank) == len(digits):
+        return 0
+    value = int(digits)
+    kind = rank[len(digits)]
+    if kind == 'k':
+        return -min(value, 127)
+    if kind == 'p':
+        return min(10 + value, 127)
+    return min(value, 127)
+
+
+def _pack(player, point, size):
+    bit = _WHITE_BIT if player == Player.white else 0
+    if point is None:
+        return bit | PASS_POINT
+    return bit | (point.row - 1) * size + (point.col - 1)
+
+
+def _unpack(values, size):
+    stones = []
+    for value in values.tolist():
+        player = Player.white if value & _WHITE_BIT else Player.black
+        point = value & PASS_POINT
+        if point == PASS_POINT:
+            stones.append((player, None))
+        else:
+            stones.append((player, Point(row=point // size + 1,
+                                         col=point % size + 1)))
+    return stones
+
+
+def _on_board(point, size):
+    return point is None or (1 <= point.row <= size and
+                             1 <= point.col <= size)
+
+
+def _number(properties, name, default, kind=int):
+    try:
+        return kind(properties[name][0])
+    except (KeyError, IndexError, ValueError):
+        return default
+
+
+def _convert(path):
+    """Parse one SGF file or archive into (moves, index, errors); index
+    offsets are relative to the start of these moves. The games read
+    before an archive turns out to be damaged are kept."""
+    packed = array('H')
+    rows = []
+    errors = 0
+    try:
+        for stream in open_records(path):
+            try:
+                for game in _read_games(stream):
+                    if game is None:
+                        errors += 1
+                        continue
+                    row, stones = game
+                    rows.append((len(packed),) + row)
+                    packed.extend(stones)
+            except ValueError:
+                errors += 1
+    except _READ_ERRORS:
+        errors += 1
+    return (np.array(packed, dtype='<u2'),
+            np.array(rows, dtype=INDEX_DTYPE), errors)
+
+
+def _read_games(stream):
+    """Yield the index row (without its offset) and packed stones of every
+    game of an SGF stream, or None for a game that can't be stored."""
+    for properties, moves in iter_games(stream):
+        size = board_size(properties)
+        if not 1 <= size <= 25:
+            yield None
+            continue
+        setup = setup_stones(properties, size)
+        if not all(_on_board(point, size) for _, point in setup + moves):
+            yield None
+            continue
+        game_winner = winner(_number(properties, 'RE', '', str))
+        handicap = min(max(_number(properties, 'HA', 0), 0), 255)
+        row = (len(moves), len(setup), size, handicap,
+               _number(properties, 'KM', 0.0, float),
+               parse_rank(_number(properties, 'BR', '', str)),
+               parse_rank(_number(properties, 'WR', '', str)),
+               game_winner.value if game_winner else EMPTY, 0)
+        yield row, [_pack(player, point, size)
+                    for player, point in setup + moves]
+
+
+def find_archives(paths):
+    """SGF files and archives under paths, in sorted order."""
+    found = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                found.extend(os.path.join(root, name) for name in sorted(files)
+                             if name.lower().endswith(_ARCHIVE_SUFFIXES))
+        else:
+            found.append(path)
+    return found
+
+
+def ingest(output, paths, num_workers=None):
+    """Convert the SGF files and archives under paths into a database at
+    output and return (number of games, number of unreadable games and
+    archives)."""
+    archives = find_archives(paths)
+    index = []
+    errors = 0
+    offset = 0
+    # Written aside and renamed when complete, so output never holds a
+    # database without its header and index.
+    partial = output + '.part'
+    try:
+        with open(partial, 'wb') as f:
+            f.write(_HEADER.pack(MAGIC, 0, 0, 0))
+            with ProcessPoolExecutor(max_workers=num_workers) as pool:
+                for moves, rows, bad in pool.map(_convert, archives):
+                    moves.tofile(f)
+                    rows['offset'] += offset
+                    offset += len(moves)
+                    index.append(rows)
+                    errors += bad
+            index = np.concatenate(index) if index else \
+                np.zeros(0, dtype=INDEX_DTYPE)
+            index_offset = f.tell()
+            index.tofile(f)
+            f.seek(0)
+            f.write(_HEADER.pack(MAGIC, len(index), index_offset, offset))
+    except BaseException:
+        if os.path.exists(partial):
+            os.remove(partial)
+        raise
+    os.replace(partial, output)
+    return len(index), errors
+
+
+class GameDatabase():
+    """Random access to the games of a database file.
+
+    >>> import io, os, tempfile
+    >>> directory = tempfile.mkdtemp()
+    >>> with open(os.path.join(directory, 'a.sgf'), 'w') as f:
+    ...     _ = f.write('(;SZ[9]KM[6.5]BR[3d]WR[2k]RE[W+R];B[ee];W[])')
+    >>> with open(os.path.join(directory, 'b.sgf'), 'w') as f:
+    ...     _ = f.write('(;SZ[9]HA[2]AB[cc][gg];W[ee])')
+    >>> path = os.path.join(directory, 'games.db')
+    >>> ingest(path, [directory], num_workers=1)
+    (2, 0)
+    >>> db = GameDatabase(path)
+    >>> game = db[0]
+    >>> game.winner, game.komi, game.black_rank, game.white_rank, game.moves
+    (<Player.white: 2>, 6.5, 3, -2, [(<Player.black: 1>, \
+Point(row=5, col=5)), (<Player.white: 2>, None)])
+    >>> len(db[1].setup), db[1].handicap, len(list(db.positions(1)))
+    (2, 2, 1)
+    """
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            magic, num_games, index_offset, num_moves = _HEADER.unpack(
+                f.read(_HEADER.size))
+        if magic != MAGIC:
+            raise ValueError('{} is not a game database'.format(path))
+        self.path = path
+        self.moves = np.memmap(path, dtype='<u2', mode='r',
+                               offset=_HEADER.size, shape=(num_moves,)) \
+            if num_moves else np.zeros(0, dtype='<u2')
+        self.index = np.memmap(path, dtype=INDEX_DTYPE, mode='r',
+                               offset=index_offset, shape=(num_games,)) \
+            if num_games else np.zeros(0, dtype=INDEX_DTYPE)
+
+    def __len__(self):
+        return len(self.index)
+
+    def __getitem__(self, i):
+        entry = self.index[i]
+        size = int(entry['board_size'])
+        start = int(entry['offset'])
+        num_setup = int(entry['num_setup'])
+        stop = start + num_setup + int(entry['num_moves'])
+        stones = _unpack(self.moves[start:stop], size)
+        return StoredGame(
+            size, int(entry['handicap']), float(entry['komi']),
+            int(entry['black_rank']), int(entry['white_rank']),
+            PLAYER_OF_COLOR[int(entry['winner'])],
+            stones[:num_setup], stones[num_setup:])
+
+    def sample(self, n, rng=None, min_rank=None):
+        """Indices of n games drawn at random, optionally only from games
+        whose players both have a known rank of at least min_rank."""
+        rng = rng or np.random.default_rng()
+        candidates = np.arange(len(self))
+        if min_rank is not None:
+            keep = np.ones(len(self), dtype=bool)
+            for key in ('black_rank', 'white_rank'):
+                ranks = self.index[key]
+                keep &= (ranks >= min_rank) & (ranks != 0)
+            candidates = candidates[keep]
+        return rng.choice(candidates, size=n, replace=False)
+
+    def positions(self, i):
+        """Iterator of (game_state, move) before every move of game i, up
+        to the first move that can't be played."""
+        game = self[i]
+        first = game.moves[0][0] if game.moves else Player.black
+        return play_moves(
+            setup_state(game.board_size, game.setup, first), game.moves)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Convert SGF files and archives into a game database.')
+    parser.add_argument('output')
+    parser.add_argument('paths', nargs='+')
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args(argv)
+    games, errors = ingest(args.output, args.paths, args.workers)
+    print('{} games written to {}, {} unreadable'.format(
+        games, args.output, errors))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,261 @@
+"""Training positions on disk: sharded .npy files and a prefetching loader.
+
+``write_shards`` replays game records, encodes every position before a
+move into feature planes and writes them ``shard_size`` positions at a
+time as ``<prefix>_<n>_features.npy`` with the matching point indices of
+the moves in ``<prefix>_<n>_labels.npy``, so only one shard is ever held
+in memory.
+
+``ShardedDataset`` opens the shards with ``mmap_mode='r'``, so the OS
+pages in only what is read. ``DataLoader`` walks the shards in a random
+order, shuffles positions within a window of consecutive positions (a
+window much larger than a mini-batch decorrelates batches while keeping
+reads local) and gathers each mini-batch on a background thread, a few
+batches ahead of the training loop.
+"""
+import glob
+import os
+import queue
+import re
+import threading
+import time
+
+import numpy as np
+
+from dlgo.batch_selfplay import PASS
+from dlgo.data.symmetry import random_symmetry
+from dlgo.goboard_fast import GameState
+from dlgo.goboard_slow import Move
+from dlgo.gotypes import Point
+
+__all__ = [
+    'DataLoader',
+    'ShardedDataset',
+    'write_shards',
+]
+
+
+def _shard_path(directory, prefix, shard, kind):
+    return os.path.join(directory, '{}_{:05d}_{}.npy'.format(
+        prefix, shard, kind))
+
+
+def _positions(record, encoder):
+    """(features, label) for every play in a GameRecord; passes only
+    advance the game."""
+    size = record.board_size
+    game = GameState.new_game(size)
+    for move in record.moves:
+        move = int(move)
+        if move == PASS:
+            game = game.apply_move(Move.pass_turn())
+            continue
+        point = Point(row=move // size + 1, col=move % size + 1)
+        yield encoder.encode(game), encoder.encode_point(point)
+        game = game.apply_move(Move.play(point))
+
+
+def write_shards(records, directory, encoder, shard_size=4096,
+                 prefix='train', dtype=np.int8):
+    """Encode the positions of records into shards and return the number
+    of positions written."""
+    os.makedirs(directory, exist_ok=True)
+    features = np.empty((shard_size,) + encoder.shape(), dtype=dtype)
+    labels = np.empty(shard_size, dtype=np.int16)
+    shard = filled = total = 0
+    for record in records:
+        for x, y in _positions(record, encoder):
+            features[filled] = x
+            labels[filled] = y
+            filled += 1
+            if filled == shard_size:
+                _save(directory, prefix, shard, features, labels)
+                shard += 1
+                total += filled
+                filled = 0
+    if filled:
+        _save(directory, prefix, shard, features[:filled], labels[:filled])
+        total += filled
+    return total
+
+
+def _save(directory, prefix, shard, features, labels):
+    np.save(_shard_path(directory, prefix, shard, 'features'), features)
+    np.save(_shard_path(directory, prefix, shard, 'labels'), labels)
+
+
+class ShardedDataset():
+    """Memory-mapped view of the shards written under one prefix."""
+    def __init__(self, directory, prefix='train'):
+        shard_name = re.compile(re.escape(prefix) + r'_(\d+)_features\.npy\Z')
+        shards = []
+        for path in glob.glob(os.path.join(
+                glob.escape(directory), glob.escape(prefix) + '_*.npy')):
+            match = shard_name.match(os.path.basename(path))
+            if match:
+                shards.append((int(match.group(1)), path))
+        paths = [path for _, path in sorted(shards)]
+        if not paths:
+            raise ValueError('no shards {} in {}'.format(prefix, directory))
+        self.features = [np.load(path, mmap_mode='r') for path in paths]
+        self.labels = [np.load(path[:-len('features.npy')] + 'labels.npy',
+                               mmap_mode='r') for path in paths]
+        self.shard_sizes = np.array([len(y) for y in self.labels])
+
+    def __len__(self):
+        return int(self.shard_sizes.sum())
+
+    @property
+    def shape(self):
+        return self.features[0].shape[1:]
+
+    @property
+    def dtype(self):
+        return self.features[0].dtype
+
+
+class DataLoader():
+    """Iterate over mini-batches of a ShardedDataset, one epoch per
+    ``iter()``.
+
+    Each batch is a ``(features, labels)`` pair of (batch, planes, rows,
+    cols) and (batch,) arrays. They are views of a small ring of buffers
+    and stay valid until the next batch is requested. ``wait_time`` adds up
+    how long the training loop waited for a batch and ``stalls`` how many
+    batches were not ready when asked for.
+
+    With ``augment=True`` every position is transformed by a random board
+    symmetry on the loader thread; the batch is then a new pair of arrays.
+
+    >>> import tempfile
+    >>> from dlgo.batch_selfplay import BatchSelfPlay
+    >>> from dlgo.encoders.oneplane import OnePlaneEncoder
+    >>> records = BatchSelfPlay(4, board_size=5, seed=0).play(4)
+    >>> directory = tempfile.mkdtemp()
+    >>> total = write_shards(records, directory, OnePlaneEncoder((5, 5)),
+    ...                      shard_size=64)
+    >>> loader = DataLoader(ShardedDataset(directory), batch_size=32, seed=0)
+    >>> sum(len(labels) for _, labels in loader) == total
+    True
+    >>> features, labels = next(iter(loader))
+    >>> features.shape, labels.shape
+    ((32, 1, 5, 5), (32,))
+    """
+    def __init__(self, dataset, batch_size, shuffle_window=65536,
+                 prefetch=2, drop_last=False, augment=False, seed=None):
+        self.dataset = dataset
+        self.batch_size = batch_size
+        self.shuffle_window = max(shuffle_window, batch_size)
+        self.prefetch = prefetch
+        self.drop_last = drop_last
+        self.augment = augment
+        self.rng = np.random.default_rng(seed)
+        ring = prefetch + 2
+        self._features = np.empty(
+            (ring, batch_size) + dataset.shape, dtype=dataset.dtype)
+        self._labels = np.empty((ring, batch_size), dtype=np.int16)
+        self.num_batches = 0
+        self.stalls = 0
+        self.wait_time = 0.0
+
+    def __len__(self):
+        full, rest = divmod(len(self.dataset), self.batch_size)
+        return full + (1 if rest and not self.drop_last else 0)
+
+    def __iter__(self):
+        ready = queue.Queue(maxsize=self.prefetch)
+        stop = threading.Event()
+        seed = self.rng.integers(1 << 63)
+        thread = threading.Thread(
+            target=self._produce, args=(ready, stop, seed), daemon=True)
+        thread.start()
+        try:
+            while True:
+                start = time.perf_counter()
+                if ready.empty():
+                    self.stalls += 1
+                item = ready.get()
+                self.wait_time += time.perf_counter() - start
+                if item is None:
+                    return
+                if isinstance(item, BaseException):
+                    raise item
+                self.num_batches += 1
+                yield item
+        finally:
+            stop.set()
+            while thread.is_alive():
+                try:
+                    ready.get(timeout=0.01)
+                except queue.Empty:
+                    pass
+            thread.join()
+
+    def _produce(self, ready, stop, seed):
+        try:
+            rng = np.random.default_rng(seed)
+            for slot, (shards, offsets) in enumerate(self._batches(rng)):
+                if stop.is_set():
+                    return
+                features, labels = self._gather(
+                    slot % len(self._labels), shards, offsets)
+                if self.augment:
+                    features, labels, _ = random_symmetry(
+                        features, labels, rng)
+                ready.put((features, labels))
+            ready.put(None)
+        except BaseException as error:
+            ready.put(error)
+
+    def _batches(self, rng):
+        """(shard, offset) arrays for every batch of one epoch."""
+        sizes = self.dataset.shard_sizes
+        window = self.shuffle_window
+        carry = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64))
+        pieces, filled = [], 0
+        for shard in rng.permutation(len(sizes)):
+            start = 0
+            while start < sizes[shard]:
+                take = min(int(sizes[shard]) - start, window - filled)
+                pieces.append((np.full(take, shard),
+                               np.arange(start, start + take)))
+                start += take
+                filled += take
+                if filled == window:
+                    carry = yield from self._split(pieces, carry, rng)
+                    pieces, filled = [], 0
+        carry = yield from self._split(pieces, carry, rng)
+        if len(carry[0]) and not self.drop_last:
+            yield carry
+
+    def _split(self, pieces, carry, rng):
+        """Shuffle one window and yield its full batches, returning the
+        positions left over for the next window."""
+        if not pieces:
+            return carry
+        shards = np.concatenate([carry[0]] + [p[0] for p in pieces])
+        offsets = np.concatenate([carry[1]] + [p[1] for p in pieces])
+        order = rng.permutation(len(shards))
+        shards, offsets = shards[order], offsets[order]
+        full = len(shards) - len(shards) % self.batch_size
+        for start in range(0, full, self.batch_size):
+            stop = start + self.batch_size
+            yield shards[start:stop], offsets[start:stop]
+        return shards[full:], offsets[full:]
+
+    def _gather(self, slot, shards, offsets):
+        # Read shard by shard in file order; the order of positions
+        # within a batch doesn't matter for gradient descent.
+        order = np.lexsort((offsets, shards))
+        shards, offsets = shards[order], offsets[order]
+        n = len(shards)
+        features = self._features[slot, :n]
+        labels = self._labels[slot, :n]
+        bounds = np.flatnonzero(np.diff(shards)) + 1
+        for start, stop in zip(np.r_[0, bounds], np.r_[bounds, n]):
+            shard = shards[start]
+            np.take(self.dataset.features[shard], offsets[start:stop],
+                    axis=0, out=features[start:stop])
+            np.take(self.dataset.labels[shard], offsets[start:stop],
+                    out=labels[start:stop])
+        return features, labels
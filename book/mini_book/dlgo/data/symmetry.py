@@ -0,0 +1,152 @@
+"""The eight symmetries of a square Go board, applied to whole batches.
+
+Symmetry k rotates the board k % 4 quarter turns and then, for k >= 4,
+mirrors it along the main diagonal. Planes are transformed with
+``np.rot90`` and transpose views, which NumPy copies with strided loops
+faster than a gather through an index table; a batch with a symmetry per
+sample is copied in eight groups, one per symmetry, never one sample at a
+time. Move labels go through a table of where each symmetry moves every
+point, with the pass label (one past the last point) mapped to itself.
+
+For MCTS evaluation, ``random_symmetry`` transforms each input position by
+a random symmetry and ``restore_policy`` maps the network's move priors
+back onto the original board.
+"""
+import functools
+
+import numpy as np
+
+__all__ = [
+    'NUM_SYMMETRIES',
+    'augment_all',
+    'random_symmetry',
+    'restore_policy',
+    'transform_labels',
+    'transform_planes',
+]
+
+NUM_SYMMETRIES = 8
+# Rotating back undoes a rotation; a rotation followed by the transpose
+# is its own inverse.
+INVERSE = (0, 3, 2, 1, 4, 5, 6, 7)
+
+
+@functools.lru_cache(maxsize=None)
+def _targets(board_size):
+    """``targets[k, j]`` is where symmetry k moves point j; the last entry
+    is the pass label."""
+    points = np.arange(board_size * board_size + 1)
+    sources = np.empty((NUM_SYMMETRIES, len(points)), dtype=np.intp)
+    for k in range(NUM_SYMMETRIES):
+        sources[k, :-1] = _view(
+            points[:-1].reshape(board_size, board_size), k).ravel()
+        sources[k, -1] = points[-1]
+    targets = np.argsort(sources, axis=1)
+    targets.flags.writeable = False
+    return targets
+
+
+def _board_size(planes):
+    rows, cols = planes.shape[-2:]
+    if rows != cols:
+        raise ValueError('symmetries need a square board, got {}x{}'.format(
+            rows, cols))
+    return rows
+
+
+def _view(boards, k):
+    """Symmetry k of (..., size, size) arrays, as a view."""
+    view = np.rot90(boards, k % 4, axes=(-2, -1))
+    return view.swapaxes(-1, -2) if k >= 4 else view
+
+
+def _grouped(boards, symmetries, inverse=False):
+    """Copy of boards with boards[i] under symmetries[i]."""
+    out = np.empty_like(boards)
+    for k in range(NUM_SYMMETRIES):
+        chosen = np.flatnonzero(symmetries == k)
+        if len(chosen):
+            out[chosen] = _view(boards[chosen], INVERSE[k] if inverse else k)
+    return out
+
+
+def transform_planes(planes, symmetries):
+    """Apply symmetries (one int, or one per sample) to (N, planes, size,
+    size) feature planes. A single symmetry gives a view.
+
+    >>> planes = np.arange(4).reshape(1, 1, 2, 2)
+    >>> transform_planes(planes, 1)[0, 0]
+    array([[1, 3],
+           [0, 2]])
+    """
+    _board_size(planes)
+    if np.ndim(symmetries) == 0:
+        return _view(planes, symmetries)
+    return _grouped(planes, np.asarray(symmetries))
+
+
+def transform_labels(labels, symmetries, board_size):
+    """Point indices (num_points for a pass) under symmetries.
+
+    >>> transform_labels(np.array([0, 4]), 1, 2)
+    array([2, 4])
+    """
+    targets = _targets(board_size)
+    return targets[symmetries, labels]
+
+
+def restore_policy(priors, symmetries, board_size):
+    """Map (N, num_points[ + 1]) priors computed on transformed positions
+    back to the points of the original positions."""
+    num_points = board_size * board_size
+    boards = priors[:, :num_points].reshape(-1, board_size, board_size)
+    out = np.empty_like(priors)
+    out[:, num_points:] = priors[:, num_points:]
+    restored = out[:, :num_points].reshape(boards.shape)
+    if np.ndim(symmetries) == 0:
+        restored[...] = _view(boards, INVERSE[symmetries])
+    else:
+        restored[...] = _grouped(boards, np.asarray(symmetries),
+                                 inverse=True)
+    return out
+
+
+def augment_all(planes, labels):
+    """All eight symmetries of every sample, as (8 * N, ...) planes and
+    labels grouped by symmetry.
+
+    >>> planes = np.zeros((3, 2, 5, 5), dtype=np.int8)
+    >>> x, y = augment_all(planes, np.array([0, 12, 25]))
+    >>> x.shape, sorted(set(y[2::3].tolist()))
+    ((24, 2, 5, 5), [25])
+    """
+    size = _board_size(planes)
+    out = np.empty((NUM_SYMMETRIES,) + planes.shape, dtype=planes.dtype)
+    for k in range(NUM_SYMMETRIES):
+        out[k] = _view(planes, k)
+    targets = _targets(size)
+    return (out.reshape((NUM_SYMMETRIES * len(planes),) + planes.shape[1:]),
+            targets[:, labels].ravel())
+
+
+def random_symmetry(planes, labels=None, rng=None):
+    """Transform every sample by its own random symmetry.
+
+    Returns the planes, the labels if given and the symmetries used, which
+    restore_policy takes to undo the transform on network outputs.
+
+    >>> rng = np.random.default_rng(0)
+    >>> planes = rng.integers(0, 2, (16, 1, 9, 9))
+    >>> moved, symmetries = random_symmetry(planes, rng=rng)
+    >>> flat = moved.reshape(16, 81).astype(float)
+    >>> np.array_equal(restore_policy(flat, symmetries, 9),
+    ...                planes.reshape(16, 81))
+    True
+    """
+    rng = rng or np.random.default_rng()
+    size = _board_size(planes)
+    symmetries = rng.integers(0, NUM_SYMMETRIES, len(planes))
+    moved = _grouped(planes, symmetries)
+    if labels is None:
+        return moved, symmetries
+    return moved, transform_labels(labels, symmetries, size), symmetries
@@ -0,0 +1,44 @@
+import importlib
+
+__all__ = [
+    'Encoder',
+    'get_encoder_by_name',
+]
+
+
+class Encoder():
+    """Turns game states into feature planes and moves into point indices.
+
+    ``shape()`` is the (planes, rows, cols) shape of an encoded state and
+    points are numbered ``cols * (row - 1) + (col - 1)``.
+    """
+    def name(self):
+        raise NotImplementedError()
+
+    def encode(self, game_state):
+        raise NotImplementedError()
+
+    def encode_point(self, point):
+        raise NotImplementedError()
+
+    def decode_point_index(self, index):
+        raise NotImplementedError()
+
+    def num_points(self):
+        raise NotImplementedError()
+
+    def shape(self):
+        raise NotImplementedError()
+
+
+def get_encoder_by_name(name, board_size):
+    """Create the encoder of the dlgo.encoders module called name.
+
+    >>> get_encoder_by_name('oneplane', 9).shape()
+    (1, 9, 9)
+    """
+    if isinstance(board_size, int):
+        board_size = (board_size, board_size)
+    module = importlib.import_module('dlgo.encoders.' + name)
+    constructor = getattr(module, 'create')
+    return constructor(board_size)
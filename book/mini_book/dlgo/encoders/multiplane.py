@@ -0,0 +1,176 @@
+"""Feature planes kept up to date move by move.
+
+``MultiPlaneEncoder`` encodes a goboard_fast game state into 13 float32
+planes, from the point of view of the player to move:
+
+* 0-3: the player's stones, then those of its strings with 1, 2 and 3 or
+  more liberties,
+* 4-7: the same for the opponent's stones,
+* 8-11: the stones played 1, 2, 3 and 4 turns ago,
+* 12: the point the player may not play because of ko.
+
+The stone and liberty planes are kept in black/white order in one padded
+array per plane. When the next state to encode continues the line of play
+of the last one, only the strings that changed are rewritten: the string
+of the stone placed, the opponent strings next to it, which lost a
+liberty, and the strings next to captured stones, which gained some.
+Anything else (another game, a jump back in the same game) rebuilds the
+planes from the board. The move and ko planes need only the last few
+states and are written when encoding.
+"""
+import numpy as np
+
+from dlgo.encoders.base import Encoder
+from dlgo.goboard_fast import Move, line_from
+from dlgo.gotypes import BLACK, EMPTY, WHITE, Point
+
+__all__ = [
+    'MultiPlaneEncoder',
+]
+
+NUM_HISTORY = 4
+
+
+class MultiPlaneEncoder(Encoder):
+    """
+    >>> from dlgo.goboard_fast import GameState
+    >>> encoder = MultiPlaneEncoder((5, 5))
+    >>> game = GameState.new_game(5)
+    >>> for point in (Point(1, 1), Point(1, 2), Point(3, 3), Point(2, 1)):
+    ...     game = game.apply_move(Move.play(point))
+    >>> planes = encoder.encode(game)
+    >>> planes.dtype, planes.shape, planes.flags.c_contiguous
+    (dtype('float32'), (13, 5, 5), True)
+    >>> [int(planes[k].sum()) for k in range(13)]
+    [1, 0, 0, 1, 2, 0, 0, 2, 1, 1, 1, 0, 0]
+    """
+    def __init__(self, board_size, max_catch_up=8):
+        self.board_width, self.board_height = board_size
+        self.num_planes = 8 + NUM_HISTORY + 1
+        self.max_catch_up = max_catch_up
+        self.num_rebuilds = 0
+        self._board = None
+        self._geometry = None
+        self._stones = None
+
+    def name(self):
+        return 'multiplane'
+
+    def encode(self, game_state):
+        out = np.empty(self.shape(), dtype=np.float32)
+        self.encode_into(game_state, out)
+        return out
+
+    def encode_into(self, game_state, out):
+        """Write the planes of game_state into out, a (planes, rows, cols)
+        float32 array such as one entry of a batch."""
+        self._sync(game_state)
+        rows, cols = self.board_height, self.board_width
+        inner = self._stones[:, 1:rows + 1, 1:cols + 1]
+        if game_state.next_player.value == BLACK:
+            out[:8] = inner
+        else:
+            out[:4] = inner[4:]
+            out[4:8] = inner[:4]
+        out[8:] = 0
+        board = game_state.board
+        state = game_state
+        seen = set()
+        for k in range(NUM_HISTORY):
+            if state is None or state.last_move is None:
+                break
+            move = state.last_move
+            if move.is_play and move.point not in seen:
+                seen.add(move.point)
+                if board.get(move.point) is not None:
+                    out[8 + k, move.point.row - 1, move.point.col - 1] = 1
+            state = state.previous_state
+        ko = self._ko_point(game_state)
+        if ko is not None:
+            out[8 + NUM_HISTORY, ko.row - 1, ko.col - 1] = 1
+
+    def _ko_point(self, game_state):
+        move = game_state.last_move
+        board = game_state.board
+        if move is None or not move.is_play or \
+                len(board.last_captures) != 1:
+            return None
+        point = board.point(board.last_captures[0])
+        if game_state.does_move_violate_ko(game_state.next_player,
+                                           Move.play(point)):
+            return point
+        return None
+
+    def _sync(self, game_state):
+        board = game_state.board
+        if board is self._board:
+            return
+        line = None
+        if board.geometry is self._geometry:
+            line = line_from(self._board, game_state, self.max_catch_up)
+        if line is None:
+            self._rebuild(board)
+            return
+        for state in line:
+            self._replay(state)
+        self._board = board
+
+    def _rebuild(self, board):
+        self.num_rebuilds += 1
+        geometry = board.geometry
+        if geometry is not self._geometry:
+            self._geometry = geometry
+            self._stones = np.zeros(
+                (8, geometry.num_rows + 2, geometry.width), dtype=np.float32)
+        self._stones[...] = 0
+        self._board = board
+        done = set()
+        colors = board.colors
+        for idx in geometry.points:
+            if colors[idx] != EMPTY and idx not in done:
+                done.update(self._write_string(board, idx))
+
+    def _replay(self, state):
+        board = state.board
+        colors = board.colors
+        idx = board.index(state.last_move.point)
+        flat = self._stones.reshape(8, -1)
+        for stone in board.last_captures:
+            flat[:, stone] = 0
+        strings = [idx]
+        strings.extend(board.geometry.neighbors[idx])
+        for stone in board.last_captures:
+            strings.extend(board.geometry.neighbors[stone])
+        done = set()
+        for n in strings:
+            if colors[n] in (BLACK, WHITE) and n not in done:
+                done.update(self._write_string(board, n))
+
+    def _write_string(self, board, idx):
+        """Rewrite the planes of the string through idx and return its
+        stones."""
+        stones, liberties = board.string_of(idx)
+        offset = 0 if board.colors[idx] == BLACK else 4
+        flat = self._stones.reshape(8, -1)
+        flat[offset:offset + 4, stones] = 0
+        flat[offset, stones] = 1
+        flat[offset + min(liberties, 3), stones] = 1
+        return stones
+
+    def encode_point(self, point):
+        return self.board_width * (point.row - 1) + (point.col - 1)
+
+    def decode_point_index(self, index):
+        row = index // self.board_width
+        col = index % self.board_width
+        return Point(row=row + 1, col=col + 1)
+
+    def num_points(self):
+        return self.board_width * self.board_height
+
+    def shape(self):
+        return self.num_planes, self.board_height, self.board_width
+
+
+def create(board_size):
+    return MultiPlaneEncoder(board_size)
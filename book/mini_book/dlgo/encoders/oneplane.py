@@ -0,0 +1,58 @@
+import numpy as np
+
+from dlgo.encoders.base import Encoder
+from dlgo.gotypes import Point
+
+__all__ = [
+    'OnePlaneEncoder',
+]
+
+
+class OnePlaneEncoder(Encoder):
+    """One plane: 1 for the stones of the player to move, -1 for the
+    opponent's and 0 for empty points.
+
+    >>> from dlgo.goboard_fast import GameState, Move
+    >>> encoder = OnePlaneEncoder((5, 5))
+    >>> game = GameState.new_game(5).apply_move(Move.play(Point(1, 2)))
+    >>> encoder.encode(game)[0, 0]
+    array([ 0, -1,  0,  0,  0], dtype=int8)
+    >>> encoder.decode_point_index(encoder.encode_point(Point(3, 4)))
+    Point(row=3, col=4)
+    """
+    def __init__(self, board_size):
+        self.board_width, self.board_height = board_size
+        self.num_planes = 1
+
+    def name(self):
+        return 'oneplane'
+
+    def encode(self, game_state):
+        board_matrix = np.zeros(self.shape(), dtype=np.int8)
+        next_player = game_state.next_player
+        for r in range(self.board_height):
+            for c in range(self.board_width):
+                p = Point(row=r + 1, col=c + 1)
+                color = game_state.board.get(p)
+                if color is None:
+                    continue
+                board_matrix[0, r, c] = 1 if color == next_player else -1
+        return board_matrix
+
+    def encode_point(self, point):
+        return self.board_width * (point.row - 1) + (point.col - 1)
+
+    def decode_point_index(self, index):
+        row = index // self.board_width
+        col = index % self.board_width
+        return Point(row=row + 1, col=col + 1)
+
+    def num_points(self):
+        return self.board_width * self.board_height
+
+    def shape(self):
+        return self.num_planes, self.board_height, self.board_width
+
+
+def create(board_size):
+    return OnePlaneEncoder(board_size)
@@ -0,0 +1,143 @@
+"""Batch leaf evaluations from concurrent searches into one forward pass.
+
+An EvaluationQueue is an MCTS evaluator: every search thread that reaches
+a leaf encodes its game state, puts it in the queue and blocks. A batching
+thread waits until batch_size requests are queued or max_wait seconds have
+passed since it started collecting, stacks the inputs, runs the model once
+and hands each caller its row of the output.
+"""
+import threading
+import time
+
+import numpy as np
+
+__all__ = [
+    'EvaluationQueue',
+]
+
+
+class _Request():
+    __slots__ = ('features', 'priors', 'value', 'error', 'done')
+
+    def __init__(self, features):
+        self.features = features
+        self.priors = None
+        self.value = None
+        self.error = None
+        self.done = threading.Event()
+
+
+class EvaluationQueue():
+    """Evaluate game states in batches.
+
+    ``encoder(game_state)`` turns a state into a model input and
+    ``model(inputs)`` maps a stacked batch of inputs to ``(priors, values)``
+    with one row of priors and one value per input.
+
+    >>> from dlgo.goboard_fast import GameState
+    >>> from dlgo.mcts import MCTS
+    >>> model = lambda x: (np.ones((len(x), 82)) / 82, np.zeros(len(x)))
+    >>> with EvaluationQueue(model, lambda state: np.zeros(4),
+    ...                      batch_size=4) as queue:
+    ...     search = MCTS(queue, capacity=20000, num_threads=4)
+    ...     move = search.select_move(GameState.new_game(9), 40)
+    >>> queue.num_evaluations
+    40
+    >>> 0 < queue.batch_fill <= 1
+    True
+    """
+    def __init__(self, model, encoder, batch_size=16, max_wait=0.001):
+        self.model = model
+        self.encoder = encoder
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self.num_batches = 0
+        self.num_evaluations = 0
+        self.max_queue_depth = 0
+        self._queue_depth_total = 0
+        self._pending = []
+        self._closed = False
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    @property
+    def mean_batch_size(self):
+        if not self.num_batches:
+            return 0.0
+        return self.num_evaluations / self.num_batches
+
+    @property
+    def batch_fill(self):
+        """Mean fraction of batch_size used by each forward pass."""
+        return self.mean_batch_size / self.batch_size
+
+    @property
+    def mean_queue_depth(self):
+        """Mean number of queued requests when a batch was formed."""
+        if not self.num_batches:
+            return 0.0
+        return self._queue_depth_total / self.num_batches
+
+    def __call__(self, game_state):
+        request = _Request(self.encoder(game_state))
+        with self._cond:
+            if self._closed:
+                raise RuntimeError('EvaluationQueue is closed')
+            self._pending.append(request)
+            self.max_queue_depth = max(self.max_queue_depth,
+                                       len(self._pending))
+            self._cond.notify()
+        request.done.wait()
+        if request.error is not None:
+            raise request.error
+        return request.priors, request.value
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._closed:
+                    self._cond.wait()
+                if not self._pending:
+                    return
+                deadline = time.monotonic() + self.max_wait
+                while len(self._pending) < self.batch_size and \
+                        not self._closed:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                self._queue_depth_total += len(self._pending)
+                batch = self._pending[:self.batch_size]
+                del self._pending[:self.batch_size]
+            self._evaluate(batch)
+
+    def _evaluate(self, batch):
+        try:
+            inputs = np.stack([request.features for request in batch])
+            priors, values = self.model(inputs)
+        except Exception as error:
+            for request in batch:
+                request.error = error
+                request.done.set()
+            return
+        self.num_batches += 1
+        self.num_evaluations += len(batch)
+        for i, request in enumerate(batch):
+            # A copy: the model may reuse its output buffer for the next
+            # batch, and callers keep the priors.
+            request.priors = np.array(priors[i])
+            request.value = float(values[i])
+            request.done.set()
@@ -0,0 +1,167 @@
+"""Per-size lookup tables for boards stored as padded flat arrays.
+
+A point (row, col) lives at index ``row * (num_cols + 2) + col`` of an
+array with a one-point border, as in goboard_fast, so every neighbor and
+diagonal of an on-board point is a valid index. ``geometry(rows, cols)``
+builds the tables for a size the first time it is asked for and returns
+the same object afterwards; all boards, agents and encoders of that size
+share it. Nothing in it is ever modified: the Python tables are tuples and
+the NumPy ones are flagged read-only. Processes forked after ``warm`` skip
+building the tables, but only the NumPy arrays keep sharing their pages;
+the tuples are copied page by page as soon as reference counting touches
+them.
+"""
+from array import array
+from functools import lru_cache
+
+import numpy as np
+
+from dlgo.gotypes import BORDER, EMPTY, Move, Point
+
+__all__ = [
+    'Geometry',
+    'geometry',
+    'star_points',
+    'warm',
+]
+
+
+def star_points(num_rows, num_cols):
+    """The (row, col) points traditionally marked on a board.
+
+    >>> star_points(9, 9)
+    [(3, 3), (3, 7), (5, 5), (7, 3), (7, 7)]
+    >>> len(star_points(19, 19)), star_points(5, 5)
+    (9, [])
+    """
+    if min(num_rows, num_cols) < 7:
+        return []
+
+    def lines(size):
+        edge = 4 if size >= 12 else 3
+        far = size + 1 - edge
+        middle = (size + 1) // 2 if size % 2 else None
+        return edge, middle, far
+
+    rows, cols = lines(num_rows), lines(num_cols)
+    points = []
+    for i, row in enumerate(rows):
+        for j, col in enumerate(cols):
+            if row is None or col is None:
+                continue
+            is_side = (i == 1) != (j == 1)
+            # Side stars only on the larger boards, the center on any odd
+            # board.
+            if is_side and min(num_rows, num_cols) < 15:
+                continue
+            points.append((row, col))
+    return points
+
+
+class Geometry():
+    """Tables of one board size.
+
+    ``points`` are the padded indices of the on-board points in row-major
+    order. ``neighbors[idx]`` and ``diagonals[idx]`` are 4-tuples of padded
+    indices for on-board idx and empty tuples elsewhere; border indices
+    appear in them, which is what eye detection counts. ``edge_distance``
+    is the number of lines between a point and the nearest edge (0 on the
+    first line, -1 off the board), ``star_points`` the padded indices of
+    the star points and ``empty_colors`` a board array with EMPTY on the
+    board and BORDER around it, to copy into new boards. ``point_at[idx]``
+    is the (interned) Point of every padded index, border included, and
+    ``moves[idx]`` the play at an on-board idx, None elsewhere, so going
+    from an index to a point or move is a tuple lookup.
+
+    >>> g = geometry(9, 9)
+    >>> g is geometry(9, 9), g.neighbors[12], g.diagonals[12]
+    (True, (1, 23, 11, 13), (0, 2, 22, 24))
+    >>> int(g.edge_distance[g.index(Point(5, 5))]), bool(g.is_corner[12])
+    (4, True)
+    >>> g.point_at[12] is Point(1, 1), g.moves[12] is Move.play(Point(1, 1))
+    (True, True)
+    """
+    def __init__(self, num_rows, num_cols):
+        self.num_rows = num_rows
+        self.num_cols = num_cols
+        self.width = width = num_cols + 2
+        self.size = (num_rows + 2) * width
+        self.num_points = num_rows * num_cols
+        self.points = tuple(row * width + col
+                            for row in range(1, num_rows + 1)
+                            for col in range(1, num_cols + 1))
+        neighbors = [()] * self.size
+        diagonals = [()] * self.size
+        for idx in self.points:
+            neighbors[idx] = (idx - width, idx + width, idx - 1, idx + 1)
+            diagonals[idx] = (idx - width - 1, idx - width + 1,
+                              idx + width - 1, idx + width + 1)
+        self.neighbors = tuple(neighbors)
+        self.diagonals = tuple(diagonals)
+        self.point_at = tuple(Point(*divmod(idx, width))
+                              for idx in range(self.size))
+        moves = [None] * self.size
+        for idx in self.points:
+            moves[idx] = Move.play(self.point_at[idx])
+        self.moves = tuple(moves)
+
+        grid = np.full((num_rows + 2, width), -1, dtype=np.int8)
+        rows = np.arange(1, num_rows + 1)[:, None]
+        cols = np.arange(1, num_cols + 1)[None, :]
+        grid[1:-1, 1:-1] = np.minimum(
+            np.minimum(rows - 1, num_rows - rows),
+            np.minimum(cols - 1, num_cols - cols))
+        self.edge_distance = self._frozen(grid.ravel())
+        self.on_edge = self._frozen(self.edge_distance == 0)
+        on_board = self.edge_distance >= 0
+        edge_count = sum(
+            (np.roll(grid, shift, axis) == -1)
+            for shift, axis in ((1, 0), (-1, 0), (1, 1), (-1, 1))).ravel()
+        self.is_corner = self._frozen(on_board & (edge_count == 2))
+        self.neighbor_array = self._frozen(
+            np.array([neighbors[idx] for idx in self.points], dtype=np.intp))
+        self.diagonal_array = self._frozen(
+            np.array([diagonals[idx] for idx in self.points], dtype=np.intp))
+        self.star_points = tuple(row * width + col
+                                 for row, col in star_points(num_rows,
+                                                             num_cols))
+        colors = array('b', [BORDER]) * self.size
+        for idx in self.points:
+            colors[idx] = EMPTY
+        self._empty_colors = colors
+
+    @staticmethod
+    def _frozen(values):
+        values.flags.writeable = False
+        return values
+
+    @property
+    def empty_colors(self):
+        """A fresh copy of the empty board array."""
+        return array('b', self._empty_colors)
+
+    def index(self, point):
+        return point.row * self.width + point.col
+
+    def point(self, idx):
+        return self.point_at[idx]
+
+
+def geometry(num_rows, num_cols=None):
+    """The shared Geometry of a num_rows x num_cols (default square)
+    board."""
+    return _geometry(num_rows, num_rows if num_cols is None else num_cols)
+
+
+@lru_cache(maxsize=None)
+def _geometry(num_rows, num_cols):
+    return Geometry(num_rows, num_cols)
+
+
+def warm(*sizes):
+    """Build the tables of the given board sizes now, e.g. before forking
+    worker processes that should share them."""
+    for size in sizes:
+        if isinstance(size, int):
+            size = (size, size)
+        geometry(*size)
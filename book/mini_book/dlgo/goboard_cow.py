@@ -0,0 +1,295 @@
+"""Copy-on-write Go board for branching many variations from one position.
+
+goboard_fast copies a whole board of string tables for every move, which
+is right for self-play but wasteful when thousands of short sequences are
+tried from the same position: each of them differs from the root in a
+handful of points. Here the padded board is a list of row bytearrays.
+Copying a board copies the list of row references only, and a board
+copies a row the first time it writes to it, so a variation holds its
+own copies of the rows its moves changed and shares every other row with
+the position it branched from.
+
+There are no string tables to share: strings and liberties are found by
+flood fill when asked for. Colors, the Zobrist hash, ``last_captures`` and
+the prisoner counts follow goboard_fast, and so do the padded indices, so
+``geometry`` tables, scoring and the goboard_fast agents work on these
+boards too. ``GameState`` is the goboard_fast game state on this board,
+with the same superko history.
+"""
+from array import array
+from functools import lru_cache
+
+from dlgo import goboard_fast, zobrist
+from dlgo.geometry import geometry
+from dlgo.goboard_slow import GoString
+from dlgo.gotypes import (
+    BORDER, EMPTY, PLAYER_OF_COLOR, Move, Player, other_color)
+
+__all__ = [
+    'Board',
+    'GameState',
+    'GoString',
+    'Move',
+]
+
+
+@lru_cache(maxsize=None)
+def _empty_rows(num_rows, num_cols):
+    """The rows of the empty board, shared by all new boards of the size
+    and never written to."""
+    colors = geometry(num_rows, num_cols).empty_colors.tobytes()
+    width = num_cols + 2
+    return tuple(bytearray(colors[row * width:(row + 1) * width])
+                 for row in range(num_rows + 2))
+
+
+class Board():
+    """
+    >>> from dlgo.gotypes import Point
+    >>> board = Board(9, 9)
+    >>> board.place_stone(Player.black, Point(1, 1))
+    >>> board.place_stone(Player.white, Point(1, 2))
+    >>> child = board.copy()
+    >>> child.place_stone(Player.white, Point(2, 1))
+    >>> child.get(Point(1, 1)) is None, board.get(Point(1, 1))
+    (True, <Player.black: 1>)
+    >>> child.shares_row(board, 1), child.shares_row(board, 5)
+    (False, True)
+    """
+    __slots__ = ('num_rows', 'num_cols', '_width', '_geometry', '_codes',
+                 '_hash', '_rows', '_owned', '_flat', 'last_captures',
+                 '_prisoners')
+
+    def __init__(self, num_rows, num_cols):
+        self.num_rows = num_rows
+        self.num_cols = num_cols
+        self._width = num_cols + 2
+        self._geometry = geometry(num_rows, num_cols)
+        self._codes = zobrist.index_table(num_rows, num_cols)
+        self._hash = zobrist.EMPTY_BOARD
+        self._rows = list(_empty_rows(num_rows, num_cols))
+        # Bit r set when row r is this board's own copy, free to write.
+        self._owned = 0
+        self._flat = None
+        self.last_captures = ()
+        self._prisoners = (0, 0, 0)
+
+    def copy(self):
+        board = Board.__new__(Board)
+        board.num_rows = self.num_rows
+        board.num_cols = self.num_cols
+        board._width = self._width
+        board._geometry = self._geometry
+        board._codes = self._codes
+        board._hash = self._hash
+        board._rows = self._rows[:]
+        board._owned = 0
+        board._flat = self._flat
+        board.last_captures = ()
+        board._prisoners = self._prisoners
+        # Both boards now share every row.
+        self._owned = 0
+        return board
+
+    def __deepcopy__(self, memo):
+        return self.copy()
+
+    def shares_row(self, other, row):
+        """True if this board and other hold the same row object."""
+        return self._rows[row] is other._rows[row]
+
+    @property
+    def geometry(self):
+        return self._geometry
+
+    @property
+    def colors(self):
+        """The padded color array of goboard_fast, built from the rows
+        (to be read only)."""
+        if self._flat is None:
+            self._flat = array('b', b''.join(self._rows))
+        return self._flat
+
+    def index(self, point):
+        return point.row * self._width + point.col
+
+    def point(self, idx):
+        return self._geometry.point_at[idx]
+
+    def _color(self, idx):
+        return self._rows[idx // self._width][idx % self._width]
+
+    def _set(self, idx, color):
+        r, c = divmod(idx, self._width)
+        if not self._owned >> r & 1:
+            self._rows[r] = bytearray(self._rows[r])
+            self._owned |= 1 << r
+        self._rows[r][c] = color
+
+    def place_stone(self, player, point):
+        assert self.is_on_grid(point)
+        idx = point.row * self._width + point.col
+        assert self._color(idx) == EMPTY
+        color = player.value
+        self._flat = None
+        self._set(idx, color)
+        self._hash ^= self._codes[color][idx]
+        opponent = other_color(color)
+        codes = self._codes[opponent]
+        captures = ()
+        for n in self._geometry.neighbors[idx]:
+            if self._color(n) != opponent:
+                continue
+            stones, liberties = self._string(n)
+            if not liberties:
+                for stone in stones:
+                    self._set(stone, EMPTY)
+                    self._hash ^= codes[stone]
+                captures += tuple(stones)
+        self.last_captures = captures
+        if captures:
+            prisoners = list(self._prisoners)
+            prisoners[color] += len(captures)
+            self._prisoners = tuple(prisoners)
+
+    def _string(self, idx):
+        """The stones of the string through the stone at idx, and the set
+        of its liberties."""
+        rows = self._rows
+        width = self._width
+        neighbors = self._geometry.neighbors
+        color = rows[idx // width][idx % width]
+        stones = [idx]
+        seen = {idx}
+        liberties = set()
+        for stone in stones:
+            for n in neighbors[stone]:
+                if n in seen:
+                    continue
+                c = rows[n // width][n % width]
+                if c == color:
+                    seen.add(n)
+                    stones.append(n)
+                elif c == EMPTY:
+                    liberties.add(n)
+        return stones, liberties
+
+    def _has_liberty_besides(self, idx, point_idx):
+        """True if the string through the stone at idx has a liberty other
+        than point_idx; stops at the first one found."""
+        rows = self._rows
+        width = self._width
+        neighbors = self._geometry.neighbors
+        color = rows[idx // width][idx % width]
+        stones = [idx]
+        seen = {idx}
+        for stone in stones:
+            for n in neighbors[stone]:
+                if n in seen:
+                    continue
+                c = rows[n // width][n % width]
+                if c == EMPTY:
+                    if n != point_idx:
+                        return True
+                elif c == color:
+                    seen.add(n)
+                    stones.append(n)
+        return False
+
+    def is_self_capture(self, player, point):
+        """True if playing at the empty point would leave its string with
+        no liberties, without placing the stone."""
+        idx = point.row * self._width + point.col
+        color = player.value
+        for n in self._geometry.neighbors[idx]:
+            c = self._color(n)
+            if c == EMPTY:
+                return False
+            if c == BORDER:
+                continue
+            in_atari = not self._has_liberty_besides(n, idx)
+            if c == color and not in_atari:
+                return False
+            if c != color and in_atari:
+                return False
+        return True
+
+    def prisoners(self, player):
+        return self._prisoners[player.value]
+
+    def zobrist_hash(self):
+        return self._hash
+
+    def hash_after(self, player, point):
+        """The Zobrist hash the board would have after playing at the empty
+        point, computed without placing the stone."""
+        idx = point.row * self._width + point.col
+        color = player.value
+        opponent = other_color(color)
+        codes = self._codes[opponent]
+        next_hash = self._hash ^ self._codes[color][idx]
+        captured = set()
+        for n in self._geometry.neighbors[idx]:
+            if self._color(n) != opponent or n in captured:
+                continue
+            stones, liberties = self._string(n)
+            if liberties == {idx}:
+                captured.update(stones)
+                for stone in stones:
+                    next_hash ^= codes[stone]
+        return next_hash
+
+    def is_on_grid(self, point):
+        return 1 <= point.row <= self.num_rows and \
+            1 <= point.col <= self.num_cols
+
+    def get(self, point):
+        return PLAYER_OF_COLOR[self._rows[point.row][point.col]]
+
+    def string_of(self, idx):
+        """Padded indices of the stones of the string through the stone
+        at idx, and its number of liberties."""
+        stones, liberties = self._string(idx)
+        return stones, len(liberties)
+
+    def get_go_string(self, point):
+        idx = point.row * self._width + point.col
+        color = PLAYER_OF_COLOR[self._color(idx)]
+        if color is None:
+            return None
+        stones, liberties = self._string(idx)
+        return GoString(
+            color,
+            [self.point(stone) for stone in stones],
+            [self.point(lib) for lib in liberties])
+
+    def num_liberties(self, point):
+        idx = point.row * self._width + point.col
+        if PLAYER_OF_COLOR[self._color(idx)] is None:
+            return 0
+        return len(self._string(idx)[1])
+
+    def __eq__(self, other):
+        if not isinstance(other, Board):
+            return NotImplemented
+        return self.num_rows == other.num_rows and \
+            self.num_cols == other.num_cols and \
+            self._hash == other._hash and \
+            self._rows == other._rows
+
+
+class GameState(goboard_fast.GameState):
+    """
+    >>> from dlgo.gotypes import Point
+    >>> root = GameState.new_game(9).apply_move(Move.play(Point(5, 5)))
+    >>> a = root.apply_move(Move.play(Point(3, 3)))
+    >>> b = root.apply_move(Move.play(Point(7, 7)))
+    >>> a.board.shares_row(root.board, 5), a.board.shares_row(b.board, 7)
+    (True, False)
+    """
+    @classmethod
+    def new_game(cls, board_size, superko=goboard_fast.SITUATIONAL):
+        if isinstance(board_size, int):
+            board_size = (board_size, board_size)
+        board = Board(*board_size)
+        return cls(board, Player.black, None, None, superko)
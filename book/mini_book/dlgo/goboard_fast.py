@@ -0,0 +1,475 @@
+"""Array-backed Go board with the same public API as goboard_slow.
+
+The board is a flat array with a one-point border around the playing area,
+so a point (row, col) lives at index ``row * (num_cols + 2) + col`` and its
+four neighbors are always valid indices. Strings are circular linked lists
+of stone indices with a head index, and liberties are tracked as
+pseudo-liberties (count, sum and sum of squares of adjacent empty points),
+which is enough to tell in O(1) whether a string is captured or in atari.
+
+The board keeps its Zobrist hash up to date on every placement and capture,
+and each game state records the hashes seen along its line of play, so the
+superko check is a dict lookup instead of a walk over previous states.
+"""
+import weakref
+from array import array
+
+from dlgo import zobrist
+from dlgo.geometry import geometry
+from dlgo.goboard_slow import GoString
+from dlgo.gotypes import (
+    BORDER, EMPTY, PLAYER_OF_COLOR, Move, Player, other_color)
+
+__all__ = [
+    'Board',
+    'GameState',
+    'GoString',
+    'Move',
+    'line_from',
+]
+
+
+class Board():
+    """
+    Besides the goboard_slow API, ``geometry`` gives the shared padded-index
+    tables of the board's size, ``colors`` the padded color array (to be
+    read only), ``last_captures`` the indices of the stones the last
+    placement captured and ``prisoners(player)`` the number of stones
+    player has captured so far.
+
+    >>> from dlgo.gotypes import Point
+    >>> board = Board(9, 9)
+    >>> board.place_stone(Player.black, Point(1, 1))
+    >>> board.place_stone(Player.white, Point(1, 2))
+    >>> board.num_liberties(Point(1, 1))
+    1
+    >>> board.place_stone(Player.white, Point(2, 1))
+    >>> board.get(Point(1, 1)) is None
+    True
+    """
+    def __init__(self, num_rows, num_cols):
+        self.num_rows = num_rows
+        self.num_cols = num_cols
+        self._width = num_cols + 2
+        self._geometry = geometry(num_rows, num_cols)
+        self._neighbors = self._geometry.neighbors
+        self._codes = zobrist.index_table(num_rows, num_cols)
+        self._hash = zobrist.EMPTY_BOARD
+        self.last_captures = ()
+        self._prisoners = array('i', bytes(4 * 3))
+        size = (num_rows + 2) * self._width
+        self._colors = self._geometry.empty_colors
+        self._head = array('i', bytes(4 * size))
+        self._next = array('i', bytes(4 * size))
+        self._size = array('i', bytes(4 * size))
+        self._plibs = array('i', bytes(4 * size))
+        self._libsum = array('q', bytes(8 * size))
+        self._libsum2 = array('q', bytes(8 * size))
+
+    def copy(self):
+        board = Board.__new__(Board)
+        board.num_rows = self.num_rows
+        board.num_cols = self.num_cols
+        board._width = self._width
+        board._geometry = self._geometry
+        board._neighbors = self._neighbors
+        board._codes = self._codes
+        board._hash = self._hash
+        board.last_captures = ()
+        board._prisoners = self._prisoners[:]
+        board._colors = self._colors[:]
+        board._head = self._head[:]
+        board._next = self._next[:]
+        board._size = self._size[:]
+        board._plibs = self._plibs[:]
+        board._libsum = self._libsum[:]
+        board._libsum2 = self._libsum2[:]
+        return board
+
+    def __deepcopy__(self, memo):
+        return self.copy()
+
+    @property
+    def geometry(self):
+        return self._geometry
+
+    @property
+    def colors(self):
+        return self._colors
+
+    def index(self, point):
+        return point.row * self._width + point.col
+
+    def point(self, idx):
+        return self._geometry.point_at[idx]
+
+    def place_stone(self, player, point):
+        assert self.is_on_grid(point)
+        idx = point.row * self._width + point.col
+        assert self._colors[idx] == EMPTY
+        self._place(player.value, idx)
+
+    def _place(self, color, idx):
+        colors = self._colors
+        head = self._head
+        neighbors = self._neighbors[idx]
+        colors[idx] = color
+        self._hash ^= self._codes[color][idx]
+        head[idx] = idx
+        self._next[idx] = idx
+        self._size[idx] = 1
+        self._plibs[idx] = 0
+        self._libsum[idx] = 0
+        self._libsum2[idx] = 0
+        for n in neighbors:
+            c = colors[n]
+            if c == EMPTY:
+                self._add_liberty(head[idx], n)
+            elif c != BORDER:
+                self._remove_liberty(head[n], idx)
+                if c == color and head[n] != head[idx]:
+                    self._merge(head[n], head[idx])
+        opponent = other_color(color)
+        captures = ()
+        for n in neighbors:
+            if colors[n] == opponent and self._plibs[head[n]] == 0:
+                captures += tuple(self._remove_string(head[n]))
+        self.last_captures = captures
+        self._prisoners[color] += len(captures)
+
+    def _add_liberty(self, h, idx):
+        self._plibs[h] += 1
+        self._libsum[h] += idx
+        self._libsum2[h] += idx * idx
+
+    def _remove_liberty(self, h, idx):
+        self._plibs[h] -= 1
+        self._libsum[h] -= idx
+        self._libsum2[h] -= idx * idx
+
+    def _merge(self, a, b):
+        if self._size[a] < self._size[b]:
+            a, b = b, a
+        head = self._head
+        nxt = self._next
+        stone = b
+        while True:
+            head[stone] = a
+            stone = nxt[stone]
+            if stone == b:
+                break
+        nxt[a], nxt[b] = nxt[b], nxt[a]
+        self._size[a] += self._size[b]
+        self._plibs[a] += self._plibs[b]
+        self._libsum[a] += self._libsum[b]
+        self._libsum2[a] += self._libsum2[b]
+
+    def _remove_string(self, h):
+        colors = self._colors
+        head = self._head
+        stones = self._stones(h)
+        codes = self._codes[colors[h]]
+        for stone in stones:
+            self._hash ^= codes[stone]
+            colors[stone] = EMPTY
+            head[stone] = 0
+        for stone in stones:
+            for n in self._neighbors[stone]:
+                if colors[n] != EMPTY and colors[n] != BORDER:
+                    self._add_liberty(head[n], stone)
+        return stones
+
+    def _stones(self, h):
+        stones = [h]
+        nxt = self._next
+        stone = nxt[h]
+        while stone != h:
+            stones.append(stone)
+            stone = nxt[stone]
+        return stones
+
+    def _liberties(self, h):
+        colors = self._colors
+        return {n for stone in self._stones(h)
+                for n in self._neighbors[stone] if colors[n] == EMPTY}
+
+    def _in_atari(self, h):
+        plibs = self._plibs[h]
+        libsum = self._libsum[h]
+        return plibs > 0 and plibs * self._libsum2[h] == libsum * libsum
+
+    def is_self_capture(self, player, point):
+        """True if playing at the empty point would leave its string with
+        no liberties, without placing the stone."""
+        idx = point.row * self._width + point.col
+        color = player.value
+        colors = self._colors
+        for n in self._neighbors[idx]:
+            c = colors[n]
+            if c == EMPTY:
+                return False
+            if c == BORDER:
+                continue
+            in_atari = self._in_atari(self._head[n])
+            if c == color and not in_atari:
+                return False
+            if c != color and in_atari:
+                return False
+        return True
+
+    def prisoners(self, player):
+        return self._prisoners[player.value]
+
+    def zobrist_hash(self):
+        return self._hash
+
+    def hash_after(self, player, point):
+        """The Zobrist hash the board would have after playing at the empty
+        point, computed without placing the stone."""
+        idx = point.row * self._width + point.col
+        color = player.value
+        opponent = other_color(color)
+        colors = self._colors
+        next_hash = self._hash ^ self._codes[color][idx]
+        captured = []
+        for n in self._neighbors[idx]:
+            h = self._head[n]
+            if colors[n] == opponent and h not in captured and \
+                    self._in_atari(h):
+                captured.append(h)
+                codes = self._codes[opponent]
+                for stone in self._stones(h):
+                    next_hash ^= codes[stone]
+        return next_hash
+
+    def is_on_grid(self, point):
+        return 1 <= point.row <= self.num_rows and \
+            1 <= point.col <= self.num_cols
+
+    def get(self, point):
+        idx = point.row * self._width + point.col
+        return PLAYER_OF_COLOR[self._colors[idx]]
+
+    def string_of(self, idx):
+        """Padded indices of the stones of the string through the stone
+        at idx, and its number of liberties."""
+        h = self._head[idx]
+        return self._stones(h), len(self._liberties(h))
+
+    def get_go_string(self, point):
+        idx = point.row * self._width + point.col
+        color = PLAYER_OF_COLOR[self._colors[idx]]
+        if color is None:
+            return None
+        h = self._head[idx]
+        return GoString(
+            color,
+            [self.point(stone) for stone in self._stones(h)],
+            [self.point(lib) for lib in self._liberties(h)])
+
+    def num_liberties(self, point):
+        idx = point.row * self._width + point.col
+        if PLAYER_OF_COLOR[self._colors[idx]] is None:
+            return 0
+        return len(self._liberties(self._head[idx]))
+
+    def __eq__(self, other):
+        if not isinstance(other, Board):
+            return NotImplemented
+        return self.num_rows == other.num_rows and \
+            self.num_cols == other.num_cols and \
+            self._hash == other._hash and \
+            self._colors == other._colors
+
+
+SITUATIONAL = 'situational'
+POSITIONAL = 'positional'
+
+
+class _History():
+    """Superko keys seen along one line of play, mapped to the depth at
+    which they first appeared.
+
+    States on a single line share one dict: a child of the deepest state
+    extends it in place, so a whole self-play game costs O(1) per move.
+    Branching from any other state copies the entries up to its depth
+    while there are fewer than MIN_LAYER_DEPTH of them. Deeper branches
+    start a new layer on top of the history they branch from, whose
+    entries count up to the branch depth only, so trying many variations
+    from a late position costs O(1) per branch. Lookups walk the layers,
+    and past MAX_LAYERS of them the line is flattened into one dict again.
+    """
+    MIN_LAYER_DEPTH = 64
+    MAX_LAYERS = 8
+
+    def __init__(self, superko, seen=None, base=None, base_depth=None):
+        self.superko = superko
+        self.seen = {} if seen is None else seen
+        self.base = base
+        self.base_depth = base_depth
+        self.layers = 0 if base is None else base.layers + 1
+        self._tip = None
+
+    def key(self, player, board_hash):
+        if self.superko == POSITIONAL:
+            return board_hash
+        return (player, board_hash)
+
+    def contains(self, key, depth):
+        history = self
+        while history is not None:
+            if history.seen.get(key, depth + 1) <= depth:
+                return True
+            if history.base is not None:
+                depth = min(depth, history.base_depth)
+            history = history.base
+        return False
+
+    def for_child_of(self, state):
+        if self._tip is not None and self._tip() is state:
+            return self
+        depth = state._depth
+        if depth >= self.MIN_LAYER_DEPTH and self.layers < self.MAX_LAYERS:
+            return _History(self.superko, base=self, base_depth=depth)
+        seen = {}
+        history = self
+        while history is not None:
+            for key, d in history.seen.items():
+                if d <= depth and d < seen.get(key, depth + 1):
+                    seen[key] = d
+            if history.base is not None:
+                depth = min(depth, history.base_depth)
+            history = history.base
+        return _History(self.superko, seen)
+
+    def add(self, state):
+        key = self.key(state.next_player, state.board.zobrist_hash())
+        self.seen.setdefault(key, state._depth)
+        self._tip = weakref.ref(state)
+
+
+class GameState():
+    """
+    >>> from dlgo.gotypes import Point
+    >>> game = GameState.new_game(9)
+    >>> game = game.apply_move(Move.play(Point(5, 5)))
+    >>> game.is_valid_move(Move.play(Point(5, 5)))
+    False
+    >>> len(game.legal_moves())
+    82
+    """
+    def __init__(self, board, next_player, previous, move,
+                 superko=SITUATIONAL):
+        self.board = board
+        self.next_player = next_player
+        self.previous_state = previous
+        self.last_move = move
+        if previous is None:
+            self._depth = 0
+            self._history = _History(superko)
+        else:
+            self._depth = previous._depth + 1
+            self._history = previous._history.for_child_of(previous)
+        self._history.add(self)
+
+    def apply_move(self, move):
+        if move.is_play:
+            next_board = self.board.copy()
+            next_board.place_stone(self.next_player, move.point)
+        else:
+            next_board = self.board
+        return self.__class__(next_board, self.next_player.other, self, move)
+
+    @classmethod
+    def new_game(cls, board_size, superko=SITUATIONAL):
+        if isinstance(board_size, int):
+            board_size = (board_size, board_size)
+        board = Board(*board_size)
+        return cls(board, Player.black, None, None, superko)
+
+    def is_over(self):
+        if self.last_move is None:
+            return False
+        if self.last_move.is_resign:
+            return True
+        second_last_move = self.previous_state.last_move
+        if second_last_move is None:
+            return False
+        return self.last_move.is_pass and second_last_move.is_pass
+
+    def is_move_self_capture(self, player, move):
+        if not move.is_play:
+            return False
+        return self.board.is_self_capture(player, move.point)
+
+    @property
+    def situation(self):
+        return (self.next_player, self.board)
+
+    def does_move_violate_ko(self, player, move):
+        if not move.is_play:
+            return False
+        return self.repeats_position(
+            player, self.board.hash_after(player, move.point))
+
+    def repeats_position(self, player, next_hash):
+        """True if a move by player leading to a board with next_hash would
+        repeat an earlier position (or situation) of this game."""
+        key = self._history.key(player.other, next_hash)
+        return self._history.contains(key, self._depth)
+
+    def is_valid_move(self, move):
+        if self.is_over():
+            return False
+        if move.is_pass or move.is_resign:
+            return True
+        return (
+            self.board.get(move.point) is None and
+            not self.is_move_self_capture(self.next_player, move) and
+            not self.does_move_violate_ko(self.next_player, move))
+
+    def legal_moves(self):
+        geometry = self.board.geometry
+        moves = []
+        for idx in geometry.points:
+            move = geometry.moves[idx]
+            if self.is_valid_move(move):
+                moves.append(move)
+        moves.append(Move.pass_turn())
+        moves.append(Move.resign())
+        return moves
+
+
+def line_from(board, game_state, max_moves=8):
+    """The game states from the move after board up to game_state, when
+    game_state continues the line of play through board by at most
+    max_moves board changes; None otherwise.
+
+    Each state's board is the one its move made (passes share the board
+    before them and are left out), so callers can replay the line from the
+    placed stones and each board's ``last_captures``.
+
+    >>> from dlgo.gotypes import Point
+    >>> game = GameState.new_game(5)
+    >>> start = game.board
+    >>> for point in (Point(1, 1), Point(2, 2)):
+    ...     game = game.apply_move(Move.play(point))
+    >>> game = game.apply_move(Move.pass_turn())
+    >>> [state.last_move for state in line_from(start, game)]
+    [Move.play(Point(row=1, col=1)), Move.play(Point(row=2, col=2))]
+    >>> line_from(start, game, max_moves=1) is None
+    True
+    """
+    line = []
+    state = game_state
+    while state is not None and len(line) <= max_moves:
+        if state.board is board:
+            line.reverse()
+            return line
+        # The earliest state holding a board is the one whose move made it.
+        if line and state.board is line[-1].board:
+            line[-1] = state
+        else:
+            line.append(state)
+        state = state.previous_state
+    return None
@@ -0,0 +1,161 @@
+import enum
+from collections import namedtuple
+
+
+class Player(enum.Enum):
+    """
+    >>> Player.black.value
+    1
+    >>> Player.black.other
+    <Player.white: 2>
+    """
+    black = 1
+    white = 2
+
+    @property
+    def other(self):
+        return Player.black if self == Player.white else Player.white
+
+
+# Integer colors for board arrays, feature planes and hash tables. Stone
+# colors equal Player values, so ``player.value`` converts a Player to its
+# color and ``PLAYER_OF_COLOR[color]`` converts back; the opposite color is
+# plain arithmetic, ``BLACK + WHITE - color``, with no enum dispatch.
+EMPTY = 0
+BLACK = Player.black.value
+WHITE = Player.white.value
+BORDER = 3
+PLAYER_OF_COLOR = (None, Player.black, Player.white, None)
+
+
+def other_color(color):
+    """
+    >>> other_color(BLACK) == WHITE
+    True
+    >>> PLAYER_OF_COLOR[other_color(Player.white.value)]
+    <Player.black: 1>
+    """
+    return BLACK + WHITE - color
+
+
+# Points are interned for rows and columns 0 to MAX_INTERNED: every point
+# of the largest (25x25) board and its border.
+MAX_INTERNED = 26
+
+
+class Point(namedtuple('Point', 'row col')):
+    """A board coordinate. Points on any board up to 25x25 (and its
+    border) are interned: asking for the same coordinates again returns
+    the same object, so ``is`` compares points and creating one allocates
+    nothing after the first time. Each board size's Geometry holds every
+    point up front (``point_at``). Points further out are plain values,
+    equal but not identical, so no input can grow the table.
+
+    >>> Point(row=2, col=2).neighbors()  # doctest: +NORMALIZE_WHITESPACE
+    [Point(row=1, col=2), Point(row=3, col=2), Point(row=2, col=1),
+     Point(row=2, col=3)]
+    >>> Point(3, 4) is Point(row=3, col=4), Point(99, 1) is Point(99, 1)
+    (True, False)
+    """
+    __slots__ = ()
+
+    def __new__(cls, row, col):
+        # A Point hashes and compares like the plain (row, col) tuple.
+        try:
+            return _POINTS[row, col]
+        except KeyError:
+            point = super().__new__(cls, row, col)
+            if 0 <= row <= MAX_INTERNED and 0 <= col <= MAX_INTERNED:
+                # setdefault is atomic, so threads racing to create the
+                # same point all get the one that won.
+                point = _POINTS.setdefault(point, point)
+            return point
+
+    @classmethod
+    def _make(cls, iterable):
+        return cls(*iterable)
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def neighbors(self):
+        return [
+            Point(self.row - 1, self.col),
+            Point(self.row + 1, self.col),
+            Point(self.row, self.col - 1),
+            Point(self.row, self.col + 1),
+        ]
+
+
+_POINTS = {}
+
+
+class Move():
+    """Any action a player can play on a turn.
+
+    Moves are interned and immutable like points: there is one pass, one
+    resign and one play per interned point, so moves compare by identity.
+    Each Geometry holds the plays of its board (``moves``).
+
+    >>> Move.play(Point(3, 3)).is_play
+    True
+    >>> Move.pass_turn().is_pass
+    True
+    >>> Move.play(Point(3, 3)) is Move(point=Point(3, 3))
+    True
+    """
+    __slots__ = ('point', 'is_play', 'is_pass', 'is_resign')
+
+    def __new__(cls, point=None, is_pass=False, is_resign=False):
+        assert (point is not None) ^ is_pass ^ is_resign
+        key = point if point is not None else is_pass
+        move = _MOVES.get(key)
+        if move is None:
+            move = object.__new__(cls)
+            if point is not None:
+                point = Point(*point)
+            object.__setattr__(move, 'point', point)
+            object.__setattr__(move, 'is_play', point is not None)
+            object.__setattr__(move, 'is_pass', is_pass)
+            object.__setattr__(move, 'is_resign', is_resign)
+            if point is None or _POINTS.get(point) is point:
+                move = _MOVES.setdefault(key, move)
+        return move
+
+    @classmethod
+    def play(cls, point):
+        return Move(point=point)
+
+    @classmethod
+    def pass_turn(cls):
+        return Move(is_pass=True)
+
+    @classmethod
+    def resign(cls):
+        return Move(is_resign=True)
+
+    def __setattr__(self, name, value):
+        raise AttributeError('moves are immutable')
+
+    def __reduce__(self):
+        return Move, (self.point, self.is_pass, self.is_resign)
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __repr__(self):
+        if self.is_pass:
+            return 'Move.pass_turn()'
+        if self.is_resign:
+            return 'Move.resign()'
+        return 'Move.play(%r)' % (self.point,)
+
+
+# Plays keyed by their point, the pass by True and the resign by False.
+_MOVES = {}
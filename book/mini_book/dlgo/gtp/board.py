@@ -0,0 +1,49 @@
+from dlgo.goboard_slow import Move
+from dlgo.gotypes import Point
+
+__all__ = [
+    'coords_to_gtp_position',
+    'gtp_position_to_coords',
+]
+
+# GTP column letters skip I.
+COLS = 'ABCDEFGHJKLMNOPQRSTUVWXYZ'
+
+
+def coords_to_gtp_position(move):
+    """The GTP vertex of a move: a column letter and row number, 'pass' or
+    'resign'.
+
+    >>> coords_to_gtp_position(Move.play(Point(4, 9)))
+    'J4'
+    """
+    if move.is_pass:
+        return 'pass'
+    if move.is_resign:
+        return 'resign'
+    point = move.point
+    return COLS[point.col - 1] + str(point.row)
+
+
+def gtp_position_to_coords(gtp_position):
+    """The Move of a GTP vertex, case-insensitive.
+
+    >>> gtp_position_to_coords('j4'), gtp_position_to_coords('PASS')
+    (Move.play(Point(row=4, col=9)), Move.pass_turn())
+    >>> gtp_position_to_coords('A99999')
+    Traceback (most recent call last):
+    ...
+    ValueError: invalid vertex 'A99999'
+    """
+    vertex = gtp_position.strip().upper()
+    if vertex == 'PASS':
+        return Move.pass_turn()
+    if vertex == 'RESIGN':
+        return Move.resign()
+    col = COLS.find(vertex[:1])
+    # Check the row before making a Point of it: vertices come from the
+    # network.
+    if col < 0 or not vertex[1:].isdigit() or \
+            not 1 <= int(vertex[1:]) <= len(COLS):
+        raise ValueError('invalid vertex {!r}'.format(gtp_position))
+    return Move.play(Point(row=int(vertex[1:]), col=col + 1))
@@ -0,0 +1,170 @@
+"""A GTP client and a load test for GTPServer.
+
+``load_test`` opens one connection per game and plays them all at once:
+the client plays black with a random bot and asks the server for white's
+moves, timing each ``genmove`` from the request to the reply. Run it
+against a server started in the same process with::
+
+    python -m dlgo.gtp.client --games 300 --board-size 9
+"""
+import argparse
+import asyncio
+import random
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from dlgo.agent.naive_fast import FastRandomBot
+from dlgo.goboard_fast import GameState
+from dlgo.gotypes import Player
+from dlgo.gtp.board import coords_to_gtp_position, gtp_position_to_coords
+from dlgo.gtp.response import error, success
+
+__all__ = [
+    'GTPClient',
+    'LoadTestResult',
+    'load_test',
+]
+
+
+class GTPClient():
+    """One GTP connection, sending a command at a time."""
+    def __init__(self, reader, writer):
+        self._reader = reader
+        self._writer = writer
+
+    @classmethod
+    async def connect(cls, host, port):
+        reader, writer = await asyncio.open_connection(host, port)
+        return cls(reader, writer)
+
+    async def send(self, command):
+        """Send one command line and return the Response."""
+        self._writer.write((command + '\n').encode())
+        await self._writer.drain()
+        reply = (await self._reader.readuntil(b'\n\n')).decode()
+        status, _, body = reply.strip().partition(' ')
+        body = body.strip()
+        return success(body) if status.startswith('=') else error(body)
+
+    async def close(self):
+        self._writer.close()
+        await self._writer.wait_closed()
+
+
+class LoadTestResult(namedtuple(
+        'LoadTestResult', 'games moves elapsed latencies')):
+    """Outcome of a load test; latencies are the seconds every genmove
+    took, as seen by the client."""
+    def percentile(self, q):
+        return float(np.percentile(self.latencies, q))
+
+    @property
+    def moves_per_second(self):
+        return self.moves / self.elapsed if self.elapsed else 0.0
+
+    def __str__(self):
+        return ('{} games, {} moves in {:.2f}s ({:.0f} moves/s); genmove '
+                'latency p50 {:.1f}ms, p90 {:.1f}ms, p99 {:.1f}ms, '
+                'max {:.1f}ms').format(
+                    self.games, self.moves, self.elapsed,
+                    self.moves_per_second, 1e3 * self.percentile(50),
+                    1e3 * self.percentile(90), 1e3 * self.percentile(99),
+                    1e3 * max(self.latencies))
+
+
+async def play_game(host, port, board_size=9, max_moves=None, rng=None,
+                    latencies=None, time_settings=None):
+    """Play one game as black against the server and return the number
+    of moves played; genmove latencies are appended to latencies."""
+    client = await GTPClient.connect(host, port)
+    bot = FastRandomBot(rng)
+    game = GameState.new_game(board_size)
+    num_moves = 0
+    commands = ['boardsize {}'.format(board_size), 'clear_board']
+    if time_settings is not None:
+        commands.append('time_settings {} {} {}'.format(*time_settings))
+    try:
+        for command in commands:
+            response = await client.send(command)
+            if not response.success:
+                raise ValueError('{} failed: {}'.format(
+                    command, response.body))
+        while not game.is_over() and \
+                (max_moves is None or num_moves < max_moves):
+            if game.next_player == Player.black:
+                move = bot.select_move(game)
+                response = await client.send('play b {}'.format(
+                    coords_to_gtp_position(move)))
+            else:
+                start = time.perf_counter()
+                response = await client.send('genmove w')
+                if latencies is not None:
+                    latencies.append(time.perf_counter() - start)
+                move = gtp_position_to_coords(response.body) \
+                    if response.success else None
+            if not response.success:
+                raise ValueError('server rejected move: {}'.format(
+                    response.body))
+            if move.is_resign:
+                break
+            game = game.apply_move(move)
+            num_moves += 1
+        await client.send('quit')
+    finally:
+        await client.close()
+    return num_moves
+
+
+async def load_test(host, port, num_games, board_size=9, max_moves=None,
+                    seed=None, time_settings=None):
+    """Play num_games games against the server at once and return a
+    LoadTestResult."""
+    latencies = []
+    start = time.perf_counter()
+    rng = random.Random(seed)
+    moves = await asyncio.gather(*(
+        play_game(host, port, board_size, max_moves,
+                  random.Random(rng.getrandbits(64)), latencies,
+                  time_settings)
+        for _ in range(num_games)))
+    return LoadTestResult(num_games, sum(moves),
+                          time.perf_counter() - start, latencies)
+
+
+def main(argv=None):
+    from dlgo.gtp.server import GTPServer
+
+    parser = argparse.ArgumentParser(
+        description='Play many simultaneous games against a GTP server.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=None,
+                        help='server to connect to; by default a random '
+                             'bot is served in this process')
+    parser.add_argument('--games', type=int, default=300)
+    parser.add_argument('--board-size', type=int, default=9)
+    parser.add_argument('--max-moves', type=int, default=None)
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args(argv)
+
+    async def run():
+        server = None
+        port = args.port
+        if port is None:
+            server = GTPServer(FastRandomBot, args.board_size)
+            await server.start(args.host)
+            port = server.port
+        try:
+            return await load_test(args.host, port, args.games,
+                                   args.board_size, args.max_moves,
+                                   args.seed)
+        finally:
+            if server is not None:
+                await server.close()
+
+    print(asyncio.run(run()))
+
+
+if __name__ == '__main__':
+    main()
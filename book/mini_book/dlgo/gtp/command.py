@@ -0,0 +1,47 @@
+import re
+
+__all__ = [
+    'Command',
+    'parse',
+]
+
+_CONTROL = re.compile(r'[\x00-\x08\x0b-\x1f\x7f]')
+
+
+class Command():
+    """A GTP command: an optional id, a name and its arguments.
+
+    >>> parse('12 play black D4  # first move')
+    Command(12, 'play', ['black', 'D4'])
+    >>> parse('# just a comment') is None
+    True
+    """
+    def __init__(self, sequence, name, args):
+        self.sequence = sequence
+        self.name = name
+        self.args = list(args)
+
+    def __eq__(self, other):
+        if not isinstance(other, Command):
+            return NotImplemented
+        return (self.sequence, self.name, self.args) == \
+            (other.sequence, other.name, other.args)
+
+    def __repr__(self):
+        return 'Command(%r, %r, %r)' % (self.sequence, self.name, self.args)
+
+
+def parse(command_string):
+    """Command of one line of GTP input, None for an empty line or a
+    comment."""
+    line = command_string.split('#', 1)[0]
+    line = _CONTROL.sub('', line.replace('\t', ' '))
+    pieces = line.split()
+    if not pieces:
+        return None
+    sequence = None
+    if pieces[0].isdigit():
+        sequence = int(pieces.pop(0))
+        if not pieces:
+            return None
+    return Command(sequence, pieces[0].lower(), pieces[1:])
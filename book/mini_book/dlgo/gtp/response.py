@@ -0,0 +1,41 @@
+__all__ = [
+    'Response',
+    'bool_response',
+    'error',
+    'serialize',
+    'success',
+]
+
+
+class Response():
+    def __init__(self, status, body):
+        self.success = status
+        self.body = body
+
+
+def success(body=''):
+    return Response(True, body)
+
+
+def error(body=''):
+    return Response(False, body)
+
+
+def bool_response(boolean):
+    return success('true' if boolean else 'false')
+
+
+def serialize(gtp_command, gtp_response):
+    """The text sent back for a response: '=' or '?', the command id if it
+    had one and the body, ended by an empty line.
+
+    >>> from dlgo.gtp.command import parse
+    >>> serialize(parse('7 genmove b'), success('D4'))
+    '=7 D4\\n\\n'
+    >>> serialize(parse('foo'), error('unknown command'))
+    '? unknown command\\n\\n'
+    """
+    sequence = '' if gtp_command.sequence is None else \
+        str(gtp_command.sequence)
+    return '%s%s %s\n\n' % (
+        '=' if gtp_response.success else '?', sequence, gtp_response.body)
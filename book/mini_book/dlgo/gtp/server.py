@@ -0,0 +1,394 @@
+"""Go Text Protocol server hosting many games at once.
+
+Each TCP connection is one GTP session with its own game and agent. The
+sessions share one asyncio event loop, which only parses commands and
+keeps the games; ``genmove`` hands the agent's search to an executor
+(a thread pool by default), so a long search holds up its own session
+only. Agents whose ``select_move`` takes a ``think_time`` argument, like
+MCTS, are told how long they may search: the time the session's clock
+allows for the move under the GTP time settings, capped by the server's
+``max_think_time``.
+
+With ``ponder=True``, agents with a ``ponder`` method, like MCTS, keep
+searching on their own thread after each genmove until their next move is
+asked for or the game is reset. Starting and stopping a ponder (which
+reuses part of the tree and joins the search thread) also runs off the
+event loop. An agent that raises answers the command with a GTP error and
+the session goes on.
+
+Serve a random bot from the command line with::
+
+    python -m dlgo.gtp.server --port 5000 --board-size 9
+"""
+import argparse
+import asyncio
+import inspect
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from dlgo.goboard_fast import GameState
+from dlgo.gotypes import EMPTY, Player
+from dlgo.gtp.board import coords_to_gtp_position, gtp_position_to_coords
+from dlgo.gtp.command import parse
+from dlgo.gtp.response import bool_response, error, serialize, success
+from dlgo.scoring import compute_game_result
+
+__all__ = [
+    'Clock',
+    'GTPServer',
+]
+
+_PLAYERS = {
+    'b': Player.black,
+    'black': Player.black,
+    'w': Player.white,
+    'white': Player.white,
+}
+
+
+class Clock():
+    """One player's clock under GTP time settings: main time, then
+    Canadian byo-yomi periods of byo_yomi_time seconds for byo_yomi_stones
+    moves. Without main_time there is no limit.
+
+    >>> clock = Clock(main_time=60, byo_yomi_time=10, byo_yomi_stones=5)
+    >>> clock.think_time(moves_to_go=30)
+    2.0
+    >>> clock.spend(61)
+    >>> clock.time_left, clock.stones_left, clock.think_time(30)
+    (9, 5, 1.8)
+    """
+    def __init__(self, main_time=None, byo_yomi_time=0, byo_yomi_stones=0):
+        self.main_time = main_time
+        self.byo_yomi_time = byo_yomi_time
+        self.byo_yomi_stones = byo_yomi_stones
+        self.time_left = main_time
+        # Stones left to play in the current byo-yomi period, 0 in main
+        # time.
+        self.stones_left = 0
+
+    @property
+    def is_limited(self):
+        # GTP: byo-yomi time without a stone count means no time limit.
+        return self.main_time is not None and \
+            not (self.byo_yomi_time > 0 and self.byo_yomi_stones == 0)
+
+    def set_time_left(self, time_left, stones_left):
+        self.time_left = time_left
+        self.stones_left = stones_left
+
+    def think_time(self, moves_to_go):
+        """Seconds to spend on the next move, None without a limit."""
+        if not self.is_limited:
+            return None
+        if self.stones_left:
+            return self.time_left / self.stones_left
+        budget = self.time_left / max(moves_to_go, 1)
+        if self.byo_yomi_stones:
+            # Main time running out only starts byo-yomi, which allows
+            # this much per move anyway.
+            budget = max(budget, self.byo_yomi_time / self.byo_yomi_stones)
+        return budget
+
+    def spend(self, seconds):
+        if not self.is_limited:
+            return
+        self.time_left -= seconds
+        if self.stones_left:
+            self.stones_left -= 1
+            if self.stones_left == 0 and self.time_left >= 0:
+                self.time_left = self.byo_yomi_time
+                self.stones_left = self.byo_yomi_stones
+        elif self.time_left < 0 and self.byo_yomi_stones:
+            self.time_left += self.byo_yomi_time
+            self.stones_left = self.byo_yomi_stones
+
+
+def _failure(exc):
+    """GTP error response for an exception raised by an agent, on one line
+    so it can't end the response early."""
+    return error(' '.join(str(exc).split()) or type(exc).__name__)
+
+
+async def _blocking(func, *args):
+    """Run a short blocking agent call on the loop's default executor,
+    apart from the searches, so it holds up no other session."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, func, *args)
+
+
+class _Session():
+    """The game and agent of one connection."""
+    def __init__(self, server):
+        self.server = server
+        self.agent = server.agent_factory()
+        self.timed = 'think_time' in inspect.signature(
+            self.agent.select_move).parameters
+        self.board_size = server.board_size
+        self.komi = server.komi
+        self.time_settings = (None, 0, 0)
+        self._new_game()
+
+    async def stop_pondering(self):
+        stop = getattr(self.agent, 'stop_pondering', None)
+        if stop is not None:
+            await _blocking(stop)
+
+    async def clear_board(self):
+        await self.stop_pondering()
+        self._new_game()
+
+    def _new_game(self):
+        self.game_state = GameState.new_game(self.board_size)
+        self.clocks = {player: Clock(*self.time_settings)
+                       for player in Player}
+
+    def _as_player(self, player):
+        """The game with player to move, whatever the order so far."""
+        state = self.game_state
+        if state.next_player != player:
+            state = GameState(state.board, player, state.previous_state,
+                              state.last_move)
+        return state
+
+    async def handle(self, command):
+        handler = getattr(self, 'handle_' + command.name, None)
+        if handler is None:
+            return error('unknown command')
+        try:
+            response = handler(*command.args)
+            if inspect.isawaitable(response):
+                response = await response
+            return response
+        except (TypeError, ValueError, KeyError):
+            return error('syntax error')
+        except Exception as exc:
+            return _failure(exc)
+
+    def handle_protocol_version(self):
+        return success('2')
+
+    def handle_name(self):
+        return success(self.server.name)
+
+    def handle_version(self):
+        return success(self.server.version)
+
+    def handle_known_command(self, name):
+        return bool_response(hasattr(self, 'handle_' + name))
+
+    def handle_list_commands(self):
+        return success('\n'.join(sorted(
+            name[len('handle_'):] for name in dir(self)
+            if name.startswith('handle_'))))
+
+    def handle_quit(self):
+        return success()
+
+    async def handle_boardsize(self, size):
+        size = int(size)
+        if not 2 <= size <= 25:
+            return error('unacceptable size')
+        self.board_size = size
+        await self.clear_board()
+        return success()
+
+    async def handle_clear_board(self):
+        await self.clear_board()
+        return success()
+
+    def handle_komi(self, komi):
+        self.komi = float(komi)
+        return success()
+
+    def handle_play(self, color, vertex):
+        player = _PLAYERS[color.lower()]
+        move = gtp_position_to_coords(vertex)
+        state = self._as_player(player)
+        if move.is_resign:
+            return success()
+        if move.is_play and not (
+                1 <= move.point.row <= self.board_size and
+                1 <= move.point.col <= self.board_size):
+            return error('illegal move')
+        if not state.is_valid_move(move):
+            return error('illegal move')
+        self.game_state = state.apply_move(move)
+        return success()
+
+    async def handle_genmove(self, color):
+        player = _PLAYERS[color.lower()]
+        state = self._as_player(player)
+        clock = self.clocks[player]
+        start = time.perf_counter()
+        try:
+            move = await self.server.think(
+                self.agent, state,
+                self._think_time(state, clock) if self.timed else None)
+        except Exception as exc:
+            return _failure(exc)
+        clock.spend(time.perf_counter() - start)
+        if not move.is_resign:
+            self.game_state = state.apply_move(move)
+            if self.server.ponder and hasattr(self.agent, 'ponder'):
+                await _blocking(self.agent.ponder, self.game_state)
+        return success(coords_to_gtp_position(move))
+
+    def _think_time(self, state, clock):
+        empty_points = state.board.colors.count(EMPTY)
+        think_time = clock.think_time(max(10, empty_points // 2))
+        if think_time is not None:
+            think_time = max(think_time - self.server.lag, 0.0)
+        cap = self.server.max_think_time
+        if cap is not None and (think_time is None or think_time > cap):
+            think_time = cap
+        return think_time
+
+    async def handle_undo(self):
+        previous = self.game_state.previous_state
+        if previous is None:
+            return error('cannot undo')
+        await self.stop_pondering()
+        self.game_state = previous
+        return success()
+
+    def handle_time_settings(self, main_time, byo_yomi_time, byo_yomi_stones):
+        self.time_settings = (float(main_time), float(byo_yomi_time),
+                              int(byo_yomi_stones))
+        self.clocks = {player: Clock(*self.time_settings)
+                       for player in Player}
+        return success()
+
+    def handle_time_left(self, color, time_left, stones_left):
+        self.clocks[_PLAYERS[color.lower()]].set_time_left(
+            float(time_left), int(stones_left))
+        return success()
+
+    def handle_final_score(self):
+        return success(str(compute_game_result(self.game_state, self.komi)))
+
+
+class GTPServer():
+    """Serve GTP sessions of agents made by agent_factory.
+
+    ``agent_factory()`` is called once per connection. ``lag`` seconds are
+    kept back from each clock-based think time for the network and the
+    server itself.
+
+    >>> import random
+    >>> from dlgo.agent.naive_fast import FastRandomBot
+    >>> async def session():
+    ...     server = GTPServer(lambda: FastRandomBot(random.Random(0)), 9)
+    ...     await server.start()
+    ...     reader, writer = await asyncio.open_connection(
+    ...         '127.0.0.1', server.port)
+    ...     replies = []
+    ...     for line in ('1 play b E5', '2 genmove w', 'quit'):
+    ...         writer.write((line + '\\n').encode())
+    ...         replies.append((await reader.readuntil(b'\\n\\n')).decode())
+    ...     writer.close()
+    ...     await server.close()
+    ...     return replies
+    >>> first, second, last = asyncio.run(session())
+    >>> first, second.startswith('=2 '), last
+    ('=1 \\n\\n', True, '= \\n\\n')
+    """
+    def __init__(self, agent_factory, board_size=19, komi=7.5,
+                 max_think_time=None, lag=0.05, executor=None,
+                 ponder=False, name='dlgo', version='0.1'):
+        self.agent_factory = agent_factory
+        self.board_size = board_size
+        self.komi = komi
+        self.max_think_time = max_think_time
+        self.lag = lag
+        self.ponder = ponder
+        self.name = name
+        self.version = version
+        self._own_executor = executor is None
+        # More threads than cores, so a few long searches can't take every
+        # thread while short ones wait.
+        self.executor = executor or ThreadPoolExecutor()
+        self._server = None
+        self.num_sessions = 0
+        self.num_moves = 0
+
+    async def start(self, host='127.0.0.1', port=0):
+        """Start listening; port 0 picks a free port, see ``port``."""
+        self._server = await asyncio.start_server(self._serve, host, port)
+
+    @property
+    def port(self):
+        return self._server.sockets[0].getsockname()[1]
+
+    async def serve_forever(self):
+        await self._server.serve_forever()
+
+    async def close(self):
+        self._server.close()
+        await self._server.wait_closed()
+        if self._own_executor:
+            self.executor.shutdown(wait=True)
+
+    async def think(self, agent, game_state, think_time=None):
+        """The agent's move, chosen on the executor. Time spent waiting for
+        a free worker counts towards think_time."""
+        loop = asyncio.get_running_loop()
+        if think_time is None:
+            call = (agent.select_move, game_state)
+        else:
+            submitted = time.perf_counter()
+
+            def search():
+                waited = time.perf_counter() - submitted
+                return agent.select_move(
+                    game_state, think_time=max(think_time - waited, 0.0))
+            call = (search,)
+        move = await loop.run_in_executor(self.executor, *call)
+        self.num_moves += 1
+        return move
+
+    async def _serve(self, reader, writer):
+        session = _Session(self)
+        self.num_sessions += 1
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                command = parse(line.decode('utf-8', 'replace'))
+                if command is None:
+                    continue
+                response = await session.handle(command)
+                writer.write(serialize(command, response).encode())
+                await writer.drain()
+                if command.name == 'quit':
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            await session.stop_pondering()
+            self.num_sessions -= 1
+            writer.close()
+
+
+def main(argv=None):
+    from dlgo.agent.naive_fast import FastRandomBot
+
+    parser = argparse.ArgumentParser(
+        description='Serve a random bot over GTP.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=5000)
+    parser.add_argument('--board-size', type=int, default=19)
+    parser.add_argument('--komi', type=float, default=7.5)
+    args = parser.parse_args(argv)
+
+    async def serve():
+        server = GTPServer(FastRandomBot, args.board_size, args.komi)
+        await server.start(args.host, args.port)
+        await server.serve_forever()
+
+    asyncio.run(serve())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,503 @@
+"""Monte Carlo tree search over goboard_fast game states.
+
+Node statistics live in preallocated NumPy arrays indexed by node id rather
+than in one Python object per node. The children of a node occupy a
+contiguous block of ids, so selection scores all of them with a handful of
+array operations. Only the game states are Python objects, created lazily
+the first time a node is visited.
+
+Between moves the tree is kept: when the next search starts from a
+position the tree already contains, that node becomes the new root with
+its statistics, and the blocks of all other nodes go to a free list keyed
+by block size, so the pool never grows beyond its preallocated capacity.
+
+An optional TranspositionTable caches evaluations and legal moves by
+position, so positions reached again, within one search or in the searches
+for later moves, skip the evaluator and the legality checks.
+
+Several threads can search one tree: selection, expansion and backup run
+under a lock, and each thread adds a virtual loss along the path it is
+evaluating so the others are steered towards different leaves while the
+(slow, lock-free) evaluation is in flight. If the evaluator raises, the
+leaf and its path are restored, every thread stops and the search raises
+the evaluator's exception.
+
+While the opponent thinks, ``ponder`` keeps searching the tree on a
+background thread, by default for up to half a move's playouts. The next
+select_move stops it and keeps the subtree of the move the opponent
+played; the visits that subtree already holds count towards the move's
+budget, so it answers sooner when the opponent plays a reply pondering
+explored.
+"""
+import math
+import threading
+import time
+
+import numpy as np
+
+from dlgo.goboard_fast import Move
+from dlgo.geometry import geometry
+from dlgo.gotypes import EMPTY
+from dlgo.transposition import position_key
+
+__all__ = [
+    'MCTS',
+    'move_to_index',
+    'index_to_move',
+    'uniform_evaluator',
+]
+
+UNEXPANDED = -1
+PENDING = -2
+
+
+def move_to_index(move, num_rows, num_cols):
+    """Flat index of a play move, with num_rows * num_cols for a pass.
+
+    >>> from dlgo.gotypes import Point
+    >>> move_to_index(Move.play(Point(2, 3)), 9, 9)
+    11
+    >>> move_to_index(Move.pass_turn(), 9, 9)
+    81
+    """
+    if move.is_pass:
+        return num_rows * num_cols
+    return (move.point.row - 1) * num_cols + move.point.col - 1
+
+
+def index_to_move(index, num_rows, num_cols):
+    if index == num_rows * num_cols:
+        return Move.pass_turn()
+    board = geometry(num_rows, num_cols)
+    return board.moves[board.points[index]]
+
+
+def uniform_evaluator(game_state):
+    """Uniform priors and a neutral value; a baseline for measuring the
+    cost of the search itself."""
+    board = game_state.board
+    num_moves = board.num_rows * board.num_cols + 1
+    return np.full(num_moves, 1.0 / num_moves, dtype=np.float32), 0.0
+
+
+class MCTS():
+    """PUCT search driven by an evaluator.
+
+    An evaluator is called as ``evaluator(game_state)`` and returns a
+    prior for every move index (see move_to_index) and a value in [-1, 1]
+    from the point of view of the player to move; for finished games only
+    the value is used. Node values are stored from the point of view of the
+    player who made the move leading to the node.
+
+    >>> from dlgo.goboard_fast import GameState
+    >>> search = MCTS(uniform_evaluator, capacity=20000, num_threads=2)
+    >>> move = search.select_move(GameState.new_game(9), num_playouts=50)
+    >>> int(search.visits[search.root])
+    50
+
+    >>> from dlgo.transposition import TranspositionTable
+    >>> table = TranspositionTable()
+    >>> first = MCTS(uniform_evaluator, capacity=20000, transpositions=table)
+    >>> second = MCTS(uniform_evaluator, capacity=20000, transpositions=table)
+    >>> game = GameState.new_game(5)
+    >>> first.select_move(game, 100) == second.select_move(game, 100)
+    True
+    >>> table.hit_rate >= 0.5
+    True
+
+    Searching again from a position in the tree keeps its subtree, and
+    select_move counts the kept visits towards num_playouts:
+
+    >>> move = first.select_move(game, 100)
+    >>> first.set_root(game.apply_move(move))
+    >>> first.reused_visits > 0
+    True
+
+    Pondering after a move searches the replies ahead of time:
+
+    >>> game = game.apply_move(first.select_move(game, 100))
+    >>> first.ponder(game, num_playouts=200)
+    >>> first.stop_pondering() <= 200
+    True
+    """
+    def __init__(self, evaluator, capacity=1 << 20, c_puct=1.5,
+                 virtual_loss=3, num_threads=1, num_playouts=800,
+                 transpositions=None):
+        self.evaluator = evaluator
+        self.transpositions = transpositions
+        self.capacity = capacity
+        self.c_puct = c_puct
+        self.virtual_loss = virtual_loss
+        self.num_threads = num_threads
+        self.num_playouts = num_playouts
+        self.visits = np.zeros(capacity, dtype=np.int32)
+        self.value_sum = np.zeros(capacity, dtype=np.float64)
+        self.prior = np.zeros(capacity, dtype=np.float32)
+        self.first_child = np.zeros(capacity, dtype=np.int32)
+        self.num_children = np.full(capacity, UNEXPANDED, dtype=np.int32)
+        self.parent = np.full(capacity, -1, dtype=np.int32)
+        self.move = np.zeros(capacity, dtype=np.int32)
+        self._states = [None] * capacity
+        self._size = 0
+        self._free = {}
+        self._num_free = 0
+        self._lock = threading.Lock()
+        self._remaining = 0
+        self._deadline = None
+        self._error = None
+        self._ponder_thread = None
+        self._ponder_start = 0
+        self.pondered_playouts = 0
+        self.root = -1
+        self.playouts = 0
+        self.elapsed = 0.0
+        self.reused_visits = 0
+
+    @property
+    def playouts_per_second(self):
+        return self.playouts / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def num_nodes(self):
+        return self._size - self._num_free
+
+    def reset(self):
+        """Discard the whole tree."""
+        self.stop_pondering()
+        self.pondered_playouts = 0
+        self._states[:self._size] = [None] * self._size
+        self._size = 0
+        self._free = {}
+        self._num_free = 0
+        self.root = -1
+
+    def set_root(self, game_state, max_depth=8):
+        """Search from game_state next, keeping the subtree for it if
+        game_state follows the current root by at most max_depth moves."""
+        self.stop_pondering()
+        self.reused_visits = 0
+        node = self._find(game_state, max_depth)
+        if node < 0:
+            self.reset()
+            self.root = self._allocate(1)
+            self.parent[self.root] = -1
+            self._states[self.root] = game_state
+            return
+        self._promote(node, game_state)
+        self.reused_visits = int(self.visits[self.root])
+
+    def _find(self, game_state, max_depth):
+        if self.root < 0:
+            return -1
+        root_state = self._states[self.root]
+        moves = []
+        state = game_state
+        while state is not root_state:
+            if state is None or len(moves) >= max_depth:
+                return -1
+            moves.append(state.last_move)
+            state = state.previous_state
+        board = root_state.board
+        node = self.root
+        for move in reversed(moves):
+            if move.is_resign or self.num_children[node] <= 0:
+                return -1
+            start = self.first_child[node]
+            children = self.move[start:start + self.num_children[node]]
+            index = move_to_index(move, board.num_rows, board.num_cols)
+            found = np.flatnonzero(children == index)
+            if not len(found):
+                return -1
+            node = start + int(found[0])
+        return node
+
+    def _promote(self, node, game_state):
+        """Make node the root, moving it into the old root's slot, and free
+        every block outside its subtree."""
+        root = self.root
+        self._states[root] = game_state
+        if node == root:
+            return
+        blocks = []
+        stack = [root]
+        while stack:
+            current = stack.pop()
+            count = self.num_children[current]
+            if current == node or count <= 0:
+                continue
+            start = self.first_child[current]
+            blocks.append((start, count))
+            stack.extend(range(start, start + count))
+        for array in (self.visits, self.value_sum, self.prior,
+                      self.first_child, self.num_children, self.move):
+            array[root] = array[node]
+        self.parent[root] = -1
+        if self.num_children[root] > 0:
+            start = self.first_child[root]
+            self.parent[start:start + self.num_children[root]] = root
+        for start, count in blocks:
+            self._states[start:start + count] = [None] * count
+            self._free.setdefault(count, []).append(start)
+            self._num_free += count
+
+    def select_move(self, game_state, num_playouts=None, think_time=None):
+        """Search from game_state and return the most visited move.
+
+        With think_time (in seconds) the search also stops when the time is
+        up, whatever playouts are left, though never before the root is
+        expanded.
+        """
+        start = time.perf_counter()
+        self.set_root(game_state)
+        num_playouts = num_playouts or self.num_playouts
+        deadline = None if think_time is None else start + think_time
+        num_playouts = max(0, num_playouts - self.reused_visits)
+        if self.num_children[self.root] == UNEXPANDED:
+            num_playouts = max(num_playouts, 1)
+        self.pondered_playouts = 0
+        self.search(num_playouts, deadline)
+        return self.best_move()
+
+    def ponder(self, game_state, num_playouts=None):
+        """Search from game_state, the position after our own move, on a
+        background thread until stop_pondering, set_root or select_move is
+        called or num_playouts (by default half the per-move budget) have
+        run."""
+        self.set_root(game_state)
+        self._ponder_start = self.playouts
+        # Set before the thread starts, so stop_pondering can't be undone.
+        self._remaining = num_playouts or self.num_playouts // 2
+        self._deadline = None
+        self._ponder_thread = threading.Thread(target=self._ponder,
+                                               daemon=True)
+        self._ponder_thread.start()
+
+    def _ponder(self):
+        try:
+            self._run()
+        except Exception:
+            # The failed playout left the tree as it was; the next search
+            # calls the evaluator again and raises if it still fails.
+            pass
+
+    @property
+    def is_pondering(self):
+        return self._ponder_thread is not None and \
+            self._ponder_thread.is_alive()
+
+    def stop_pondering(self):
+        """Stop a background search and return the playouts it ran, which
+        are also added to ``pondered_playouts``."""
+        thread = self._ponder_thread
+        if thread is None:
+            return 0
+        with self._lock:
+            self._remaining = 0
+        thread.join()
+        self._ponder_thread = None
+        pondered = self.playouts - self._ponder_start
+        self.pondered_playouts += pondered
+        return pondered
+
+    def best_move(self):
+        start = self.first_child[self.root]
+        count = self.num_children[self.root]
+        if count <= 0:
+            return Move.pass_turn()
+        child = start + int(np.argmax(self.visits[start:start + count]))
+        board = self._states[self.root].board
+        return index_to_move(int(self.move[child]),
+                             board.num_rows, board.num_cols)
+
+    def search(self, num_playouts, deadline=None):
+        """Run num_playouts playouts, or fewer if the time.perf_counter()
+        deadline passes first."""
+        self._remaining = num_playouts
+        self._deadline = deadline
+        self._run()
+
+    def _run(self):
+        start = time.perf_counter()
+        if self.num_threads == 1:
+            while self._playout():
+                pass
+        else:
+            def worker():
+                while self._playout():
+                    pass
+            threads = [threading.Thread(target=worker)
+                       for _ in range(self.num_threads)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.elapsed += time.perf_counter() - start
+        error, self._error = self._error, None
+        if error is not None:
+            raise error
+
+    def _playout(self):
+        """Run one playout; False once the search budget is used up."""
+        with self._lock:
+            if self._remaining <= 0:
+                return False
+            if self._deadline is not None and \
+                    self.num_children[self.root] != UNEXPANDED and \
+                    time.perf_counter() >= self._deadline:
+                self._remaining = 0
+                return False
+            path = self._select()
+            leaf = path[-1]
+            if self.num_children[leaf] == PENDING:
+                # Another thread is evaluating this leaf; try again.
+                self._revert(path)
+                return True
+            self._remaining -= 1
+            state = self._state_of(leaf)
+            expand = self.num_children[leaf] == UNEXPANDED
+            if expand:
+                self.num_children[leaf] = PENDING
+            entry = None
+            if self.transpositions is not None:
+                key = position_key(state)
+                entry = self.transpositions.lookup(key)
+        if entry is None:
+            try:
+                priors, value = self.evaluator(state)
+            except Exception as error:
+                with self._lock:
+                    if expand:
+                        self.num_children[leaf] = UNEXPANDED
+                    self._revert(path)
+                    # Stop every thread; _run raises the first error.
+                    self._remaining = 0
+                    if self._error is None:
+                        self._error = error
+                return False
+        else:
+            priors, value = entry.priors, entry.value
+        with self._lock:
+            if entry is None:
+                moves, next_hashes = self._candidates(state)
+                if self.transpositions is not None:
+                    entry = self.transpositions.store(
+                        key, priors, moves, next_hashes)
+            else:
+                moves, next_hashes = entry.moves, entry.next_hashes
+            if entry is not None:
+                entry.add_value(value)
+            if expand:
+                self._expand(leaf, state, priors, moves, next_hashes)
+            self._backup(path, value)
+            self.playouts += 1
+        return True
+
+    def _select(self):
+        node = self.root
+        path = [node]
+        while self.num_children[node] > 0:
+            node = self._best_child(node)
+            path.append(node)
+        self.visits[path] += self.virtual_loss
+        self.value_sum[path] -= self.virtual_loss
+        return path
+
+    def _best_child(self, node):
+        start = self.first_child[node]
+        end = start + self.num_children[node]
+        visits = self.visits[start:end]
+        q = self.value_sum[start:end] / np.maximum(visits, 1)
+        u = self.c_puct * math.sqrt(self.visits[node] + 1) * \
+            self.prior[start:end] / (1 + visits)
+        return start + int(np.argmax(q + u))
+
+    def _candidates(self, state):
+        """Plays that are legal in this position regardless of history,
+        with the board hash each of them leads to."""
+        if state.is_over():
+            return [], []
+        board = state.board
+        player = state.next_player
+        colors = board.colors
+        point_at = board.geometry.point_at
+        moves = []
+        next_hashes = []
+        for index, idx in enumerate(board.geometry.points):
+            point = point_at[idx]
+            if colors[idx] == EMPTY and \
+                    not board.is_self_capture(player, point):
+                moves.append(index)
+                next_hashes.append(board.hash_after(player, point))
+        return moves, next_hashes
+
+    def _expand(self, node, state, priors, moves, next_hashes):
+        if state.is_over():
+            self.num_children[node] = 0
+            return
+        board = state.board
+        player = state.next_player
+        legal = [move for move, next_hash in zip(moves, next_hashes)
+                 if not state.repeats_position(player, next_hash)]
+        legal.append(board.num_rows * board.num_cols)
+        count = len(legal)
+        start = self._allocate(count)
+        if start < 0:
+            # Out of nodes: keep evaluating this node as a leaf.
+            self.num_children[node] = 0
+            return
+        end = start + count
+        p = np.asarray(priors, dtype=np.float32)[legal]
+        total = p.sum()
+        self.prior[start:end] = p / total if total > 0 else 1.0 / count
+        self.move[start:end] = legal
+        self.parent[start:end] = node
+        self.first_child[node] = start
+        self.num_children[node] = count
+
+    def _allocate(self, count):
+        """First id of a free block of count nodes, or -1 if the pool is
+        exhausted. Reuses a freed block of that size, then fresh ids, then
+        splits the smallest larger freed block."""
+        starts = self._free.get(count)
+        if starts:
+            start = starts.pop()
+            self._num_free -= count
+        elif self._size + count <= self.capacity:
+            start = self._size
+            self._size += count
+        else:
+            sizes = [size for size, starts in self._free.items()
+                     if size > count and starts]
+            if not sizes:
+                return -1
+            size = min(sizes)
+            start = self._free[size].pop()
+            self._free.setdefault(size - count, []).append(start + count)
+            self._num_free -= count
+        end = start + count
+        self.visits[start:end] = 0
+        self.value_sum[start:end] = 0.0
+        self.num_children[start:end] = UNEXPANDED
+        return start
+
+    def _state_of(self, node):
+        state = self._states[node]
+        if state is None:
+            parent_state = self._state_of(self.parent[node])
+            board = parent_state.board
+            move = index_to_move(int(self.move[node]),
+                                 board.num_rows, board.num_cols)
+            state = parent_state.apply_move(move)
+            self._states[node] = state
+        return state
+
+    def _backup(self, path, value):
+        signs = np.empty(len(path))
+        signs[::-1] = -1.0
+        signs[-2::-2] = 1.0
+        self.visits[path] += 1 - self.virtual_loss
+        self.value_sum[path] += signs * value + self.virtual_loss
+
+    def _revert(self, path):
+        self.visits[path] -= self.virtual_loss
+        self.value_sum[path] += self.virtual_loss
@@ -0,0 +1,187 @@
+"""Chapter 6 convolution as a layer of the appendix B network.
+
+A Conv2D layer takes the usual (dim, batch) columns, each holding
+``channels`` feature planes of the board flattened plane by plane, and
+returns ``filters`` planes of the same size ("same" padding). Its buffers
+are laid out (channel, row, col, batch) with the batch innermost, so every
+board point of every sample is one contiguous run for the matrix products.
+
+The forward pass copies the input into a zero-bordered buffer, takes the
+im2col patches of it as a ``np.lib.stride_tricks`` view and copies that
+view into a column matrix with a trailing row of ones, so the convolution
+and its bias are a single product with ``[W | b]``. The backward pass gets
+the weight gradient from one product with the same column matrix and the
+input delta from one product with ``W^T``, folded back onto the padded
+board with one shifted add per kernel offset.
+
+The padded and column buffers are sized once per batch size: a 19x19 board
+with a 3x3 kernel pads to 21x21, so ``C * 9`` rows of ``361 * batch``
+columns.
+"""
+import time
+
+import numpy as np
+from numpy.lib.stride_tricks import as_strided
+
+from dlgo.nn.layers import Layer
+
+__all__ = [
+    'Conv2D',
+    'benchmark',
+    'conv2d_naive',
+]
+
+
+class Conv2D(Layer):
+    """Same-padded 2D convolution with a square, odd-sized kernel.
+
+    >>> rng = np.random.default_rng(0)
+    >>> conv = Conv2D(2, 5, 5, filters=3, kernel_size=3, rng=rng)
+    >>> x = np.vstack([rng.standard_normal((2 * 25, 4)), np.ones((1, 4))])
+    >>> conv.allocate(4)
+    >>> out = conv.forward(x)[:-1].reshape(3, 5, 5, 4)
+    >>> expected = conv2d_naive(x[:-1].reshape(2, 5, 5, 4),
+    ...                         conv.weight, conv.bias)
+    >>> np.allclose(out, expected)
+    True
+    """
+    def __init__(self, channels, rows, cols, filters, kernel_size=3,
+                 rng=None):
+        super(Conv2D, self).__init__()
+        if kernel_size % 2 == 0:
+            raise ValueError('same padding needs an odd kernel_size')
+        self.channels = channels
+        self.rows = rows
+        self.cols = cols
+        self.filters = filters
+        self.kernel_size = kernel_size
+        self.input_dim = channels * rows * cols
+        self.output_dim = filters * rows * cols
+        rng = rng or np.random.default_rng()
+        patch = channels * kernel_size * kernel_size
+        self.weight_bias = rng.standard_normal((filters, patch + 1)) / \
+            np.sqrt(patch)
+        self.weight = self.weight_bias[:, :-1].reshape(
+            filters, channels, kernel_size, kernel_size)
+        self.bias = self.weight_bias[:, -1]
+        self.delta_weight_bias = np.zeros_like(self.weight_bias)
+        self.params = [self.weight_bias]
+        self.grads = [self.delta_weight_bias]
+
+    def _make_buffers(self, batch_size, empty):
+        buffers = super(Conv2D, self)._make_buffers(batch_size, empty)
+        k = self.kernel_size
+        pad = k // 2
+        padded_shape = (self.channels, self.rows + 2 * pad,
+                        self.cols + 2 * pad, batch_size)
+        padded = empty('padded', padded_shape)
+        padded[...] = 0.0
+        points = self.rows * self.cols * batch_size
+        # The backward pass reads the forward columns, so the layer keeps
+        # its own copy rather than asking the factory for a shared one.
+        columns = np.empty((self.channels * k * k + 1, points))
+        columns[-1] = 1.0
+        buffers.update({
+            '_padded': padded,
+            '_patches': _patches(padded, k, self.rows, self.cols),
+            '_columns': columns,
+            '_column_patches': columns[:-1].reshape(
+                self.channels, k, k, self.rows, self.cols, batch_size),
+            '_delta_columns': empty(
+                'delta_columns', (self.channels * k * k + 1, points)),
+            '_delta_padded': empty('delta_padded', padded_shape),
+        })
+        return buffers
+
+    def _interior(self, padded):
+        pad = self.kernel_size // 2
+        return padded[:, pad:pad + self.rows, pad:pad + self.cols]
+
+    def forward(self, input_buffer):
+        batch_size = input_buffer.shape[1]
+        self._interior(self._padded)[...] = input_buffer[:-1].reshape(
+            self.channels, self.rows, self.cols, batch_size)
+        np.copyto(self._column_patches, self._patches)
+        np.dot(self.weight_bias, self._columns,
+               out=self.output_data.reshape(self.filters, -1))
+        return self.output_buffer
+
+    def backward(self, output_delta, input_buffer, need_input_delta=True):
+        delta = output_delta.reshape(self.filters, -1)
+        np.dot(delta, self._columns.T, out=self.delta_weight_bias)
+        if not need_input_delta:
+            return None
+        np.dot(self.weight_bias.T, delta, out=self._delta_columns)
+        k = self.kernel_size
+        batch_size = output_delta.shape[1]
+        delta_columns = self._delta_columns[:-1].reshape(
+            self.channels, k, k, self.rows, self.cols, batch_size)
+        delta_padded = self._delta_padded
+        delta_padded[...] = 0.0
+        for i in range(k):
+            for j in range(k):
+                delta_padded[:, i:i + self.rows, j:j + self.cols] += \
+                    delta_columns[:, i, j]
+        self.input_delta.reshape(
+            self.channels, self.rows, self.cols, batch_size)[...] = \
+            self._interior(delta_padded)
+        return self.input_delta
+
+    def describe(self):
+        return '|-- Conv2D\n  |-- planes: ({},{}) on {}x{}, kernel {}'.format(
+            self.channels, self.filters, self.rows, self.cols,
+            self.kernel_size)
+
+
+def _patches(padded, kernel_size, rows, cols):
+    """(channel, ki, kj, row, col, batch) view of the kernel_size x
+    kernel_size window around every point of a padded buffer."""
+    channel, row, col, batch = padded.strides
+    return as_strided(
+        padded,
+        shape=(padded.shape[0], kernel_size, kernel_size, rows, cols,
+               padded.shape[3]),
+        strides=(channel, row, col, row, col, batch),
+        writeable=False)
+
+
+def conv2d_naive(x, weight, bias):
+    """Reference same-padded convolution of (channels, rows, cols, batch)
+    planes with (filters, channels, k, k) weights, one output point at a
+    time."""
+    channels, rows, cols, batch_size = x.shape
+    filters, _, k, _ = weight.shape
+    pad = k // 2
+    padded = np.zeros((channels, rows + 2 * pad, cols + 2 * pad, batch_size))
+    padded[:, pad:pad + rows, pad:pad + cols] = x
+    out = np.empty((filters, rows, cols, batch_size))
+    for f in range(filters):
+        for r in range(rows):
+            for c in range(cols):
+                window = padded[:, r:r + k, c:c + k]
+                out[f, r, c] = np.tensordot(
+                    weight[f], window, axes=3) + bias[f]
+    return out
+
+
+def benchmark(channels=8, filters=32, board_size=19, batch_size=32,
+              kernel_size=3, repeat=3, rng=None):
+    """Seconds per forward pass of Conv2D and of conv2d_naive on random
+    planes, best of repeat runs."""
+    rng = rng or np.random.default_rng()
+    conv = Conv2D(channels, board_size, board_size, filters, kernel_size,
+                  rng=rng)
+    x = np.ones((conv.input_dim + 1, batch_size))
+    x[:-1] = rng.standard_normal((conv.input_dim, batch_size))
+    conv.allocate(batch_size)
+    planes = x[:-1].reshape(channels, board_size, board_size, batch_size)
+    timings = []
+    for run in (lambda: conv.forward(x),
+                lambda: conv2d_naive(planes, conv.weight, conv.bias)):
+        best = float('inf')
+        for _ in range(repeat):
+            start = time.perf_counter()
+            run()
+            best = min(best, time.perf_counter() - start)
+        timings.append(best)
+    return tuple(timings)
@@ -0,0 +1,423 @@
+"""Reverse-mode differentiation over a graph of layers.
+
+Appendix B's backpropagation for networks in general: a node may read
+several earlier nodes and feed several later ones, so a shared trunk can
+end in separate policy and value heads. Nodes are created in topological
+order, the forward pass runs them in that order and the backward pass in
+reverse, adding up the deltas a node receives from all of its consumers.
+
+Like the sequential network, values carry a trailing row of ones and dense
+nodes store ``[W | b]`` as one matrix. Buffers are planned once per batch
+size: every value and every delta is live from the step that writes it to
+the last step that reads it, and a buffer goes back to the pool as soon as
+that last reader is done, so later nodes of the same width reuse it. The
+backward pass only keeps the values it needs, e.g. the input of a dense
+node and the output of an activation, so the output of a sum or of a dense
+node that feeds only an activation is released after the forward pass.
+"""
+import heapq
+
+import numpy as np
+
+from dlgo.nn.layers import sigmoid
+
+__all__ = [
+    'Graph',
+    'Node',
+]
+
+
+class Node():
+    """A value in the graph: the op computing it and the nodes it reads."""
+    __slots__ = ('index', 'op', 'inputs', 'dim', 'name')
+
+    def __init__(self, index, op, inputs, dim, name=None):
+        self.index = index
+        self.op = op
+        self.inputs = inputs
+        self.dim = dim
+        self.name = name
+
+    def __repr__(self):
+        return 'Node({}, {}, dim={})'.format(
+            self.index, type(self.op).__name__.lstrip('_'), self.dim)
+
+
+class _Op():
+    """``forward(inputs, out)`` fills the data rows of out from the input
+    buffers; ``backward(delta, inputs, out, targets)`` writes the delta for
+    input k into ``targets[k]`` unless it is None. ``needs_inputs`` and
+    ``needs_output`` say which values the backward pass reads."""
+    needs_inputs = False
+    needs_output = False
+    params = ()
+    grads = ()
+
+
+class _Input(_Op):
+    pass
+
+
+class _Dense(_Op):
+    needs_inputs = True
+
+    def __init__(self, input_dim, output_dim, rng):
+        self.weight_bias = rng.standard_normal((output_dim, input_dim + 1))
+        self.delta_weight_bias = np.zeros_like(self.weight_bias)
+        self.params = (self.weight_bias,)
+        self.grads = (self.delta_weight_bias,)
+
+    def forward(self, inputs, out):
+        np.dot(self.weight_bias, inputs[0], out=out[:-1])
+
+    def backward(self, delta, inputs, out, targets):
+        np.dot(delta, inputs[0].T, out=self.delta_weight_bias)
+        if targets[0] is not None:
+            np.dot(self.weight_bias.T, delta, out=targets[0])
+
+
+class _Sigmoid(_Op):
+    needs_output = True
+
+    def forward(self, inputs, out):
+        sigmoid(inputs[0][:-1], out=out[:-1])
+
+    def backward(self, delta, inputs, out, targets):
+        if targets[0] is None:
+            return
+        output = out[:-1]
+        target = np.subtract(1.0, output, out=targets[0][:-1])
+        target *= output
+        target *= delta
+
+
+class _Tanh(_Op):
+    needs_output = True
+
+    def forward(self, inputs, out):
+        np.tanh(inputs[0][:-1], out=out[:-1])
+
+    def backward(self, delta, inputs, out, targets):
+        if targets[0] is None:
+            return
+        output = out[:-1]
+        target = np.multiply(output, output, out=targets[0][:-1])
+        np.subtract(1.0, target, out=target)
+        target *= delta
+
+
+class _Relu(_Op):
+    needs_output = True
+
+    def forward(self, inputs, out):
+        np.maximum(inputs[0][:-1], 0.0, out=out[:-1])
+
+    def backward(self, delta, inputs, out, targets):
+        if targets[0] is None:
+            return
+        # The output is non-negative, so its sign is the 0/1 derivative.
+        target = np.sign(out[:-1], out=targets[0][:-1])
+        target *= delta
+
+
+class _Softmax(_Op):
+    """Softmax over the rows of each column."""
+    needs_output = True
+
+    def __init__(self):
+        self._rows = {}
+
+    def _row(self, batch_size):
+        row = self._rows.get(batch_size)
+        if row is None:
+            row = self._rows[batch_size] = np.empty((1, batch_size))
+        return row
+
+    def forward(self, inputs, out):
+        z, output = inputs[0][:-1], out[:-1]
+        row = self._row(z.shape[1])
+        np.max(z, axis=0, keepdims=True, out=row)
+        np.subtract(z, row, out=output)
+        np.exp(output, out=output)
+        np.sum(output, axis=0, keepdims=True, out=row)
+        output /= row
+
+    def backward(self, delta, inputs, out, targets):
+        if targets[0] is None:
+            return
+        output, target = out[:-1], targets[0][:-1]
+        row = self._row(output.shape[1])
+        np.multiply(output, delta, out=target)
+        np.sum(target, axis=0, keepdims=True, out=row)
+        np.subtract(delta, row, out=target)
+        target *= output
+
+
+class _Add(_Op):
+    def forward(self, inputs, out):
+        output = out[:-1]
+        np.add(inputs[0][:-1], inputs[1][:-1], out=output)
+        for value in inputs[2:]:
+            output += value[:-1]
+
+    def backward(self, delta, inputs, out, targets):
+        for target in targets:
+            if target is not None:
+                np.copyto(target[:-1], delta)
+
+
+class _Plan():
+    """Buffer assignment for one batch size and mode.
+
+    ``values[i]`` and ``deltas[i]`` are the buffers of node i (None when
+    not needed), ``accumulate[(i, k)]`` is True when the delta for input k
+    of node i has to be added to what earlier writers left there.
+    """
+    def __init__(self, values, deltas, accumulate, scratch, nbytes):
+        self.values = values
+        self.deltas = deltas
+        self.accumulate = accumulate
+        self.scratch = scratch
+        self.nbytes = nbytes
+
+
+class Graph():
+    """A network of nodes trained by reverse-mode differentiation.
+
+    A two-headed network with a shared trunk and a residual sum:
+
+    >>> from dlgo.nn.losses import MSE, CrossEntropy
+    >>> rng = np.random.default_rng(0)
+    >>> g = Graph()
+    >>> board = g.input('board', 4)
+    >>> trunk = g.relu(g.dense(board, 16, rng=rng))
+    >>> trunk = g.relu(g.add(trunk, g.dense(trunk, 16, rng=rng)))
+    >>> g.output('policy', g.softmax(g.dense(trunk, 3, rng=rng)),
+    ...          CrossEntropy())
+    >>> g.output('value', g.tanh(g.dense(trunk, 1, rng=rng)), MSE())
+    >>> x = rng.standard_normal((4, 64))
+    >>> targets = {'policy': np.eye(3)[:, x.argmax(axis=0) % 3],
+    ...            'value': np.tanh(x[:1])}
+    >>> before = g.loss({'board': x}, targets)
+    >>> for _ in range(300):
+    ...     g.train_batch({'board': x}, targets, learning_rate=0.05)
+    >>> g.loss({'board': x}, targets) < before / 2
+    True
+    >>> g.activation_nbytes(64) < g.activation_nbytes(64, reuse=False)
+    True
+    """
+    def __init__(self):
+        self.nodes = []
+        self.inputs = {}
+        self.outputs = {}
+        self._plans = {}
+
+    def _node(self, op, inputs, dim, name=None):
+        node = Node(len(self.nodes), op, tuple(inputs), dim, name)
+        self.nodes.append(node)
+        self._plans = {}
+        return node
+
+    def input(self, name, dim):
+        node = self._node(_Input(), (), dim, name)
+        self.inputs[name] = node
+        return node
+
+    def dense(self, node, output_dim, rng=None):
+        op = _Dense(node.dim, output_dim, rng or np.random.default_rng())
+        return self._node(op, (node,), output_dim)
+
+    def sigmoid(self, node):
+        return self._node(_Sigmoid(), (node,), node.dim)
+
+    def tanh(self, node):
+        return self._node(_Tanh(), (node,), node.dim)
+
+    def relu(self, node):
+        return self._node(_Relu(), (node,), node.dim)
+
+    def softmax(self, node):
+        return self._node(_Softmax(), (node,), node.dim)
+
+    def add(self, *nodes):
+        dims = set(node.dim for node in nodes)
+        if len(nodes) < 2 or len(dims) != 1:
+            raise ValueError('add needs two or more nodes of equal width')
+        return self._node(_Add(), nodes, nodes[0].dim)
+
+    def output(self, name, node, loss):
+        """Mark node as the output name, trained against loss."""
+        node.name = node.name or name
+        self.outputs[name] = (node, loss)
+        self._plans = {}
+
+    def forward(self, inputs):
+        """Dict of output name to (dim, batch) value for a dict of input
+        name to (dim, batch) data; the values are views of planned buffers
+        that the next pass reuses."""
+        plan = self._run_forward(inputs, training=False)
+        return {name: plan.values[node.index][:-1]
+                for name, (node, _) in self.outputs.items()}
+
+    def loss(self, inputs, targets):
+        outputs = self.forward(inputs)
+        return sum(loss.loss_function(outputs[name], targets[name])
+                   for name, (_, loss) in self.outputs.items())
+
+    def train_batch(self, inputs, targets, learning_rate):
+        plan = self._run_forward(inputs, training=True)
+        batch_size = self._batch_size(inputs)
+        for name, (node, loss) in self.outputs.items():
+            loss.loss_derivative(plan.values[node.index][:-1], targets[name],
+                                 out=plan.deltas[node.index][:-1])
+        for node in reversed(self.nodes):
+            delta = plan.deltas[node.index]
+            if delta is None or not node.inputs:
+                continue
+            sources = [plan.values[n.index] for n in node.inputs]
+            input_deltas = []
+            for k, source in enumerate(node.inputs):
+                input_delta = plan.deltas[source.index]
+                if input_delta is not None and plan.accumulate[node.index, k]:
+                    input_delta = plan.scratch[source.dim]
+                input_deltas.append(input_delta)
+            node.op.backward(delta[:-1], sources, plan.values[node.index],
+                             input_deltas)
+            for k, source in enumerate(node.inputs):
+                if input_deltas[k] is not None and \
+                        plan.accumulate[node.index, k]:
+                    plan.deltas[source.index] += input_deltas[k]
+        for node in self.nodes:
+            for param, grad in zip(node.op.params, node.op.grads):
+                grad *= learning_rate / batch_size
+                param -= grad
+
+    def activation_nbytes(self, batch_size, training=True, reuse=True):
+        """Bytes of value and delta buffers for one batch; without reuse,
+        what one buffer per value and per delta would take."""
+        return self._plan(batch_size, training, reuse).nbytes
+
+    def _batch_size(self, inputs):
+        return next(iter(inputs.values())).shape[1]
+
+    def _run_forward(self, inputs, training):
+        plan = self._plan(self._batch_size(inputs), training)
+        for name, node in self.inputs.items():
+            np.copyto(plan.values[node.index][:-1], inputs[name])
+        for node in self.nodes:
+            if node.inputs:
+                node.op.forward([plan.values[n.index] for n in node.inputs],
+                                plan.values[node.index])
+        return plan
+
+    def _plan(self, batch_size, training, reuse=True):
+        key = (batch_size, training, reuse)
+        plan = self._plans.get(key)
+        if plan is None:
+            plan = self._plans[key] = self._make_plan(
+                batch_size, training, reuse)
+        return plan
+
+    def _make_plan(self, batch_size, training, reuse):
+        # Node i runs forward at step i and backward at step 2n - i; the
+        # losses are taken at step n. Inputs are written before step 0.
+        nodes = self.nodes
+        n = len(nodes)
+
+        def backward_step(node):
+            return 2 * n - node.index
+
+        outputs = set(node.index for node, _ in self.outputs.values())
+        wants_delta = [False] * n
+        for index in outputs:
+            wants_delta[index] = True
+        if training:
+            for node in reversed(nodes):
+                if wants_delta[node.index]:
+                    for source in node.inputs:
+                        wants_delta[source.index] = \
+                            not isinstance(source.op, _Input)
+
+        last_read = [-1 if isinstance(node.op, _Input) else node.index
+                     for node in nodes]
+        first_write = list(last_read)
+        delta_start = [None] * n
+        writers = [[] for _ in range(n)]
+        for index in outputs:
+            last_read[index] = n
+            writers[index].append(None)
+        for node in nodes:
+            for source in node.inputs:
+                last_read[source.index] = max(last_read[source.index],
+                                              node.index)
+        if training:
+            for node in reversed(nodes):
+                if not wants_delta[node.index]:
+                    continue
+                step = backward_step(node)
+                if node.op.needs_output:
+                    last_read[node.index] = step
+                for k, source in enumerate(node.inputs):
+                    if node.op.needs_inputs:
+                        last_read[source.index] = max(
+                            last_read[source.index], step)
+                    if wants_delta[source.index]:
+                        writers[source.index].append((node.index, k))
+            for node in nodes:
+                if writers[node.index]:
+                    delta_start[node.index] = n if node.index in outputs \
+                        else backward_step(nodes[writers[node.index][0][0]])
+
+        intervals = []
+        for node in nodes:
+            intervals.append((first_write[node.index],
+                              last_read[node.index], node.dim,
+                              ('value', node.index)))
+            if delta_start[node.index] is not None:
+                intervals.append((delta_start[node.index],
+                                  backward_step(node), node.dim,
+                                  ('delta', node.index)))
+        buffers = _assign(intervals, batch_size, reuse)
+        values = [buffers[('value', i)] for i in range(n)]
+        deltas = [buffers.get(('delta', i)) for i in range(n)]
+        accumulate = {}
+        scratch = {}
+        for node in nodes:
+            for position, writer in enumerate(writers[node.index]):
+                if writer is not None:
+                    accumulate[writer] = position > 0
+                    if position > 0 and node.dim not in scratch:
+                        scratch[node.dim] = _buffer(node.dim, batch_size)
+        for node in nodes:
+            for k in range(len(node.inputs)):
+                accumulate.setdefault((node.index, k), False)
+        arrays = dict((id(b), b) for b in values + deltas if b is not None)
+        arrays.update((id(b), b) for b in scratch.values())
+        nbytes = sum(b.nbytes for b in arrays.values())
+        return _Plan(values, deltas, accumulate, scratch, nbytes)
+
+
+def _buffer(dim, batch_size):
+    buffer = np.empty((dim + 1, batch_size))
+    buffer[-1] = 1.0
+    return buffer
+
+
+def _assign(intervals, batch_size, reuse):
+    """Give every (start, end, dim, key) interval a buffer, handing a
+    buffer to a later interval of the same kind and width once its end has
+    passed. Values and deltas don't share buffers, since a dense node's
+    backward pass overwrites the row of ones of its input delta."""
+    buffers = {}
+    free = {}
+    busy = []
+    for order, (start, end, dim, key) in enumerate(sorted(
+            intervals, key=lambda interval: interval[:2])):
+        while reuse and busy and busy[0][0] < start:
+            _, _, released, buffer = heapq.heappop(busy)
+            free.setdefault(released, []).append(buffer)
+        pool = free.get((key[0], dim))
+        buffer = pool.pop() if pool else _buffer(dim, batch_size)
+        buffers[key] = buffer
+        heapq.heappush(busy, (end, order, (key[0], dim), buffer))
+    return buffers
@@ -0,0 +1,196 @@
+"""Layers of the chapter 5 feed-forward network, vectorized over batches.
+
+Inputs and outputs are (dim, batch) arrays, one column per sample, so a
+dense layer computes ``z = W · y + b`` as in appendix B. Each activation
+buffer carries an extra trailing row of ones and a dense layer stores
+``[W | b]`` as one matrix, so the affine map, and on the way back both
+parameter gradients, are each a single matrix product with no broadcast.
+
+Every layer owns preallocated buffers for its output and input delta, made
+once per batch size by ``allocate`` and reused for every later batch of
+that size, and gradient buffers shaped like its parameters; forward,
+backward and the parameter update all write into them in place.
+"""
+import numpy as np
+
+
+def sigmoid(z, out=None):
+    """In-place friendly logistic function.
+
+    >>> sigmoid(np.array([0.0]))
+    array([0.5])
+    """
+    out = np.negative(z, out=out)
+    np.exp(out, out=out)
+    out += 1.0
+    return np.reciprocal(out, out=out)
+
+
+def _owned(name, shape):
+    return np.empty(shape)
+
+
+class Layer():
+    """Base class. ``forward`` takes an input buffer (data rows plus the
+    row of ones) and returns the layer's own output buffer; ``backward``
+    takes the delta for the output rows and the same input buffer, stores
+    parameter gradients in ``grads`` and returns the delta for the input
+    rows."""
+    def __init__(self):
+        self.params = []
+        self.grads = []
+        self.batch_size = None
+        self.output_buffer = None
+        self.output_data = None
+        self.input_delta = None
+        self._buffers = {}
+
+    def allocate(self, batch_size, empty=None):
+        """Switch to the buffers for batches of batch_size, creating them
+        the first time that size is seen.
+
+        By default each layer owns its buffers; ``empty(name, shape)`` can
+        hand out shared arrays instead, e.g. for activation checkpointing.
+        """
+        if batch_size == self.batch_size:
+            return
+        buffers = self._buffers.get(batch_size)
+        if buffers is None:
+            buffers = self._buffers[batch_size] = \
+                self._make_buffers(batch_size, empty or _owned)
+        for name, buffer in buffers.items():
+            setattr(self, name, buffer)
+        self.batch_size = batch_size
+
+    def release(self):
+        """Forget all buffers, so the next allocate makes new ones."""
+        self._buffers = {}
+        self.batch_size = None
+
+    def _make_buffers(self, batch_size, empty):
+        output_buffer = empty('output', (self.output_dim + 1, batch_size))
+        output_buffer[-1] = 1.0
+        delta_buffer = empty('delta', (self.input_dim + 1, batch_size))
+        return {
+            'output_buffer': output_buffer,
+            'output_data': output_buffer[:-1],
+            '_delta_buffer': delta_buffer,
+            'input_delta': delta_buffer[:-1],
+        }
+
+    def forward(self, input_buffer):
+        raise NotImplementedError
+
+    def backward(self, output_delta, input_buffer, need_input_delta=True):
+        raise NotImplementedError
+
+    def update_params(self, learning_rate):
+        for param, grad in zip(self.params, self.grads):
+            grad *= learning_rate
+            param -= grad
+
+    def describe(self):
+        return '|-- ' + self.__class__.__name__ + \
+            '\n  |-- dimensions: ({},{})'.format(
+                self.input_dim, self.output_dim)
+
+
+class ActivationLayer(Layer):
+    """Sigmoid activation."""
+    def __init__(self, input_dim):
+        super(ActivationLayer, self).__init__()
+        self.input_dim = input_dim
+        self.output_dim = input_dim
+
+    def forward(self, input_buffer):
+        sigmoid(input_buffer[:-1], out=self.output_data)
+        return self.output_buffer
+
+    def backward(self, output_delta, input_buffer, need_input_delta=True):
+        # s'(z) = s(z) (1 - s(z)), using the cached forward output.
+        delta = np.subtract(1.0, self.output_data, out=self.input_delta)
+        delta *= self.output_data
+        delta *= output_delta
+        return delta
+
+
+class DenseLayer(Layer):
+    """Affine layer ``W · y + b`` with normally distributed weights.
+
+    ``weight`` and ``bias`` are views into the ``[W | b]`` parameter
+    matrix, and ``delta_w`` and ``delta_b`` into its gradient.
+    """
+    def __init__(self, input_dim, output_dim, rng=None):
+        super(DenseLayer, self).__init__()
+        self.input_dim = input_dim
+        self.output_dim = output_dim
+        rng = rng or np.random.default_rng()
+        self.weight_bias = rng.standard_normal((output_dim, input_dim + 1))
+        self.weight = self.weight_bias[:, :-1]
+        self.bias = self.weight_bias[:, -1:]
+        self.delta_weight_bias = np.zeros_like(self.weight_bias)
+        self.delta_w = self.delta_weight_bias[:, :-1]
+        self.delta_b = self.delta_weight_bias[:, -1:]
+        self.params = [self.weight_bias]
+        self.grads = [self.delta_weight_bias]
+
+    def forward(self, input_buffer):
+        np.dot(self.weight_bias, input_buffer, out=self.output_data)
+        return self.output_buffer
+
+    def backward(self, output_delta, input_buffer, need_input_delta=True):
+        np.dot(output_delta, input_buffer.T, out=self.delta_weight_bias)
+        if not need_input_delta:
+            return None
+        np.dot(self.weight_bias.T, output_delta, out=self._delta_buffer)
+        return self.input_delta
+
+
+class DenseSigmoidLayer(Layer):
+    """A dense layer and the sigmoid after it, run as one step.
+
+    The backward pass goes straight from the output delta to the input
+    delta, ``(W^i)^T (Δ^{i+1} ⊙ s'(z^i))``, with s'(z) taken from the
+    cached output, so the pre-activation z never has to be kept. The
+    parameters are the dense layer's own arrays, so training the fused
+    layer trains the layer it was built from.
+
+    >>> rng = np.random.default_rng(0)
+    >>> dense, act = DenseLayer(3, 2, rng=rng), ActivationLayer(2)
+    >>> fused = DenseSigmoidLayer(dense)
+    >>> x = np.vstack([rng.standard_normal((3, 4)), np.ones((1, 4))])
+    >>> for layer in (dense, act, fused):
+    ...     layer.allocate(4)
+    >>> np.allclose(fused.forward(x), act.forward(dense.forward(x)))
+    True
+    """
+    def __init__(self, dense):
+        super(DenseSigmoidLayer, self).__init__()
+        self.dense = dense
+        self.input_dim = dense.input_dim
+        self.output_dim = dense.output_dim
+        self.params = dense.params
+        self.grads = dense.grads
+        self._delta_z = None
+
+    def _make_buffers(self, batch_size, empty):
+        buffers = super(DenseSigmoidLayer, self)._make_buffers(
+            batch_size, empty)
+        buffers['_delta_z'] = empty('delta_z', (self.output_dim, batch_size))
+        return buffers
+
+    def forward(self, input_buffer):
+        out = np.dot(self.dense.weight_bias, input_buffer,
+                     out=self.output_data)
+        sigmoid(out, out=out)
+        return self.output_buffer
+
+    def backward(self, output_delta, input_buffer, need_input_delta=True):
+        delta_z = np.subtract(1.0, self.output_data, out=self._delta_z)
+        delta_z *= self.output_data
+        delta_z *= output_delta
+        np.dot(delta_z, input_buffer.T, out=self.dense.delta_weight_bias)
+        if not need_input_delta:
+            return None
+        np.dot(self.dense.weight_bias.T, delta_z, out=self._delta_buffer)
+        return self.input_delta
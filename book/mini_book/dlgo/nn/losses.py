@@ -0,0 +1,35 @@
+import numpy as np
+
+
+class MSE():
+    """Mean squared error, summed over a mini-batch.
+
+    >>> loss = MSE()
+    >>> loss.loss_function(np.array([[1.0, 0.0]]), np.array([[0.0, 0.0]]))
+    0.5
+    """
+    def loss_function(self, predictions, labels):
+        diff = predictions - labels
+        return 0.5 * float(np.sum(diff * diff))
+
+    def loss_derivative(self, predictions, labels, out=None):
+        return np.subtract(predictions, labels, out=out)
+
+
+class CrossEntropy():
+    """Cross-entropy of predicted probabilities against target
+    distributions, summed over a mini-batch. Put it after a softmax, whose
+    backward pass turns this derivative into ``predictions - labels``.
+
+    >>> loss = CrossEntropy()
+    >>> round(loss.loss_function(np.array([[0.5], [0.5]]),
+    ...                          np.array([[1.0], [0.0]])), 4)
+    0.6931
+    """
+    def loss_function(self, predictions, labels):
+        return -float(np.sum(labels * np.log(np.maximum(predictions, 1e-300))))
+
+    def loss_derivative(self, predictions, labels, out=None):
+        out = np.maximum(predictions, 1e-300, out=out)
+        np.divide(labels, out, out=out)
+        return np.negative(out, out=out)
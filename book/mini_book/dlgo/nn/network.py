@@ -0,0 +1,226 @@
+"""The chapter 5 sequential network, trained on whole mini-batches.
+
+Before the first pass the network builds its execution plan from the
+added layers, replacing every dense layer that is directly followed by a
+sigmoid activation with a single DenseSigmoidLayer sharing its weights.
+Training reuses the per-batch-size buffers of every layer, the loss delta
+and the gathered mini-batch (kept with its row of ones for the bias), so a
+training step allocates no arrays.
+
+With ``checkpoint_every=k`` only every k-th layer (and the last) keeps its
+output between the forward and the backward pass. The layers in between
+write into a few buffers shared by all segments, and the backward pass
+recomputes each segment from the checkpoint before it just before
+propagating through it. Deltas are kept in two alternating buffers.
+Choosing k near the square root of the number of layers bounds activation
+memory by O(sqrt(L)) layers instead of O(L), for one extra forward pass.
+"""
+import numpy as np
+
+from dlgo.nn.layers import ActivationLayer, DenseLayer, DenseSigmoidLayer
+from dlgo.nn.losses import MSE
+
+
+class SequentialNetwork():
+    """
+    >>> rng = np.random.default_rng(1)
+    >>> net = SequentialNetwork()
+    >>> net.add(DenseLayer(2, 8, rng=rng))
+    >>> net.add(ActivationLayer(8))
+    >>> net.add(DenseLayer(8, 1, rng=rng))
+    >>> net.add(ActivationLayer(1))
+    >>> [type(step).__name__ for step in net.steps]
+    ['DenseSigmoidLayer', 'DenseSigmoidLayer']
+    >>> x = np.array([[0, 0, 1, 1], [0, 1, 0, 1]], dtype=float)
+    >>> y = np.array([[0, 1, 1, 0]], dtype=float)
+    >>> net.train(x, y, epochs=3000, mini_batch_size=4, learning_rate=3.0,
+    ...           rng=rng)
+    >>> np.round(net.single_forward(x)).astype(int)
+    array([[0, 1, 1, 0]])
+
+    Checkpointing trains the same weights with fewer activation buffers:
+
+    >>> def deep(**kwargs):
+    ...     rng = np.random.default_rng(2)
+    ...     net = SequentialNetwork(**kwargs)
+    ...     for _ in range(16):
+    ...         net.add(DenseLayer(8, 8, rng=rng))
+    ...         net.add(ActivationLayer(8))
+    ...     return net
+    >>> full, checkpointed = deep(), deep(checkpoint_every=4)
+    >>> x = rng.standard_normal((8, 32))
+    >>> for net in (full, checkpointed):
+    ...     net.train_batch(x, x, learning_rate=0.1)
+    >>> np.allclose(full.forward(x), checkpointed.forward(x))
+    True
+    >>> checkpointed.activation_nbytes(32) < full.activation_nbytes(32) / 2
+    True
+    """
+    def __init__(self, loss=None, fuse=True, checkpoint_every=None):
+        self.layers = []
+        self.loss = loss or MSE()
+        self.fuse = fuse
+        self.checkpoint_every = checkpoint_every
+        self._steps = None
+        self._allocators = None
+        self._segments = None
+        self._buffers = {}
+        self._shared = {}
+
+    def add(self, layer):
+        self.layers.append(layer)
+        if self._steps is not None:
+            for step in self._steps:
+                step.release()
+        self._steps = None
+        self._shared = {}
+
+    def describe(self):
+        return '\n'.join(layer.describe() for layer in self.steps)
+
+    @property
+    def steps(self):
+        """The layers as executed, with dense + sigmoid pairs fused."""
+        if self._steps is None:
+            steps = []
+            layers = self.layers
+            i = 0
+            while i < len(layers):
+                layer = layers[i]
+                following = layers[i + 1] if i + 1 < len(layers) else None
+                if self.fuse and isinstance(layer, DenseLayer) and \
+                        isinstance(following, ActivationLayer):
+                    steps.append(DenseSigmoidLayer(layer))
+                    i += 2
+                else:
+                    steps.append(layer)
+                    i += 1
+            self._steps = steps
+            self._plan_checkpoints()
+        return self._steps
+
+    def _plan_checkpoints(self):
+        num_steps = len(self._steps)
+        k = self.checkpoint_every
+        if not k:
+            self._allocators = [None] * num_steps
+            self._segments = [(0, num_steps)]
+            return
+        self._segments = [(start, min(start + k, num_steps))
+                          for start in range(0, num_steps, k)]
+        self._allocators = [
+            self._shared_allocator(i, i % k == k - 1 or i == num_steps - 1)
+            for i in range(num_steps)]
+
+    def _shared_allocator(self, i, is_checkpoint):
+        k = self.checkpoint_every
+
+        def empty(name, shape):
+            if name == 'output':
+                key = ('output', i) if is_checkpoint else \
+                    ('output', i % k, shape)
+            elif name == 'delta':
+                key = ('delta', i % 2, shape)
+            else:
+                key = (name, shape)
+            buffer = self._shared.get(key)
+            if buffer is None:
+                buffer = self._shared[key] = np.empty(shape)
+            return buffer
+        return empty
+
+    def activation_nbytes(self, batch_size):
+        """Bytes of batch-sized buffers the layers use for one batch."""
+        arrays = {}
+        for step, allocator in zip(self.steps, self._allocators):
+            step.allocate(batch_size, allocator)
+            for name in ('output_buffer', '_delta_buffer', '_delta_z'):
+                array = getattr(step, name, None)
+                if array is not None:
+                    arrays[id(array)] = array.nbytes
+        return sum(arrays.values())
+
+    def forward(self, input_data):
+        """Output of the last layer for a (dim, batch) input; it is a view
+        of a buffer that the next pass with the same batch size reuses."""
+        buffer = self._input_buffer(input_data.shape)
+        np.copyto(buffer[:-1], input_data)
+        return self._forward(buffer)
+
+    def _forward(self, buffer):
+        for step, allocator in zip(self.steps, self._allocators):
+            step.allocate(buffer.shape[1], allocator)
+            buffer = step.forward(buffer)
+        return buffer[:-1]
+
+    def single_forward(self, x):
+        return self.forward(x).copy()
+
+    def train_batch(self, x, y, learning_rate):
+        buffer = self._input_buffer(x.shape)
+        np.copyto(buffer[:-1], x)
+        self._train_batch(buffer, y, learning_rate)
+
+    def _train_batch(self, buffer, y, learning_rate):
+        steps = self.steps
+        batch_size = buffer.shape[1]
+        output = self._forward(buffer)
+        delta = self.loss.loss_derivative(
+            output, y, out=self._buffer('delta', output.shape))
+        last = len(self._segments) - 1
+        for j in range(last, -1, -1):
+            start, end = self._segments[j]
+            if j < last:
+                # Recompute the outputs this segment shares with others.
+                recomputed = steps[start - 1].output_buffer if start > 0 \
+                    else buffer
+                for i in range(start, end - 1):
+                    recomputed = steps[i].forward(recomputed)
+            for i in range(end - 1, start - 1, -1):
+                step_input = steps[i - 1].output_buffer if i > 0 else buffer
+                delta = steps[i].backward(delta, step_input,
+                                          need_input_delta=i > 0)
+        for step in steps:
+            step.update_params(learning_rate / batch_size)
+
+    def train(self, x, y, epochs, mini_batch_size, learning_rate,
+              test_data=None, rng=None):
+        """Mini-batch gradient descent over the columns of x and y."""
+        rng = rng or np.random.default_rng()
+        n = x.shape[1]
+        order = np.arange(n)
+        for epoch in range(epochs):
+            rng.shuffle(order)
+            for start in range(0, n, mini_batch_size):
+                batch = order[start:start + mini_batch_size]
+                size = len(batch)
+                x_batch = self._input_buffer((x.shape[0], size))
+                np.take(x, batch, axis=1, out=x_batch[:-1])
+                y_batch = np.take(y, batch, axis=1, out=self._buffer(
+                    'y', (y.shape[0], size)))
+                self._train_batch(x_batch, y_batch, learning_rate)
+            if test_data:
+                n_test = test_data[0].shape[1]
+                print('Epoch {0}: {1} / {2}'.format(
+                    epoch, self.evaluate(*test_data), n_test))
+
+    def evaluate(self, x, y):
+        """Number of columns whose largest output matches the label."""
+        predictions = self.forward(x)
+        return int(np.sum(np.argmax(predictions, axis=0) ==
+                          np.argmax(y, axis=0)))
+
+    def _input_buffer(self, shape):
+        key = ('x', shape)
+        buffer = self._buffers.get(key)
+        if buffer is None:
+            buffer = self._buffers[key] = np.empty((shape[0] + 1, shape[1]))
+            buffer[-1] = 1.0
+        return buffer
+
+    def _buffer(self, name, shape):
+        key = (name, shape)
+        buffer = self._buffers.get(key)
+        if buffer is None:
+            buffer = self._buffers[key] = np.empty(shape)
+        return buffer
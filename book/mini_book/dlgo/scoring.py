@@ -0,0 +1,137 @@
+"""Area and territory scores of goboard_fast boards.
+
+Every stone on the board is counted as alive. The empty points are split
+into regions with a union-find over the padded board indices (one array of
+parents, each point linked to its empty left and upper neighbors, with
+path halving), so one pass over the board finds the regions and a second
+records which colors border each of them. A region bordered by one color
+only is that color's territory; any other region is dame.
+
+Area scoring counts stones plus territory. Territory scoring counts
+territory plus the stones captured, which the board keeps count of.
+"""
+from array import array
+from collections import namedtuple
+
+from dlgo.gotypes import BLACK, EMPTY, WHITE, Player
+
+__all__ = [
+    'AREA',
+    'GameResult',
+    'TERRITORY',
+    'Territory',
+    'compute_game_result',
+    'evaluate_territory',
+]
+
+AREA = 'area'
+TERRITORY = 'territory'
+
+Territory = namedtuple(
+    'Territory',
+    'black_stones white_stones black_territory white_territory dame')
+
+
+class GameResult(namedtuple('GameResult', 'b w komi')):
+    """
+    >>> result = GameResult(40, 41, 7.5)
+    >>> result.winner, result.winning_margin, str(result)
+    (<Player.white: 2>, 8.5, 'W+8.5')
+    """
+    @property
+    def winner(self):
+        if self.b > self.w + self.komi:
+            return Player.black
+        return Player.white
+
+    @property
+    def winning_margin(self):
+        w = self.w + self.komi
+        return abs(self.b - w)
+
+    def __str__(self):
+        w = self.w + self.komi
+        if self.b > w:
+            return 'B+%.1f' % (self.b - w,)
+        return 'W+%.1f' % (w - self.b,)
+
+
+def _find(parent, idx):
+    while parent[idx] != idx:
+        parent[idx] = parent[parent[idx]]
+        idx = parent[idx]
+    return idx
+
+
+def evaluate_territory(board):
+    """Count the stones, territory and dame of a goboard_fast Board.
+
+    >>> from dlgo.goboard_fast import Board
+    >>> from dlgo.gotypes import Point
+    >>> board = Board(3, 3)
+    >>> for row in (1, 2, 3):
+    ...     board.place_stone(Player.black, Point(row, 2))
+    >>> board.place_stone(Player.white, Point(1, 3))
+    >>> evaluate_territory(board)
+    Territory(black_stones=3, white_stones=1, black_territory=3, \
+white_territory=0, dame=2)
+    """
+    geometry = board.geometry
+    colors = board.colors
+    width = geometry.width
+    parent = array('i', bytes(4 * geometry.size))
+    empties = []
+    black = white = 0
+    for idx in geometry.points:
+        color = colors[idx]
+        if color == BLACK:
+            black += 1
+        elif color == WHITE:
+            white += 1
+        else:
+            empties.append(idx)
+            parent[idx] = idx
+            for n in (idx - 1, idx - width):
+                if colors[n] == EMPTY:
+                    a = _find(parent, n)
+                    b = _find(parent, idx)
+                    if a < b:
+                        parent[b] = a
+                    elif b < a:
+                        parent[a] = b
+    # Bit 1 set if a region touches black and bit 2 if it touches white,
+    # which are the color values themselves.
+    borders = array('b', bytes(geometry.size))
+    sizes = array('i', bytes(4 * geometry.size))
+    neighbors = geometry.neighbors
+    for idx in empties:
+        root = _find(parent, idx)
+        sizes[root] += 1
+        for n in neighbors[idx]:
+            color = colors[n]
+            if color == BLACK or color == WHITE:
+                borders[root] |= color
+    owned = [0, 0, 0, 0]
+    for idx in empties:
+        if parent[idx] == idx:
+            owned[borders[idx]] += sizes[idx]
+    return Territory(black, white, owned[BLACK], owned[WHITE],
+                     owned[EMPTY] + owned[BLACK | WHITE])
+
+
+def compute_game_result(game_state, komi=7.5, rules=AREA):
+    """GameResult of the board of game_state under area or territory
+    scoring."""
+    board = game_state.board
+    territory = evaluate_territory(board)
+    if rules == AREA:
+        return GameResult(
+            territory.black_territory + territory.black_stones,
+            territory.white_territory + territory.white_stones,
+            komi)
+    if rules == TERRITORY:
+        return GameResult(
+            territory.black_territory + board.prisoners(Player.black),
+            territory.white_territory + board.prisoners(Player.white),
+            komi)
+    raise ValueError('unknown scoring rules {!r}'.format(rules))
@@ -0,0 +1,176 @@
+"""Self-play on every core, collecting games through shared memory.
+
+Each worker process runs its own BatchSelfPlay engine with an independent
+seed and writes finished games into its own ring of fixed-size slots in a
+single ``multiprocessing.shared_memory`` block. The driver drains the rings
+while the workers play, so game records never go through pickling; only a
+small per-worker summary comes back through the process pool.
+"""
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import cpu_count, shared_memory
+
+import numpy as np
+
+from dlgo.batch_selfplay import BatchSelfPlay, GameRecord
+from dlgo.gotypes import PLAYER_OF_COLOR
+
+__all__ = [
+    'SelfPlayFarm',
+    'WorkerStats',
+]
+
+# Per-worker counters: slots written, slots read.
+_WRITTEN, _READ = 0, 1
+# Per-slot metadata: number of moves, winner color, black and white score.
+_NUM_MOVES, _WINNER, _BLACK_SCORE, _WHITE_SCORE = 0, 1, 2, 3
+
+
+class WorkerStats(namedtuple('WorkerStats', 'worker games moves elapsed')):
+    @property
+    def games_per_second(self):
+        return self.games / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def moves_per_second(self):
+        return self.moves / self.elapsed if self.elapsed else 0.0
+
+
+class _Rings():
+    """NumPy views of the shared block: counters, per-slot metadata and
+    move lists for num_workers rings of capacity slots each."""
+    def __init__(self, buf, num_workers, capacity, max_moves):
+        shapes = [
+            ('counters', np.int64, (num_workers, 2)),
+            ('meta', np.float64, (num_workers, capacity, 4)),
+            ('moves', np.int16, (num_workers, capacity, max_moves)),
+        ]
+        offset = 0
+        for name, dtype, shape in shapes:
+            array = np.ndarray(shape, dtype=dtype, buffer=buf, offset=offset)
+            setattr(self, name, array)
+            offset += array.nbytes
+        self.capacity = capacity
+
+    @staticmethod
+    def nbytes(num_workers, capacity, max_moves):
+        return (num_workers * 2 * 8 +
+                num_workers * capacity * 4 * 8 +
+                num_workers * capacity * max_moves * 2)
+
+
+def _play(shm_name, worker, num_workers, capacity, num_games, seed,
+          engine_args):
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        engine = BatchSelfPlay(seed=seed, **engine_args)
+        rings = _Rings(shm.buf, num_workers, capacity, engine.max_moves)
+        counters = rings.counters[worker]
+        written = 0
+        while written < num_games:
+            for record in engine.step()[:num_games - written]:
+                while written - counters[_READ] >= capacity:
+                    time.sleep(0.0005)
+                slot = written % capacity
+                moves = record.moves
+                rings.moves[worker, slot, :len(moves)] = moves
+                rings.meta[worker, slot] = (
+                    len(moves), record.winner.value,
+                    record.black_score, record.white_score)
+                written += 1
+                counters[_WRITTEN] = written
+        stats = WorkerStats(
+            worker, engine.games_played, engine.moves_played, engine.elapsed)
+        del rings, counters
+        return stats
+    finally:
+        shm.close()
+
+
+class SelfPlayFarm():
+    """Play num_games self-play games spread over num_workers processes.
+
+    >>> farm = SelfPlayFarm(num_workers=2, board_size=5, batch_size=4, seed=3)
+    >>> records = farm.run(6)
+    >>> len(records), sorted(s.worker for s in farm.worker_stats)
+    (6, [0, 1])
+    """
+    def __init__(self, num_workers=None, board_size=9, batch_size=32,
+                 komi=7.5, max_moves=None, capacity=256, seed=None):
+        self.num_workers = num_workers or cpu_count()
+        self.capacity = capacity
+        self.engine_args = {
+            'batch_size': batch_size,
+            'board_size': board_size,
+            'komi': komi,
+            'max_moves': max_moves or 3 * board_size * board_size,
+        }
+        self.seeds = [
+            int(child.generate_state(1)[0])
+            for child in np.random.SeedSequence(seed).spawn(self.num_workers)]
+        self.worker_stats = []
+        self.elapsed = 0.0
+
+    @property
+    def games_per_second(self):
+        games = sum(stats.games for stats in self.worker_stats)
+        return games / self.elapsed if self.elapsed else 0.0
+
+    def run(self, num_games):
+        """Play num_games games and return their GameRecords, grouped by
+        worker in the order each worker finished them."""
+        start = time.perf_counter()
+        num_workers = self.num_workers
+        max_moves = self.engine_args['max_moves']
+        quotas = [num_games // num_workers +
+                  (1 if worker < num_games % num_workers else 0)
+                  for worker in range(num_workers)]
+        shm = shared_memory.SharedMemory(
+            create=True,
+            size=_Rings.nbytes(num_workers, self.capacity, max_moves))
+        try:
+            rings = _Rings(shm.buf, num_workers, self.capacity, max_moves)
+            rings.counters[...] = 0
+            records = [[] for _ in range(num_workers)]
+            with ProcessPoolExecutor(max_workers=num_workers) as pool:
+                futures = [
+                    pool.submit(_play, shm.name, worker, num_workers,
+                                self.capacity, quotas[worker],
+                                self.seeds[worker], self.engine_args)
+                    for worker in range(num_workers)]
+                while True:
+                    drained = self._drain(rings, records)
+                    if all(f.done() for f in futures) and not drained:
+                        break
+                    if not drained:
+                        time.sleep(0.001)
+                self.worker_stats = [f.result() for f in futures]
+            self._drain(rings, records)
+            del rings
+        finally:
+            shm.close()
+            shm.unlink()
+        self.elapsed = time.perf_counter() - start
+        return [record for worker in records for record in worker]
+
+    def _drain(self, rings, records):
+        drained = 0
+        board_size = self.engine_args['board_size']
+        for worker in range(self.num_workers):
+            counters = rings.counters[worker]
+            written = int(counters[_WRITTEN])
+            read = int(counters[_READ])
+            for seq in range(read, written):
+                slot = seq % self.capacity
+                meta = rings.meta[worker, slot]
+                num_moves = int(meta[_NUM_MOVES])
+                records[worker].append(GameRecord(
+                    board_size,
+                    rings.moves[worker, slot, :num_moves].copy(),
+                    PLAYER_OF_COLOR[int(meta[_WINNER])],
+                    int(meta[_BLACK_SCORE]),
+                    float(meta[_WHITE_SCORE])))
+            counters[_READ] = written
+            drained += written - read
+        return drained
@@ -0,0 +1,341 @@
+"""Streaming reader for SGF game records.
+
+``iter_games`` tokenizes SGF text read from a file object one chunk at a
+time and yields each game's main line as soon as its closing parenthesis
+has been read. Variations after the first child of a node are skipped and
+only the root properties and the moves are kept, so memory stays bounded
+by the longest single game rather than the size of the file or archive.
+``iter_positions`` replays the games on goboard_fast and yields
+``(game_state, move, result)`` before every move.
+
+SGF letters count rows from the top of the board; points are converted
+to dlgo rows, which count from the bottom as GTP does, so ``dd`` on a
+19x19 board is D16. Setup stones may be given as compressed rectangles
+(``AB[aa:cc]``). Off-board or occupied points in a record are reported
+through ``errors`` rather than placed.
+
+``open_records`` accepts plain, gzip or bz2 compressed SGF files and tar
+archives (compressed or not) of them, as the KGS and GoGoD collections are
+distributed; tar archives are read as a stream, member by member.
+"""
+import bz2
+import codecs
+import gzip
+import re
+import tarfile
+from collections import namedtuple
+
+from dlgo.goboard_fast import Board, GameState
+from dlgo.goboard_slow import Move
+from dlgo.gotypes import Player, Point
+
+__all__ = [
+    'Position',
+    'SgfGame',
+    'iter_games',
+    'initial_state',
+    'iter_positions',
+    'open_records',
+    'parse_point',
+    'parse_points',
+    'play_moves',
+    'setup_stones',
+    'setup_state',
+    'winner',
+]
+
+SgfGame = namedtuple('SgfGame', 'properties moves')
+SgfGame.__doc__ = """The main line of one game: the root node properties
+(name to list of values) and the moves as (Player, Point or None for a
+pass) pairs."""
+
+Position = namedtuple('Position', 'game_state move result')
+
+# A node holding nothing but a move, which is most nodes of a record and
+# is read as one token, then punctuation, a property name, a bracketed
+# value or a stray character, which is skipped. An unterminated value
+# doesn't match at all.
+_TOKEN = re.compile(
+    r'\s*(?:;\s*([BW])\s*\[([a-z]{0,2})\](?=\s*[;()])|([();])|'
+    r'([A-Za-z]+)|\[((?:[^\]\\]|\\.)*)\]|([^\[\s]))',
+    re.DOTALL)
+_POINT = re.compile(r'[a-z]{2}\Z')
+_SOFT_BREAK = re.compile(r'\\\r?\n')
+_ESCAPE = re.compile(r'\\(.)', re.DOTALL)
+_CHUNK_SIZE = 1 << 16
+
+
+def _tokens(stream):
+    """Yield ('(' | ')' | ';', None), ('ident', name), ('value', text)
+    and ('move', (color, coordinates)) tokens, reading the stream chunk by
+    chunk."""
+    chunk_size = _CHUNK_SIZE
+    buf = ''
+    pos = 0
+    eof = False
+    while True:
+        match = _TOKEN.match(buf, pos)
+        if match is None or (match.end() == len(buf) and not eof):
+            # The token may continue in the next chunk.
+            if eof:
+                if buf[pos:].strip():
+                    raise ValueError('malformed SGF near {!r}'.format(
+                        buf[pos:pos + 20]))
+                return
+            chunk = stream.read(chunk_size)
+            eof = not chunk
+            buf = buf[pos:] + chunk
+            pos = 0
+            continue
+        pos = match.end()
+        color, where, punctuation, ident, value, stray = match.groups()
+        if color:
+            yield 'move', (color, where)
+        elif punctuation:
+            yield punctuation, None
+        elif ident:
+            yield 'ident', ident
+        elif stray is None:
+            if '\\' in value:
+                value = _ESCAPE.sub(r'\1', _SOFT_BREAK.sub('', value))
+            yield 'value', value
+
+
+def iter_games(stream):
+    """Yield the SgfGame of every game tree in an SGF text stream.
+
+    >>> import io
+    >>> sgf = '(;SZ[9]RE[W+3.5](;B[ee];W[]) (;B[aa]))(;SZ[5];B[cc])'
+    >>> [game.moves for game in iter_games(io.StringIO(sgf))]
+    ... # doctest: +NORMALIZE_WHITESPACE
+    [[(<Player.black: 1>, Point(row=5, col=5)), (<Player.white: 2>, None)],
+     [(<Player.black: 1>, Point(row=3, col=3))]]
+    """
+    depth = 0
+    skip_below = None
+    properties = moves = node = name = None
+    size = 19
+    for kind, text in _tokens(stream):
+        if kind == '(':
+            depth += 1
+            if depth == 1:
+                properties, moves, node, size = {}, [], None, 19
+                skip_below = None
+        elif kind == ')':
+            depth -= 1
+            if depth < 0:
+                raise ValueError('unbalanced ) in SGF')
+            if depth == 0:
+                _finish_node(node, properties, moves, size)
+                yield SgfGame(properties, moves)
+                node = None
+            elif skip_below is None:
+                # The main line ended with its first variation; skip the
+                # remaining siblings up to the parent's closing paren.
+                _finish_node(node, properties, moves, size)
+                node = None
+                skip_below = depth
+            elif depth < skip_below:
+                skip_below = depth
+        elif skip_below is not None or depth == 0:
+            continue
+        elif kind == 'move':
+            size = _finish_node(node, properties, moves, size)
+            node = None
+            player = Player.black if text[0] == 'B' else Player.white
+            moves.append((player, parse_point(text[1], size)))
+        elif kind == ';':
+            size = _finish_node(node, properties, moves, size)
+            node = {} if not moves and not properties else []
+        elif kind == 'ident':
+            name = text.upper()
+        elif node is not None and name is not None:
+            if isinstance(node, dict):
+                node.setdefault(name, []).append(text)
+            elif name in ('B', 'W'):
+                node.append((name, text))
+    if depth:
+        raise ValueError('unterminated SGF game tree')
+
+
+def _finish_node(node, properties, moves, size):
+    """Record a finished node and return the board size in force."""
+    if isinstance(node, dict):
+        properties.update(node)
+        if 'SZ' in node:
+            size = int(node['SZ'][0].split(':')[0])
+    elif node:
+        for color, value in node:
+            player = Player.black if color == 'B' else Player.white
+            moves.append((player, parse_point(value, size)))
+    return size
+
+
+def parse_point(value, size):
+    """Point for an SGF coordinate pair, None for a pass ('' or 'tt').
+
+    Points off a size x size board are returned for the caller to reject;
+    a value that isn't two lowercase letters raises ValueError.
+
+    >>> parse_point('dd', 19), parse_point('ai', 9)
+    (Point(row=16, col=4), Point(row=1, col=1))
+    """
+    value = value.strip()
+    if not value or (value == 'tt' and size <= 19):
+        return None
+    if not _POINT.match(value):
+        raise ValueError('malformed SGF point {!r}'.format(value))
+    col = ord(value[0]) - ord('a') + 1
+    row = size - (ord(value[1]) - ord('a'))
+    return Point(row=row, col=col)
+
+
+def parse_points(value, size):
+    """Points of an SGF point list value: a single point or a compressed
+    rectangle given by two opposite corners.
+
+    >>> len(parse_points('aa:cc', 19)), parse_points('', 19)
+    (9, [])
+    """
+    if ':' not in value:
+        point = parse_point(value, size)
+        return [] if point is None else [point]
+    first, last = (parse_point(corner, size)
+                   for corner in value.split(':', 1))
+    if first is None or last is None:
+        raise ValueError('malformed SGF point list {!r}'.format(value))
+    return [Point(row=row, col=col)
+            for row in range(min(first.row, last.row),
+                             max(first.row, last.row) + 1)
+            for col in range(min(first.col, last.col),
+                             max(first.col, last.col) + 1)]
+
+
+def winner(result):
+    """Player named by an SGF RE value, None for draws and unknowns.
+
+    >>> winner('B+R'), winner('0'), winner('?')
+    (<Player.black: 1>, None, None)
+    """
+    if result[:2].upper() == 'B+':
+        return Player.black
+    if result[:2].upper() == 'W+':
+        return Player.white
+    return None
+
+
+def board_size(properties):
+    return int(properties.get('SZ', ['19'])[0].split(':')[0])
+
+
+def setup_stones(properties, size):
+    """(Player, Point) for every AB and AW stone of the root properties."""
+    return [(player, point)
+            for key, player in (('AB', Player.black), ('AW', Player.white))
+            for value in properties.get(key, ())
+            for point in parse_points(value, size)]
+
+
+def setup_state(size, setup, next_player, errors=None):
+    """GameState of a size x size board holding the setup stones.
+
+    Stones off the board or on an occupied point are left out and, if
+    errors is a list, appended to it.
+    """
+    board = Board(size, size)
+    for player, point in setup:
+        if not board.is_on_grid(point) or board.get(point) is not None:
+            if errors is not None:
+                errors.append((player, point))
+            continue
+        board.place_stone(player, point)
+    return GameState(board, next_player, None, None)
+
+
+def initial_state(properties, errors=None):
+    """GameState with the setup stones of a game's root properties; see
+    setup_state for errors."""
+    size = board_size(properties)
+    first = properties.get('PL', [None])[0]
+    if first is not None:
+        next_player = Player.white if first.upper() == 'W' else Player.black
+    elif 'AB' in properties and int(properties.get('HA', ['0'])[0]) > 1:
+        next_player = Player.white
+    else:
+        next_player = Player.black
+    return setup_state(size, setup_stones(properties, size), next_player,
+                       errors)
+
+
+def play_moves(game_state, moves, errors=None):
+    """Yield (game_state, move) before each (Player, Point or None) move,
+    starting from game_state.
+
+    Records may let one side move twice, e.g. after handicap stones placed
+    as moves, so the player of each move is taken from the record. Stops
+    before the first move that can't be played on the board (an occupied
+    or off-board point) and appends its (Player, Point) to errors if
+    given.
+    """
+    for player, point in moves:
+        board = game_state.board
+        if point is not None and (not board.is_on_grid(point) or
+                                  board.get(point) is not None):
+            if errors is not None:
+                errors.append((player, point))
+            return
+        move = Move.pass_turn() if point is None else Move.play(point)
+        if game_state.next_player != player:
+            game_state = GameState(game_state.board, player,
+                                   game_state.previous_state,
+                                   game_state.last_move)
+        yield game_state, move
+        game_state = game_state.apply_move(move)
+
+
+def iter_positions(stream, errors=None):
+    """Yield a Position before every move of every game in stream.
+
+    A game is skipped if a setup stone can't be placed and stops before
+    its first move that can't be played on its board; if errors is a
+    list, those games' root properties are appended to it.
+
+    >>> import io
+    >>> sgf = '(;SZ[5]RE[B+R];B[cc];W[cd];B[])'
+    >>> for state, move, result in iter_positions(io.StringIO(sgf)):
+    ...     print(state.next_player.name, move, result)
+    black Move.play(Point(row=3, col=3)) B+R
+    white Move.play(Point(row=2, col=3)) B+R
+    black Move.pass_turn() B+R
+    """
+    for properties, moves in iter_games(stream):
+        result = properties.get('RE', [''])[0]
+        unplayable = []
+        try:
+            state = initial_state(properties, unplayable)
+        except ValueError:
+            unplayable.append(properties)
+        if unplayable:
+            if errors is not None:
+                errors.append(properties)
+            continue
+        for game_state, move in play_moves(state, moves, unplayable):
+            yield Position(game_state, move, result)
+        if unplayable and errors is not None:
+            errors.append(properties)
+
+
+def open_records(path, encoding='latin-1'):
+    """Yield a text stream for every SGF file in path, which may be a
+    plain, .gz or .bz2 SGF file or a (compressed) tar archive of them."""
+    if tarfile.is_tarfile(path):
+        with tarfile.open(path, mode='r|*') as archive:
+            for member in archive:
+                if member.isfile() and member.name.lower().endswith('.sgf'):
+                    raw = archive.extractfile(member)
+                    yield codecs.getreader(encoding)(raw)
+        return
+    opener = {'.gz': gzip.open, '.bz2': bz2.open}.get(
+        path[path.rfind('.'):].lower(), open)
+    with opener(path, 'rt', encoding=encoding) as stream:
+        yield stream
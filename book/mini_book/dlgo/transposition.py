@@ -0,0 +1,117 @@
+"""A bounded table of evaluated positions shared by tree searches.
+
+Entries are keyed by the Zobrist hash of the board together with the
+player to move and whether the game is over (two passes end the game on
+the board of a position still in play), and hold the evaluator's priors,
+the running mean of the values seen for the position, and the moves that
+are legal in it by position alone (with the hash each move leads to, so
+the history-dependent superko check stays a dict lookup). When the table
+is full a clock hand sweeps the slots and evicts the first entry not used
+since its last pass.
+
+Searches running at the same time, on their own threads, can share one
+table: lookups, stores and value updates take the table's lock.
+"""
+import threading
+
+__all__ = [
+    'TranspositionTable',
+    'position_key',
+]
+
+
+def position_key(game_state):
+    return (game_state.board.zobrist_hash(), game_state.next_player,
+            game_state.is_over())
+
+
+class Entry():
+    __slots__ = ('key', 'priors', 'visits', 'value_sum', 'moves',
+                 'next_hashes', 'referenced', '_lock')
+
+    def __init__(self, key, priors, moves, next_hashes, lock):
+        self.key = key
+        self.priors = priors
+        self.visits = 0
+        self.value_sum = 0.0
+        self.moves = moves
+        self.next_hashes = next_hashes
+        self.referenced = True
+        # The table's lock.
+        self._lock = lock
+
+    @property
+    def value(self):
+        return self.value_sum / self.visits if self.visits else 0.0
+
+    def add_value(self, value):
+        with self._lock:
+            self.visits += 1
+            self.value_sum += value
+
+
+class TranspositionTable():
+    """
+    >>> table = TranspositionTable(capacity=2)
+    >>> for key in 'abc':
+    ...     table.store(key, None, [], []).add_value(1.0)
+    >>> table.lookup('a') is None, table.lookup('c').value
+    (True, 1.0)
+    >>> table.hit_rate
+    0.5
+    """
+    def __init__(self, capacity=1 << 16):
+        self.capacity = capacity
+        self._index = {}
+        self._slots = []
+        self._hand = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._index)
+
+    @property
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def lookup(self, key):
+        with self._lock:
+            entry = self._index.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            entry.referenced = True
+            return entry
+
+    def store(self, key, priors, moves, next_hashes):
+        with self._lock:
+            entry = self._index.get(key)
+            if entry is not None:
+                return entry
+            entry = Entry(key, priors, moves, next_hashes, self._lock)
+            if len(self._slots) < self.capacity:
+                self._slots.append(entry)
+            else:
+                self._slots[self._evict()] = entry
+            self._index[key] = entry
+            return entry
+
+    def clear(self):
+        with self._lock:
+            self._index.clear()
+            self._slots = []
+            self._hand = 0
+
+    def _evict(self):
+        slots = self._slots
+        while slots[self._hand].referenced:
+            slots[self._hand].referenced = False
+            self._hand = (self._hand + 1) % self.capacity
+        slot = self._hand
+        del self._index[slots[slot].key]
+        self._hand = (self._hand + 1) % self.capacity
+        return slot
@@ -0,0 +1,53 @@
+"""Zobrist hash codes for every (point, player) pair.
+
+A board hash is the XOR of the codes of all stones on it, so placing or
+capturing a stone updates the hash with a single XOR. The codes are drawn
+from a fixed seed so hashes are reproducible across runs and processes.
+"""
+import random
+from functools import lru_cache
+
+from dlgo.gotypes import BLACK, WHITE, Player, Point
+
+__all__ = ['HASH_CODE', 'EMPTY_BOARD', 'MAX_BOARD_SIZE', 'index_table']
+
+MAX63 = 0x7fffffffffffffff
+MAX_BOARD_SIZE = 25
+EMPTY_BOARD = 0
+
+
+def _generate(seed=20161119):
+    rng = random.Random(seed)
+    codes = {}
+    for row in range(1, MAX_BOARD_SIZE + 1):
+        for col in range(1, MAX_BOARD_SIZE + 1):
+            for player in (Player.black, Player.white):
+                codes[Point(row, col), player] = rng.randint(1, MAX63)
+    return codes
+
+
+HASH_CODE = _generate()
+
+
+@lru_cache(maxsize=None)
+def index_table(num_rows, num_cols):
+    """Codes laid out for a padded board of the given size, indexed as
+    ``table[color][row * (num_cols + 2) + col]`` with color BLACK or WHITE.
+
+    >>> table = index_table(9, 9)
+    >>> table[BLACK][12] == HASH_CODE[Point(1, 1), Player.black]
+    True
+    """
+    if num_rows > MAX_BOARD_SIZE or num_cols > MAX_BOARD_SIZE:
+        raise ValueError('Board size %dx%d exceeds the %dx%d hash table' % (
+            num_rows, num_cols, MAX_BOARD_SIZE, MAX_BOARD_SIZE))
+    width = num_cols + 2
+    size = (num_rows + 2) * width
+    table = [None] * (max(BLACK, WHITE) + 1)
+    for player in (Player.black, Player.white):
+        codes = [0] * size
+        for row in range(1, num_rows + 1):
+            for col in range(1, num_cols + 1):
+                codes[row * width + col] = HASH_CODE[Point(row, col), player]
+        table[player.value] = tuple(codes)
+    return tuple(table)
@@ -0,0 +1,18 @@
+from dlgo import goboard_fast
+from dlgo.gotypes import Point
+
+
+def replay_record(record):
+    """Replay a GameRecord on goboard_fast, checking that every move is
+    legal, and return the final game state."""
+    size = record.board_size
+    game = goboard_fast.GameState.new_game(size)
+    for index in record.moves.tolist():
+        if index < 0:
+            move = goboard_fast.Move.pass_turn()
+        else:
+            point = Point(index // size + 1, index % size + 1)
+            move = goboard_fast.Move.play(point)
+        assert game.is_valid_move(move)
+        game = game.apply_move(move)
+    return game
@@ -0,0 +1,83 @@
+import random
+
+from dlgo.agent.helpers import is_point_an_eye
+from dlgo.agent.naive_fast import FastRandomBot
+from dlgo.goboard_fast import GameState, Move
+from dlgo.gotypes import Player, Point
+
+
+def _empty_points(board):
+    return sorted(board.index(Point(row, col))
+                  for row in range(1, board.num_rows + 1)
+                  for col in range(1, board.num_cols + 1)
+                  if board.get(Point(row, col)) is None)
+
+
+def test_fast_random_bot_plays_legal_moves_and_keeps_eyes():
+    rng = random.Random(5)
+    bot = FastRandomBot(rng)
+    for size in (5, 9):
+        for _ in range(3):
+            game = GameState.new_game(size)
+            while not game.is_over():
+                move = bot.select_move(game)
+                assert sorted(bot._empties) == _empty_points(game.board)
+                for idx in bot._empties:
+                    point = game.board.point(idx)
+                    owner = [player.value for player in Player
+                             if is_point_an_eye(game.board, point, player)]
+                    assert bot._eye[idx] == (owner[0] if owner else 0)
+                if move.is_play:
+                    assert game.is_valid_move(move)
+                    assert not is_point_an_eye(
+                        game.board, move.point, game.next_player)
+                else:
+                    # Passes only when every empty point is ruled out.
+                    board = game.board
+                    for row in range(1, size + 1):
+                        for col in range(1, size + 1):
+                            point = Point(row, col)
+                            assert not game.is_valid_move(
+                                Move.play(point)) or is_point_an_eye(
+                                    board, point, game.next_player)
+                game = game.apply_move(move)
+    # One rebuild per new game, none for continuations.
+    assert bot.num_rebuilds == 6
+
+
+def test_fast_random_bot_follows_branches_and_passes():
+    rng = random.Random(9)
+    bot = FastRandomBot(rng)
+    game = GameState.new_game(7)
+    for _ in range(12):
+        game = game.apply_move(bot.select_move(game))
+    branch = game
+    # Skip ahead several moves, with passes, without asking the bot.
+    for _ in range(3):
+        game = game.apply_move(Move.play(rng.choice(
+            [m.point for m in game.legal_moves() if m.is_play])))
+        game = game.apply_move(Move.pass_turn())
+    bot.select_move(game)
+    assert sorted(bot._empties) == _empty_points(game.board)
+    rebuilds = bot.num_rebuilds
+    bot.select_move(branch)
+    assert bot.num_rebuilds == rebuilds + 1
+    assert sorted(bot._empties) == _empty_points(branch.board)
+
+
+def test_play_out_stops_when_no_player_can_move():
+    bot = FastRandomBot(random.Random(2))
+    for _ in range(5):
+        game = bot.play_out(GameState.new_game(9))
+        if game.is_over():
+            continue
+        board = game.board
+        for player in Player:
+            for row in range(1, 10):
+                for col in range(1, 10):
+                    point = Point(row, col)
+                    assert board.get(point) is not None or \
+                        is_point_an_eye(board, point, player) or \
+                        board.is_self_capture(player, point)
+    capped = bot.play_out(GameState.new_game(9), max_moves=10)
+    assert capped._depth == 10
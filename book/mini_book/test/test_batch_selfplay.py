@@ -0,0 +1,10 @@
+from dlgo.batch_selfplay import BatchSelfPlay
+
+from helpers import replay_record
+
+
+def test_batch_games_replay_legally_on_fast_board():
+    engine = BatchSelfPlay(8, board_size=7, seed=5)
+    for record in engine.play(16):
+        replay_record(record)
+        assert record.black_score + record.white_score - engine.komi <= 49
@@ -0,0 +1,142 @@
+import io
+import tarfile
+from collections import Counter
+
+import numpy as np
+import pytest
+
+from dlgo.batch_selfplay import BatchSelfPlay
+from dlgo.data.gamedb import GameDatabase, ingest
+from dlgo.data.symmetry import (augment_all, random_symmetry,
+                                 transform_planes)
+from dlgo.data.shards import DataLoader, ShardedDataset, write_shards
+from dlgo.encoders.oneplane import OnePlaneEncoder
+from dlgo.gotypes import Player
+from dlgo.sgf import iter_games, setup_stones
+
+
+def _pairs(features, labels):
+    return Counter((x.tobytes(), int(y)) for x, y in zip(features, labels))
+
+
+def test_loader_yields_every_position_once_per_epoch(tmp_path):
+    records = BatchSelfPlay(4, board_size=5, seed=2).play(6)
+    total = write_shards(records, str(tmp_path), OnePlaneEncoder((5, 5)),
+                         shard_size=50)
+    dataset = ShardedDataset(str(tmp_path))
+    assert len(dataset) == total and len(dataset.shard_sizes) > 2
+    expected = Counter()
+    for features, labels in zip(dataset.features, dataset.labels):
+        expected += _pairs(features, labels)
+    loader = DataLoader(dataset, batch_size=16, shuffle_window=40,
+                        prefetch=1, seed=0)
+    for _ in range(2):
+        seen = Counter()
+        for features, labels in loader:
+            seen += _pairs(features, labels)
+        assert seen == expected
+    first = [labels.copy() for _, labels in loader]
+    second = [labels.copy() for _, labels in loader]
+    assert not all(np.array_equal(a, b) for a, b in zip(first, second))
+
+
+def test_dataset_finds_shards_by_number(tmp_path):
+    records = BatchSelfPlay(4, board_size=5, seed=2).play(2)
+    directory = tmp_path / 'run_00000'
+    encoder = OnePlaneEncoder((5, 5))
+    write_shards(records, str(directory), encoder, shard_size=20)
+    write_shards(records, str(directory), encoder, shard_size=20,
+                 prefix='train_more')
+    shards = len(ShardedDataset(str(directory)).shard_sizes)
+    assert shards > 1
+    # Shard numbers past five digits come after the padded ones.
+    for kind in ('features', 'labels'):
+        first = np.load(str(directory / 'train_00000_{}.npy'.format(kind)))
+        np.save(str(directory / 'train_100000_{}.npy'.format(kind)),
+                first[:3])
+    dataset = ShardedDataset(str(directory))
+    assert len(dataset.shard_sizes) == shards + 1
+    assert dataset.shard_sizes[-1] == 3
+    assert np.array_equal(dataset.features[-1], dataset.features[0][:3])
+    assert len(ShardedDataset(str(directory), 'train_more').shard_sizes) == \
+        shards
+
+
+def test_game_database_round_trip(tmp_path):
+    games = [
+        '(;SZ[9]KM[5.5]BR[1k]WR[2d]RE[B+3.5];B[ee];W[ec];B[];W[cc])',
+        '(;SZ[19]HA[3]AB[dd][pp][dp]RE[W+R];W[qd](;B[qq])(;B[aa]))',
+        '(;SZ[9];B[zz])',
+    ]
+    archive = tmp_path / 'games.tar.gz'
+    with tarfile.open(str(archive), 'w:gz') as tar:
+        for i, text in enumerate(games):
+            data = text.encode()
+            info = tarfile.TarInfo('{}.sgf'.format(i))
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+    plain = tmp_path / 'more' / 'extra.sgf'
+    plain.parent.mkdir()
+    plain.write_text(games[0])
+    path = str(tmp_path / 'games.db')
+    assert ingest(path, [str(tmp_path)], num_workers=2) == (3, 1)
+    db = GameDatabase(path)
+    expected = [game for text in games[:2] + games[:1]
+                for game in iter_games(io.StringIO(text))]
+    for i in reversed(range(len(db))):
+        assert db[i].moves == expected[i].moves
+    assert db[1].setup == setup_stones(expected[1].properties, 19)
+    assert db[1].winner == Player.white and db[0].komi == 5.5
+    assert (db[0].black_rank, db[0].white_rank) == (-1, 2)
+    assert len(list(db.positions(0))) == 4
+    assert sorted(db.sample(2, min_rank=-1)) == [0, 2]
+
+
+def test_damaged_archives_are_skipped(tmp_path):
+    import gzip
+
+    game = '(;SZ[9]HA[300]AB[cc][gg];W[ee];B[dd])'
+    (tmp_path / 'good.sgf').write_text(game)
+    data = gzip.compress((game * 50).encode())
+    (tmp_path / 'truncated.sgf.gz').write_bytes(data[:len(data) // 2])
+    (tmp_path / 'garbage.tar.gz').write_bytes(b'\x1f\x8b' + bytes(100))
+    (tmp_path / 'garbage.sgf.bz2').write_bytes(b'BZh9 not bzip2 data')
+    path = str(tmp_path / 'games.db')
+    games, errors = ingest(path, [str(tmp_path)], num_workers=2)
+    assert games >= 1 and errors == 3
+    assert not (tmp_path / 'games.db.part').exists()
+    db = GameDatabase(path)
+    assert len(db) == games
+    assert all(db[i].handicap == 255 and len(db[i].moves) == 2
+               for i in range(len(db)))
+
+
+def test_ingest_raises_its_own_error(tmp_path):
+    (tmp_path / 'not_a_directory').write_text('')
+    output = str(tmp_path / 'not_a_directory' / 'games.db')
+    with pytest.raises(NotADirectoryError) as failure:
+        ingest(output, [str(tmp_path)], num_workers=1)
+    # Not a second error from cleaning up a file that was never created.
+    assert failure.value.__context__ is None
+
+
+def test_symmetries_move_planes_and_labels_together():
+    rng = np.random.default_rng(4)
+    labels = rng.integers(0, 26, 40)
+    planes = np.zeros((40, 2, 5, 5), dtype=np.int8)
+    on_board = labels < 25
+    planes.reshape(40, 2, 25)[on_board, 0, labels[on_board]] = 1
+    planes[:, 1] = rng.integers(0, 2, (40, 5, 5))
+    expected = [np.rot90(planes, k % 4, axes=(2, 3)) for k in range(8)]
+    expected[4:] = [e.transpose(0, 1, 3, 2) for e in expected[4:]]
+    x, y = augment_all(planes, labels)
+    for k in range(8):
+        block = slice(40 * k, 40 * (k + 1))
+        assert np.array_equal(x[block], expected[k])
+        assert np.array_equal(transform_planes(planes, k), expected[k])
+        hot = x[block, 0].reshape(40, 25).argmax(axis=1)
+        assert np.array_equal(np.where(on_board, hot, 25), y[block])
+    moved, moved_labels, symmetries = random_symmetry(planes, labels, rng)
+    for i, k in enumerate(symmetries):
+        assert np.array_equal(moved[i], expected[k][i])
+        assert moved_labels[i] == y[40 * k + i]
@@ -0,0 +1,65 @@
+import random
+
+import numpy as np
+
+from dlgo.agent.naive_fast import FastRandomBot
+from dlgo.encoders.base import get_encoder_by_name
+from dlgo.encoders.multiplane import MultiPlaneEncoder
+from dlgo.goboard_fast import GameState, Move
+from dlgo.gotypes import Point
+
+
+def _reference(game_state):
+    """Planes 0-7 from the board's own string queries."""
+    board = game_state.board
+    size = board.num_rows
+    planes = np.zeros((8, size, size), dtype=np.float32)
+    for row in range(1, size + 1):
+        for col in range(1, size + 1):
+            color = board.get(Point(row, col))
+            if color is None:
+                continue
+            offset = 0 if color == game_state.next_player else 4
+            liberties = board.num_liberties(Point(row, col))
+            planes[offset, row - 1, col - 1] = 1
+            planes[offset + min(liberties, 3), row - 1, col - 1] = 1
+    return planes
+
+
+def test_incremental_planes_match_rebuilt_planes():
+    rng = random.Random(3)
+    bot = FastRandomBot(rng)
+    encoder = MultiPlaneEncoder((7, 7))
+    states = []
+    for _ in range(3):
+        game = GameState.new_game(7)
+        while not game.is_over():
+            planes = encoder.encode(game)
+            assert np.array_equal(planes[:8], _reference(game))
+            fresh = MultiPlaneEncoder((7, 7)).encode(game)
+            assert np.array_equal(planes, fresh)
+            states.append(game)
+            game = game.apply_move(bot.select_move(game))
+    # Catching up over several moves and jumping back both work.
+    rebuilds = encoder.num_rebuilds
+    for game in rng.sample(states, 20):
+        assert np.array_equal(encoder.encode(game),
+                              MultiPlaneEncoder((7, 7)).encode(game))
+    assert encoder.num_rebuilds > rebuilds
+
+
+def test_move_history_and_ko_planes():
+    encoder = get_encoder_by_name('multiplane', 5)
+    game = GameState.new_game(5)
+    # Black captures at (2, 3), leaving white unable to retake at (2, 2).
+    for row, col in ((2, 1), (2, 2), (1, 2), (1, 3), (3, 2), (3, 3),
+                     (5, 5), (2, 4), (2, 3)):
+        game = game.apply_move(Move.play(Point(row, col)))
+    planes = encoder.encode(game)
+    assert planes[8, 1, 2] == 1 and planes[9, 1, 3] == 1
+    assert planes[12].sum() == 1 and planes[12, 1, 1] == 1
+    assert not game.is_valid_move(Move.play(Point(2, 2)))
+    game = game.apply_move(Move.pass_turn())
+    planes = encoder.encode(game)
+    assert planes[8].sum() == 0 and planes[9, 1, 2] == 1
+    assert planes[12].sum() == 0
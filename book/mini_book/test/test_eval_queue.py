@@ -0,0 +1,94 @@
+import threading
+import time
+
+import numpy as np
+
+from dlgo.eval_queue import EvaluationQueue
+
+
+def _model(batches):
+    def model(inputs):
+        batches.append(len(inputs))
+        return inputs * 2, inputs.sum(axis=1)
+    return model
+
+
+def _call_concurrently(queue, states):
+    results = [None] * len(states)
+
+    def call(i):
+        try:
+            results[i] = queue(states[i])
+        except Exception as error:
+            results[i] = error
+    threads = [threading.Thread(target=call, args=(i,))
+               for i in range(len(states))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+    assert not any(thread.is_alive() for thread in threads)
+    return results
+
+
+def test_concurrent_callers_share_batches():
+    batches = []
+    states = [np.full(3, float(i)) for i in range(8)]
+    with EvaluationQueue(_model(batches), lambda state: state,
+                         batch_size=4, max_wait=5.0) as queue:
+        results = _call_concurrently(queue, states)
+    assert batches == [4, 4]
+    assert queue.num_batches == 2 and queue.num_evaluations == 8
+    assert queue.batch_fill == 1.0 and queue.max_queue_depth >= 4
+    for state, (priors, value) in zip(states, results):
+        assert np.array_equal(priors, state * 2) and value == state.sum()
+
+
+def test_partial_batch_is_flushed_after_max_wait():
+    batches = []
+    with EvaluationQueue(_model(batches), lambda state: state,
+                         batch_size=16, max_wait=0.05) as queue:
+        start = time.perf_counter()
+        priors, value = queue(np.ones(2))
+        elapsed = time.perf_counter() - start
+    assert batches == [1] and value == 2.0
+    assert 0.04 <= elapsed < 2.0
+
+
+def test_model_errors_reach_every_caller():
+    calls = []
+
+    def model(inputs):
+        calls.append(len(inputs))
+        if len(calls) == 1:
+            raise ValueError('model failed')
+        return inputs, inputs.sum(axis=1)
+
+    states = [np.ones(2)] * 4
+    with EvaluationQueue(model, lambda state: state, batch_size=4,
+                         max_wait=0.5) as queue:
+        results = _call_concurrently(queue, states)
+        assert [str(result) for result in results] == ['model failed'] * 4
+        assert all(isinstance(result, ValueError) for result in results)
+        # The queue keeps serving after a failed batch.
+        assert queue(np.ones(2))[1] == 2.0
+    assert queue.num_evaluations == 1
+    try:
+        queue(np.ones(2))
+    except RuntimeError:
+        pass
+    else:
+        raise AssertionError('a closed queue must refuse requests')
+
+
+def test_results_outlive_a_reused_model_buffer():
+    out = np.zeros((1, 3))
+
+    def model(inputs):
+        out[...] = inputs
+        return out, out[:, 0]
+
+    with EvaluationQueue(model, lambda state: state, batch_size=1) as queue:
+        priors, value = queue(np.ones(3))
+        queue(np.full(3, 2.0))
+    assert priors.tolist() == [1.0, 1.0, 1.0] and value == 1.0
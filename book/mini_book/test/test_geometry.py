@@ -0,0 +1,25 @@
+from dlgo.geometry import geometry
+from dlgo.gotypes import Move, Point
+
+
+def test_tables_match_the_point_api():
+    for size in (9, 13, 19):
+        g = geometry(size)
+        on_board = set()
+        for row in range(1, size + 1):
+            for col in range(1, size + 1):
+                point = Point(row, col)
+                idx = g.index(point)
+                on_board.add(idx)
+                assert g.point_at[idx] is point
+                assert g.point(idx) is point
+                assert g.moves[idx] == Move.play(point)
+                assert [g.point_at[n] for n in g.neighbors[idx]] == \
+                    point.neighbors()
+        assert sorted(on_board) == list(g.points)
+        assert len(g.points) == g.num_points == size * size
+        for idx in range(g.size):
+            assert g.index(g.point_at[idx]) == idx
+            if idx not in on_board:
+                assert g.moves[idx] is None
+                assert g.neighbors[idx] == ()
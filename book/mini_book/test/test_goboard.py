@@ -0,0 +1,161 @@
+import random
+
+from dlgo import goboard_cow, goboard_fast, goboard_slow
+from dlgo.gotypes import Point
+
+
+def test_fast_board_matches_slow_board():
+    rng = random.Random(7)
+    slow = goboard_slow.GameState.new_game(5)
+    fast = goboard_fast.GameState.new_game(5)
+    for _ in range(60):
+        assert [m for m in slow.legal_moves()] == fast.legal_moves()
+        move = rng.choice(slow.legal_moves()[:-1])
+        slow = slow.apply_move(move)
+        fast = fast.apply_move(move)
+        for row in range(1, 6):
+            for col in range(1, 6):
+                point = Point(row, col)
+                assert slow.board.get(point) == fast.board.get(point)
+                assert slow.board.get_go_string(point) == \
+                    fast.board.get_go_string(point)
+        if slow.is_over():
+            break
+
+
+def test_superko_history_is_per_line_of_play():
+    rng = random.Random(3)
+    slow = goboard_slow.GameState.new_game(4)
+    fast = goboard_fast.GameState.new_game(4)
+    states = []
+    for _ in range(80):
+        states.append((slow, fast))
+        plays = [m for m in slow.legal_moves() if m.is_play]
+        move = rng.choice(plays) if plays else goboard_slow.Move.pass_turn()
+        slow = slow.apply_move(move)
+        fast = fast.apply_move(move)
+    for slow, fast in rng.sample(states, 10):
+        assert slow.legal_moves() == fast.legal_moves()
+        for move in slow.legal_moves()[:3]:
+            assert slow.apply_move(move).legal_moves() == \
+                fast.apply_move(move).legal_moves()
+
+
+def test_points_and_moves_are_interned():
+    import copy
+    import pickle
+
+    from dlgo.geometry import geometry
+    from dlgo.gotypes import Move
+
+    point = Point(4, 5)
+    assert Point(row=4, col=5) is point
+    assert Point._make((4, 5)) is point and point._replace(col=5) is point
+    assert pickle.loads(pickle.dumps(point)) is point
+    move = Move.play(point)
+    assert Move.play(Point(4, 5)) is move and Move.pass_turn() is \
+        Move.pass_turn()
+    assert pickle.loads(pickle.dumps(move)) is move
+    assert copy.deepcopy([move])[0] is move
+    try:
+        move.point = Point(1, 1)
+    except AttributeError:
+        pass
+    else:
+        raise AssertionError('moves must be immutable')
+    board = geometry(9)
+    assert all(board.moves[idx].point is board.point_at[idx]
+               for idx in board.points)
+    game = goboard_fast.GameState.new_game(9)
+    assert all(move is board.moves[board.index(move.point)]
+               for move in game.legal_moves() if move.is_play)
+
+
+def test_cow_board_matches_fast_board():
+    rng = random.Random(11)
+    fast = goboard_fast.GameState.new_game(7)
+    cow = goboard_cow.GameState.new_game(7)
+    for _ in range(120):
+        assert fast.legal_moves() == cow.legal_moves()
+        assert fast.board.zobrist_hash() == cow.board.zobrist_hash()
+        assert fast.board.colors == cow.board.colors
+        assert sorted(fast.board.last_captures) == \
+            sorted(cow.board.last_captures)
+        for player in (goboard_fast.Player.black, goboard_fast.Player.white):
+            assert fast.board.prisoners(player) == cow.board.prisoners(player)
+        for row in range(1, 8):
+            for col in range(1, 8):
+                point = Point(row, col)
+                assert fast.board.num_liberties(point) == \
+                    cow.board.num_liberties(point)
+                assert fast.board.get_go_string(point) == \
+                    cow.board.get_go_string(point)
+        if fast.is_over():
+            break
+        move = rng.choice(fast.legal_moves()[:-1])
+        fast = fast.apply_move(move)
+        cow = cow.apply_move(move)
+    assert isinstance(cow, goboard_cow.GameState)
+
+
+def test_cow_variations_share_unchanged_rows():
+    root = goboard_cow.GameState.new_game(9)
+    for point in (Point(3, 3), Point(7, 7), Point(3, 7)):
+        root = root.apply_move(goboard_cow.Move.play(point))
+    before = root.board.colors[:]
+    left = root.apply_move(goboard_cow.Move.play(Point(5, 2)))
+    right = root.apply_move(goboard_cow.Move.play(Point(5, 8)))
+    assert root.board.colors == before
+    assert left.board.get(Point(5, 8)) is None
+    assert right.board.get(Point(5, 2)) is None
+    for row in range(10):
+        assert left.board.shares_row(root.board, row) == (row != 5)
+    assert not left.board.shares_row(right.board, 5)
+
+
+def test_superko_history_survives_deep_branching(monkeypatch):
+    # Branching from a state that is not the tip of its line adds a history
+    # layer; go past MAX_LAYERS so the line is flattened on the way.
+    monkeypatch.setattr(goboard_fast._History, 'MIN_LAYER_DEPTH', 0)
+    rng = random.Random(5)
+    slow = goboard_slow.GameState.new_game(4)
+    fast = goboard_fast.GameState.new_game(4)
+    for _ in range(3 * goboard_fast._History.MAX_LAYERS):
+        plays = [m for m in slow.legal_moves() if m.is_play]
+        if not plays:
+            break
+        move = rng.choice(plays)
+        # A sibling first, so the move below branches off the tip.
+        fast.apply_move(rng.choice(plays))
+        slow = slow.apply_move(move)
+        fast = fast.apply_move(move)
+        assert slow.legal_moves() == fast.legal_moves()
+    assert fast._history.layers < goboard_fast._History.MAX_LAYERS
+
+
+def test_interning_is_bounded_and_thread_safe():
+    import threading
+
+    from dlgo import gotypes
+    from dlgo.gotypes import Move
+
+    size = len(gotypes._POINTS), len(gotypes._MOVES)
+    for row in range(1000, 2000):
+        assert Move.play(Point(row, -row)).point == (row, -row)
+    assert (len(gotypes._POINTS), len(gotypes._MOVES)) == size
+
+    created = []
+    barrier = threading.Barrier(8)
+
+    def create():
+        barrier.wait()
+        created.append([Move.play(Point(row, col))
+                        for row in range(27) for col in range(27)])
+    threads = [threading.Thread(target=create) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert all(move is first and move.point is Point(*move.point)
+               for moves in created
+               for move, first in zip(moves, created[0]))
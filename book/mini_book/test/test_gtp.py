@@ -0,0 +1,226 @@
+import asyncio
+import random
+import threading
+import time
+
+from dlgo.agent.naive_fast import FastRandomBot
+from dlgo.goboard_fast import Move
+from dlgo.gtp.board import coords_to_gtp_position
+from dlgo.gtp.client import GTPClient, load_test
+from dlgo.gtp.server import GTPServer
+from dlgo.mcts import MCTS, uniform_evaluator
+
+
+def test_load_test_plays_hundreds_of_games_at_once():
+    async def run():
+        server = GTPServer(FastRandomBot, board_size=9)
+        await server.start()
+        result = await load_test('127.0.0.1', server.port, 200,
+                                 board_size=9, max_moves=20, seed=1)
+        await server.close()
+        return server, result
+
+    server, result = asyncio.run(run())
+    assert result.games == 200 and result.moves == 200 * 20
+    assert len(result.latencies) == 200 * 10 == server.num_moves
+    assert 0 < result.percentile(50) <= result.percentile(99)
+    assert server.num_sessions == 0
+
+
+async def _wait_for(event):
+    """Wait for a threading.Event without blocking the event loop."""
+    for _ in range(1000):
+        if event.is_set():
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError('timed out')
+
+
+class _BlockingBot():
+    """Searches until released; the timeout only keeps a failing test
+    from hanging."""
+    def __init__(self, entered, released):
+        self.entered = entered
+        self.released = released
+
+    def select_move(self, game_state):
+        self.entered.set()
+        self.released.wait(10)
+        return Move.pass_turn()
+
+
+def test_slow_search_does_not_block_other_sessions():
+    entered, released = threading.Event(), threading.Event()
+    agents = iter([_BlockingBot(entered, released),
+                   FastRandomBot(random.Random(0))])
+
+    async def run():
+        server = GTPServer(lambda: next(agents), board_size=9)
+        await server.start()
+        slow = await GTPClient.connect('127.0.0.1', server.port)
+        fast = await GTPClient.connect('127.0.0.1', server.port)
+        slow_move = asyncio.ensure_future(slow.send('genmove b'))
+        await _wait_for(entered)
+        for color in 'bwbwbw':
+            response = await fast.send('genmove ' + color)
+            assert response.success
+        # The other session played while this search was still running.
+        assert not slow_move.done() and not released.is_set()
+        released.set()
+        assert (await slow_move).body == 'pass'
+        for client in (slow, fast):
+            await client.close()
+        await server.close()
+
+    asyncio.run(run())
+
+
+class _RecordingMCTS(MCTS):
+    """Records the think time and the kept and total root visits of every
+    select_move, before pondering moves the root on."""
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.think_times = []
+        self.searches = []
+
+    def select_move(self, game_state, num_playouts=None, think_time=None):
+        self.think_times.append(think_time)
+        move = super().select_move(game_state, num_playouts, think_time)
+        self.searches.append(
+            (self.reused_visits, int(self.visits[self.root])))
+        return move
+
+
+def test_time_settings_cap_search_time():
+    agents = []
+
+    def factory():
+        agents.append(_RecordingMCTS(uniform_evaluator, capacity=1 << 16,
+                                     num_playouts=1 << 30))
+        return agents[-1]
+
+    async def run():
+        server = GTPServer(factory, board_size=9, max_think_time=0.2,
+                           lag=0.0)
+        await server.start()
+        client = await GTPClient.connect('127.0.0.1', server.port)
+        start = time.perf_counter()
+        assert (await client.send('genmove b')).success
+        elapsed = time.perf_counter() - start
+        assert (await client.send('time_settings 3 0 0')).success
+        assert (await client.send('genmove b')).success
+        await client.close()
+        await server.close()
+        return elapsed
+
+    elapsed = asyncio.run(run())
+    # max_think_time alone, then 3s of main time over 40 moves to go, less
+    # the time each search waited for a worker.
+    capped, clocked = agents[0].think_times
+    assert 0 < capped <= 0.2 and 0 <= clocked <= 3 / 40
+    # The deadline, not the 2**30 playouts, ended the search.
+    assert elapsed < 10
+
+
+def test_pondered_reply_counts_towards_the_next_move():
+    agents = []
+
+    def factory():
+        agents.append(_RecordingMCTS(uniform_evaluator, capacity=1 << 17,
+                                     num_playouts=400))
+        return agents[-1]
+
+    async def run():
+        server = GTPServer(factory, board_size=9, ponder=True)
+        await server.start()
+        client = await GTPClient.connect('127.0.0.1', server.port)
+        assert (await client.send('genmove b')).success
+        search = agents[0]
+        assert search.is_pondering
+        while search.is_pondering:
+            await asyncio.sleep(0.01)
+        # The opponent plays the reply pondering visited most.
+        reply = search.best_move()
+        root = search.root
+        start = search.first_child[root]
+        kept = int(search.visits[start:start + search.num_children[root]]
+                   .max())
+        vertex = coords_to_gtp_position(reply)
+        assert (await client.send('play w ' + vertex)).success
+        assert (await client.send('genmove b')).success
+        # Its visits and the new search add up to one move's budget.
+        assert search.searches[-1] == (kept, 400) and kept > 0
+        assert (await client.send('clear_board')).success
+        assert not search.is_pondering
+        await client.close()
+        await server.close()
+
+    asyncio.run(run())
+
+
+class _BrokenBot():
+    def __init__(self):
+        self.errors = iter([ValueError('bad\n\nvalue'), RuntimeError()])
+
+    def select_move(self, game_state):
+        raise next(self.errors)
+
+
+def test_agent_errors_are_answered_and_the_session_goes_on():
+    async def run():
+        server = GTPServer(_BrokenBot, board_size=9)
+        await server.start()
+        client = await GTPClient.connect('127.0.0.1', server.port)
+        replies = [await client.send(command) for command in (
+            'genmove b', 'genmove b', 'play b E5', 'genmove', 'name')]
+        await client.close()
+        await server.close()
+        return [(reply.success, reply.body) for reply in replies]
+
+    assert asyncio.run(run()) == [
+        (False, 'bad value'), (False, 'RuntimeError'), (True, ''),
+        (False, 'syntax error'), (True, 'dlgo')]
+
+
+class _BlockingPonderer(FastRandomBot):
+    """Starting and stopping a ponder block until released."""
+    def __init__(self, entered, released):
+        super().__init__()
+        self.entered = entered
+        self.released = released
+
+    def ponder(self, game_state):
+        self._block()
+
+    def stop_pondering(self):
+        self._block()
+
+    def _block(self):
+        self.entered.set()
+        self.released.wait(10)
+
+
+def test_pondering_does_not_block_other_sessions():
+    entered, released = threading.Event(), threading.Event()
+
+    async def run():
+        server = GTPServer(lambda: _BlockingPonderer(entered, released),
+                           board_size=9, ponder=True)
+        await server.start()
+        pondering = await GTPClient.connect('127.0.0.1', server.port)
+        other = await GTPClient.connect('127.0.0.1', server.port)
+        for command in ('genmove b', 'undo', 'genmove b', 'clear_board'):
+            entered.clear()
+            released.clear()
+            pending = asyncio.ensure_future(pondering.send(command))
+            await _wait_for(entered)
+            # The other session is answered while this one is blocked.
+            assert (await other.send('name')).success
+            assert not pending.done()
+            released.set()
+            assert (await pending).success
+        for client in (pondering, other):
+            await client.close()
+        await server.close()
+
+    asyncio.run(run())
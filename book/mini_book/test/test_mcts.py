@@ -0,0 +1,212 @@
+import random
+import threading
+import time
+
+import numpy as np
+
+from dlgo.eval_queue import EvaluationQueue
+from dlgo.goboard_fast import GameState
+from dlgo.mcts import (
+    MCTS, PENDING, UNEXPANDED, index_to_move, uniform_evaluator)
+
+
+def _random_evaluator(seed):
+    rng = np.random.RandomState(seed)
+    lock = threading.Lock()
+
+    def evaluate(game_state):
+        board = game_state.board
+        with lock:
+            priors = rng.dirichlet(
+                np.ones(board.num_rows * board.num_cols + 1))
+            value = rng.uniform(-1, 1)
+        return priors, value
+    return evaluate
+
+
+def _subtree(search, node):
+    nodes = [node]
+    for current in nodes:
+        count = search.num_children[current]
+        if count > 0:
+            start = search.first_child[current]
+            nodes.extend(range(start, start + count))
+    return nodes
+
+
+def _check_tree(search):
+    """No node of the tree is left pending or carrying virtual loss: an
+    expanded node has one visit of its own plus those of its children."""
+    for node in _subtree(search, search.root):
+        count = search.num_children[node]
+        assert count != PENDING
+        if count == UNEXPANDED:
+            assert search.visits[node] == 0
+            continue
+        visits = int(search.visits[node])
+        assert abs(search.value_sum[node]) <= visits + 1e-9
+        if count > 0:
+            start = search.first_child[node]
+            children = search.visits[start:start + count]
+            assert visits == 1 + int(children.sum())
+
+
+def test_visit_counts_add_up_to_the_playouts():
+    search = MCTS(_random_evaluator(0), capacity=50000)
+    search.select_move(GameState.new_game(9), num_playouts=300)
+    root = search.root
+    start = search.first_child[root]
+    children = search.visits[start:start + search.num_children[root]]
+    assert int(search.visits[root]) == 300 == search.playouts
+    assert int(children.sum()) == 299
+    _check_tree(search)
+
+
+def test_threaded_search_leaves_no_virtual_loss():
+    def slow(game_state):
+        time.sleep(0.0005)
+        return uniform_evaluator(game_state)
+
+    for evaluator in (slow, _random_evaluator(1)):
+        search = MCTS(evaluator, capacity=50000, num_threads=4,
+                      virtual_loss=3)
+        search.select_move(GameState.new_game(7), num_playouts=400)
+        assert int(search.visits[search.root]) == 400
+        _check_tree(search)
+
+
+def test_chosen_moves_are_legal():
+    rng = random.Random(2)
+    game = GameState.new_game(5)
+    search = MCTS(_random_evaluator(2), capacity=100000, num_threads=2)
+    for _ in range(40):
+        if game.is_over():
+            break
+        move = search.select_move(game, num_playouts=40)
+        assert move in game.legal_moves()
+        game = game.apply_move(move)
+        # The opponent plays at random, through the kept tree.
+        if not game.is_over():
+            game = game.apply_move(rng.choice(game.legal_moves()[:-1]))
+
+
+def test_evaluator_errors_reach_select_move():
+    def failing_model(inputs):
+        raise ValueError('model failed')
+
+    for num_threads in (1, 4):
+        calls = []
+
+        def flaky(game_state):
+            calls.append(1)
+            if len(calls) > 20:
+                raise ValueError('model failed')
+            return uniform_evaluator(game_state)
+
+        with EvaluationQueue(failing_model, lambda state: np.zeros(4),
+                             batch_size=4) as queue:
+            for evaluator in (flaky, queue):
+                search = MCTS(evaluator, capacity=50000,
+                              num_threads=num_threads)
+                errors = []
+
+                def run():
+                    try:
+                        search.select_move(GameState.new_game(9), 200)
+                    except ValueError as error:
+                        errors.append(error)
+                thread = threading.Thread(target=run, daemon=True)
+                thread.start()
+                thread.join(10)
+                assert not thread.is_alive(), 'search hung'
+                assert [str(error) for error in errors] == ['model failed']
+                _check_tree(search)
+        # The tree is still usable once the evaluator works again.
+        search.evaluator = uniform_evaluator
+        search.select_move(GameState.new_game(9), 50)
+        _check_tree(search)
+
+
+def _stats(search, node):
+    """Visits and values of node and its children, by move."""
+    count = max(int(search.num_children[node]), 0)
+    start = search.first_child[node]
+    children = {int(search.move[child]): (int(search.visits[child]),
+                                          float(search.value_sum[child]))
+                for child in range(start, start + count)}
+    return int(search.visits[node]), float(search.value_sum[node]), children
+
+
+def test_promoted_subtree_keeps_statistics_and_frees_the_rest():
+    game = GameState.new_game(5)
+    search = MCTS(_random_evaluator(3), capacity=50000)
+    search.select_move(game, num_playouts=400)
+    root = search.root
+    start = search.first_child[root]
+    child = next(node for node in range(
+        start, start + search.num_children[root])
+        if search.visits[node] > 1 and node != start)
+    kept = _stats(search, child)
+    subtree = len(_subtree(search, child))
+    used = search._size
+
+    board = game.board
+    move = index_to_move(int(search.move[child]), board.num_rows,
+                         board.num_cols)
+    search.set_root(game.apply_move(move))
+    assert search.root == root
+    assert _stats(search, search.root) == kept
+    assert search.reused_visits == kept[0]
+    assert search.num_nodes == subtree
+    assert search._num_free == used - subtree
+    free = [(start, size) for size, starts in search._free.items()
+            for start in starts]
+    assert sum(size for _, size in free) == search._num_free
+    live = set(_subtree(search, search.root))
+    assert not any(live & set(range(start, start + size))
+                   for start, size in free)
+    _check_tree(search)
+
+
+def test_reused_tree_keeps_searching_over_many_moves():
+    rng = random.Random(4)
+    game = GameState.new_game(5)
+    # Room for two searches or so: the later ones expand into freed
+    # blocks.
+    search = MCTS(_random_evaluator(4), capacity=8000)
+    for _ in range(12):
+        if game.is_over():
+            break
+        move = search.select_move(game, num_playouts=150)
+        assert move in game.legal_moves()
+        assert int(search.visits[search.root]) == \
+            max(150, search.reused_visits)
+        _check_tree(search)
+        # Only finished games are leaves: no expansion ran out of nodes.
+        for node in _subtree(search, search.root):
+            if search.num_children[node] == 0:
+                assert search._states[node].is_over()
+        game = game.apply_move(move)
+        if not game.is_over():
+            game = game.apply_move(rng.choice(game.legal_moves()[:-1]))
+
+
+def test_unexplored_reply_after_pondering_is_searched():
+    search = MCTS(_random_evaluator(5), capacity=50000)
+    game = GameState.new_game(9)
+    game = game.apply_move(search.select_move(game, num_playouts=100))
+    search.ponder(game, num_playouts=50)
+    search.stop_pondering()
+    root = search.root
+    start = search.first_child[root]
+    reply = next(node for node in range(
+        start, start + search.num_children[root])
+        if search.visits[node] == 0)
+    board = game.board
+    game = game.apply_move(index_to_move(
+        int(search.move[reply]), board.num_rows, board.num_cols))
+    move = search.select_move(game, num_playouts=50)
+    assert search.reused_visits == 0
+    assert int(search.visits[search.root]) == 50
+    assert not move.is_pass and move in game.legal_moves()
+    _check_tree(search)
@@ -0,0 +1,144 @@
+import numpy as np
+
+from dlgo.nn.conv import Conv2D
+from dlgo.nn.graph import Graph
+from dlgo.nn.layers import ActivationLayer, DenseLayer
+from dlgo.nn.losses import MSE, CrossEntropy
+from dlgo.nn.network import SequentialNetwork
+
+
+def _numeric_gradient(f, x, eps=1e-6):
+    """Central differences of f() with respect to the array x, which is
+    changed in place and restored."""
+    gradient = np.zeros_like(x)
+    for index in np.ndindex(*x.shape):
+        value = x[index]
+        x[index] = value + eps
+        plus = f()
+        x[index] = value - eps
+        minus = f()
+        x[index] = value
+        gradient[index] = (plus - minus) / (2 * eps)
+    return gradient
+
+
+def _network(fuse):
+    rng = np.random.default_rng(0)
+    net = SequentialNetwork(fuse=fuse)
+    net.add(DenseLayer(5, 4, rng=rng))
+    net.add(ActivationLayer(4))
+    net.add(DenseLayer(4, 3, rng=rng))
+    net.add(ActivationLayer(3))
+    return net
+
+
+def test_gradients_match_finite_differences():
+    rng = np.random.default_rng(1)
+    x = rng.standard_normal((5, 6))
+    y = rng.random((3, 6))
+    for fuse in (True, False):
+        net = _network(fuse)
+        params = [layer.weight_bias for layer in net.layers[::2]]
+        saved = [param.copy() for param in params]
+        net.train_batch(x, y, learning_rate=6.0)
+        weights, before = params[0], saved[0]
+        gradient = before - weights
+        for param, copy in zip(params, saved):
+            param[...] = copy
+        numeric = _numeric_gradient(
+            lambda: net.loss.loss_function(net.forward(x), y), weights)
+        assert np.allclose(gradient, numeric, atol=1e-5)
+
+
+def test_conv_gradients_match_finite_differences():
+    rng = np.random.default_rng(3)
+    for checkpoint_every in (None, 1):
+        net = SequentialNetwork(checkpoint_every=checkpoint_every)
+        conv = Conv2D(2, 4, 5, filters=3, rng=rng)
+        net.add(conv)
+        net.add(ActivationLayer(60))
+        net.add(Conv2D(3, 4, 5, filters=1, rng=rng))
+        x = rng.standard_normal((40, 6))
+        y = rng.random((20, 6))
+        weights = conv.weight_bias
+        params = [layer.weight_bias for layer in net.layers[::2]]
+        saved = [param.copy() for param in params]
+        net.train_batch(x, y, learning_rate=6.0)
+        gradient = saved[0] - weights
+        for param, copy in zip(params, saved):
+            param[...] = copy
+        numeric = _numeric_gradient(
+            lambda: net.loss.loss_function(net.forward(x), y), weights)
+        assert np.allclose(gradient, numeric, atol=1e-5)
+
+
+def test_graph_gradients_match_finite_differences():
+    rng = np.random.default_rng(2)
+    g = Graph()
+    x_node = g.input('x', 5)
+    hidden = g.sigmoid(g.dense(x_node, 4, rng=rng))
+    skip = g.tanh(g.dense(x_node, 4, rng=rng))
+    trunk = g.relu(g.add(hidden, skip, hidden))
+    g.output('policy', g.softmax(g.dense(trunk, 3, rng=rng)), CrossEntropy())
+    g.output('value', g.tanh(g.dense(trunk, 1, rng=rng)), MSE())
+    g.output('hidden', hidden, MSE())
+    inputs = {'x': rng.standard_normal((5, 6))}
+    targets = {'policy': np.eye(3)[:, rng.integers(0, 3, 6)],
+               'value': rng.uniform(-1, 1, (1, 6)),
+               'hidden': rng.random((4, 6))}
+    params = [node.op.weight_bias for node in g.nodes
+              if hasattr(node.op, 'weight_bias')]
+    for i, weights in enumerate(params[:2]):
+        saved = [param.copy() for param in params]
+        g.train_batch(inputs, targets, learning_rate=6.0)
+        gradient = saved[i] - weights
+        for param, copy in zip(params, saved):
+            param[...] = copy
+        numeric = _numeric_gradient(
+            lambda: g.loss(inputs, targets), weights)
+        assert np.allclose(gradient, numeric, atol=1e-5)
+
+
+def test_graph_activations_on_inputs():
+    rng = np.random.default_rng(4)
+    g = Graph()
+    x_node = g.input('x', 3)
+    branches = [g.sigmoid(x_node), g.tanh(x_node), g.relu(x_node),
+                g.softmax(x_node)]
+    g.output('y', g.sigmoid(g.dense(g.add(*branches), 2, rng=rng)), MSE())
+    inputs = {'x': rng.standard_normal((3, 6))}
+    targets = {'y': rng.random((2, 6))}
+    weights = g.nodes[-2].op.weight_bias
+    before = weights.copy()
+    g.train_batch(inputs, targets, learning_rate=6.0)
+    gradient = before - weights
+    weights[...] = before
+    numeric = _numeric_gradient(lambda: g.loss(inputs, targets), weights)
+    assert np.allclose(gradient, numeric, atol=1e-5)
+
+
+def test_checkpointed_training_matches_full_memory_training():
+    widths = [6, 5, 7, 4, 6, 5, 3, 4]
+
+    def deep(**kwargs):
+        rng = np.random.default_rng(5)
+        net = SequentialNetwork(**kwargs)
+        for n_in, n_out in zip(widths, widths[1:]):
+            net.add(DenseLayer(n_in, n_out, rng=rng))
+            net.add(ActivationLayer(n_out))
+        return net
+
+    rng = np.random.default_rng(6)
+    batches = [(rng.standard_normal((6, 10)), rng.random((4, 10)))
+               for _ in range(5)]
+    for fuse in (True, False):
+        full = deep(fuse=fuse)
+        for x, y in batches:
+            full.train_batch(x, y, learning_rate=0.5)
+        for checkpoint_every in (2, 3, 4, 5):
+            net = deep(fuse=fuse, checkpoint_every=checkpoint_every)
+            for x, y in batches:
+                net.train_batch(x, y, learning_rate=0.5)
+            for layer, reference in zip(net.layers[::2], full.layers[::2]):
+                assert np.allclose(layer.weight_bias, reference.weight_bias)
+            assert net.activation_nbytes(10) < full.activation_nbytes(10)
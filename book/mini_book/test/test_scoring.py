@@ -0,0 +1,47 @@
+import random
+
+import numpy as np
+
+from dlgo.agent.naive_fast import FastRandomBot
+from dlgo.batch_selfplay import _area_scores
+from dlgo.goboard_fast import GameState
+from dlgo.gotypes import Player
+from dlgo.scoring import (AREA, TERRITORY, compute_game_result,
+                          evaluate_territory)
+
+
+def test_area_scores_match_batch_flood_fill():
+    bot = FastRandomBot(random.Random(4))
+    for size, cap in ((5, None), (9, None), (9, 30), (13, 60)):
+        game = bot.play_out(GameState.new_game(size), max_moves=cap)
+        board = game.board
+        padded = np.array(board.colors, dtype=np.int8).reshape(
+            1, size + 2, size + 2)
+        black, white = _area_scores(padded)
+        result = compute_game_result(game, komi=0, rules=AREA)
+        assert (result.b, result.w) == (black[0], white[0])
+        territory = evaluate_territory(board)
+        assert sum(territory) == size * size
+
+
+def test_territory_scores_count_prisoners():
+    bot = FastRandomBot(random.Random(6))
+    game = bot.play_out(GameState.new_game(9))
+    board = game.board
+    territory = evaluate_territory(board)
+    result = compute_game_result(game, komi=6.5, rules=TERRITORY)
+    assert result.b == territory.black_territory + \
+        board.prisoners(Player.black)
+    assert result.w == territory.white_territory + \
+        board.prisoners(Player.white)
+    # Stones placed = stones on the board + stones captured.
+    plays = sum(1 for state in _line(game) if state.last_move is not None
+                and state.last_move.is_play)
+    assert plays == territory.black_stones + territory.white_stones + \
+        board.prisoners(Player.black) + board.prisoners(Player.white)
+
+
+def _line(game):
+    while game is not None:
+        yield game
+        game = game.previous_state
@@ -0,0 +1,19 @@
+from dlgo.gotypes import Player
+from dlgo.selfplay_farm import SelfPlayFarm
+
+from helpers import replay_record
+
+
+def test_farm_games_replay_legally_through_small_rings():
+    # Rings of two slots for six games a worker: the workers wait for the
+    # driver to drain them.
+    farm = SelfPlayFarm(num_workers=2, board_size=5, batch_size=4,
+                        capacity=2, seed=7)
+    records = farm.run(12)
+    assert len(records) == 12
+    assert sorted(stats.worker for stats in farm.worker_stats) == [0, 1]
+    assert sum(stats.games for stats in farm.worker_stats) >= 12
+    for record in records:
+        assert record.board_size == 5
+        replay_record(record)
+        assert record.winner in (Player.black, Player.white)
@@ -0,0 +1,78 @@
+import gzip
+import io
+import tarfile
+
+from dlgo import sgf
+
+GAME = ('(;GM[1]SZ[9]KM[6.5]RE[W+2.5]C[a comment \\] with ( and ;]\n'
+        ';B[ee];W[ec](;B[gc]C[main];W[gd](;B[]) (;B[aa]))'
+        '(;B[cc];W[dd]))\n')
+HANDICAP = '(;SZ[9]HA[2]AB[cc][gg];W[ee];B[ec])'
+
+
+def test_chunk_boundaries_do_not_change_games(monkeypatch):
+    expected = list(sgf.iter_games(io.StringIO(GAME + HANDICAP)))
+    assert [len(game.moves) for game in expected] == [5, 2]
+    assert expected[0].properties['C'] == ['a comment ] with ( and ;']
+    for chunk_size in (1, 2, 3, 7):
+        monkeypatch.setattr(sgf, '_CHUNK_SIZE', chunk_size)
+        stream = io.StringIO(GAME + HANDICAP)
+        games = list(sgf.iter_games(stream))
+        assert games == expected
+
+
+def test_positions_from_archives(tmp_path):
+    plain = tmp_path / 'game.sgf.gz'
+    with gzip.open(str(plain), 'wt') as f:
+        f.write(GAME)
+    archive = tmp_path / 'games.tar.bz2'
+    with tarfile.open(str(archive), 'w:bz2') as tar:
+        for name, text in (('a.sgf', GAME), ('b.sgf', HANDICAP)):
+            data = text.encode()
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+    counts = []
+    for path in (plain, archive):
+        positions = [position for stream in sgf.open_records(str(path))
+                     for position in sgf.iter_positions(stream)]
+        counts.append(len(positions))
+    assert counts == [5, 7]
+    handicap = list(sgf.iter_positions(io.StringIO(HANDICAP)))
+    assert handicap[0].game_state.next_player.name == 'white'
+    assert handicap[0].game_state.board.get(sgf.Point(7, 3)) is not None
+
+
+def test_points_follow_gtp_orientation_and_rectangles():
+    from dlgo.gtp.board import coords_to_gtp_position
+
+    point = sgf.parse_point('dd', 19)
+    assert coords_to_gtp_position(sgf.Move.play(point)) == 'D16'
+    assert sgf.parse_point('as', 19) == sgf.Point(1, 1)
+    game = next(sgf.iter_games(io.StringIO('(;SZ[9]AB[aa:cc][ee]AW[ig])')))
+    setup = sgf.setup_stones(game.properties, 9)
+    assert len(setup) == 11
+    assert {point for player, point in setup if player.name == 'black'} == \
+        {sgf.Point(row, col) for row in (7, 8, 9) for col in (1, 2, 3)} | \
+        {sgf.Point(5, 5)}
+    assert (sgf.Player.white, sgf.Point(3, 9)) in setup
+
+
+def test_unplayable_records_are_reported_not_placed():
+    records = ('(;SZ[9]AB[zz];B[ee])'        # setup stone off the board
+               '(;SZ[9]AB[ee]AW[ee];B[cc])'  # setup on an occupied point
+               '(;SZ[9];B[ee];W[ee];B[cc])'  # move on an occupied point
+               '(;SZ[5];B[aa];W[gg])'        # move off the board
+               '(;SZ[9];B[cc];W[dd])')
+    errors = []
+    positions = list(sgf.iter_positions(io.StringIO(records), errors))
+    assert [properties['SZ'] for properties in errors] == [['9']] * 3 + \
+        [['5']]
+    assert [position.move.point for position in positions] == [
+        sgf.Point(5, 5), sgf.Point(5, 1), sgf.Point(7, 3), sgf.Point(6, 4)]
+    unplayable = []
+    state = sgf.setup_state(5, [], sgf.Player.black)
+    moves = [(sgf.Player.black, sgf.Point(3, 3)),
+             (sgf.Player.white, sgf.Point(99, 1))]
+    assert len(list(sgf.play_moves(state, moves, unplayable))) == 1
+    assert unplayable == [(sgf.Player.white, sgf.Point(99, 1))]
@@ -0,0 +1,96 @@
+import sys
+import threading
+
+from dlgo.goboard_fast import GameState, Move
+from dlgo.gotypes import Point
+from dlgo.mcts import MCTS, uniform_evaluator
+from dlgo.transposition import TranspositionTable, position_key
+
+
+def test_lookups_count_hits_and_misses():
+    table = TranspositionTable()
+    assert table.lookup('a') is None
+    entry = table.store('a', None, [1], [2])
+    assert table.store('a', None, [], []) is entry
+    entry.add_value(1.0)
+    entry.add_value(0.0)
+    assert table.lookup('a') is entry and entry.value == 0.5
+    assert (table.hits, table.misses, table.hit_rate) == (1, 1, 0.5)
+
+
+def test_clock_evicts_entries_not_used_since_the_last_sweep():
+    table = TranspositionTable(capacity=3)
+    for key in 'abc':
+        table.store(key, None, [], [])
+    # Every entry is fresh, so the hand clears them all and takes 'a'.
+    table.store('d', None, [], [])
+    table.lookup('b')
+    table.store('e', None, [], [])
+    assert len(table) == 3
+    assert [table.lookup(key) is not None for key in 'abcde'] == \
+        [False, True, False, True, True]
+
+
+def test_capacity_bounds_the_table():
+    table = TranspositionTable(capacity=10)
+    for key in range(100):
+        table.store(key, None, [], [])
+        if key % 3 == 0:
+            table.lookup(key)
+        assert len(table) == min(key + 1, 10)
+    assert all(table.lookup(key) is not None for key in range(90, 100))
+    table.clear()
+    assert len(table) == 0 and table.lookup(99) is None
+
+
+def test_threads_can_share_a_table():
+    table = TranspositionTable(capacity=50)
+    shared = table.store('shared', None, [], [])
+    errors = []
+
+    def work(offset):
+        try:
+            for key in range(offset, offset + 2000):
+                table.store(key, None, [], [])
+                table.lookup(key - 7)
+                shared.add_value(1.0)
+        except Exception as error:
+            errors.append(error)
+
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        threads = [threading.Thread(target=work, args=(i * 1000,))
+                   for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        sys.setswitchinterval(interval)
+    assert errors == []
+    assert shared.visits == 4 * 2000 and shared.value == 1.0
+    assert len(table) == 50
+    assert {entry.key for entry in table._slots} == set(table._index)
+
+
+def test_finished_games_have_their_own_entries():
+    game = GameState.new_game(5).apply_move(Move.play(Point(3, 3)))
+    over = game.apply_move(Move.pass_turn()).apply_move(Move.pass_turn())
+    assert over.is_over() and over.board is game.board
+    assert position_key(over) != position_key(game)
+
+    finished = []
+
+    def evaluator(game_state):
+        # Favour passing, so the search reaches the end of the game.
+        if game_state.is_over():
+            finished.append(game_state)
+        priors, value = uniform_evaluator(game_state)
+        priors[-1] = 10.0
+        return priors, value
+
+    search = MCTS(evaluator, capacity=50000,
+                  transpositions=TranspositionTable())
+    search.select_move(game, num_playouts=100)
+    assert finished